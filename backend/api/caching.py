@@ -0,0 +1,405 @@
+import hashlib
+import logging
+import math
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.dateparse import parse_date, parse_datetime
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY_DIGEST_SIZE = 16 # bytes; keys stay at a fixed length whatever the query string
+
+# Bump when the shape of any cached payload changes, so a deploy never reads entries
+# written by the previous release. Entries of an unchanged schema stay warm across deploys.
+API_CACHE_SCHEMA = 3
+
+STORY_FAMILY = 'story'
+STORY_VELOCITY_FAMILY = 'story_velocity'
+STORY_LIST_FAMILIES = ('stories_list', 'stories_ai_related')
+INSIGHTS_FAMILIES = ('ai_keywords', 'top_domains', 'stats_summary', 'trends')
+# Families derived from many stories; invalidated wholesale by bumping their generation.
+# Individual stories are invalidated by key instead.
+GENERATIONAL_FAMILIES = frozenset(STORY_LIST_FAMILIES + INSIGHTS_FAMILIES)
+# Families also kept in each worker's in-process tier. Their keys embed the generation, so a
+# bump is seen by every worker within API_CACHE_GENERATION_TTL. Story entries are deleted by
+# key in Redis, which other workers' memory would not see, so they stay Redis-only.
+LOCAL_CACHE_FAMILIES = GENERATIONAL_FAMILIES
+
+GENERATION_KEY_PREFIX = 'cache_generation'
+LOCK_POLL_INTERVAL = 0.05 # seconds between checks while waiting on another request's recompute
+
+
+# --- Parameter normalizers ---
+# Each takes the raw query-string value and returns its canonical form, or None when the
+# value has no effect on the response (so it is left out of the key).
+
+def normalize_text(value):
+    """Case-insensitive filter text (icontains / full-text search)"""
+    return value.lower() or None
+
+
+def normalize_search(value):
+    """Full-text query; tokenized by Postgres, so runs of whitespace are insignificant"""
+    return ' '.join(value.lower().split()) or None
+
+
+def normalize_csv(value):
+    """Comma-separated sets, where order and repeats are insignificant"""
+    return ','.join(sorted({item.strip() for item in value.split(',') if item.strip()})) or None
+
+
+def normalize_bool(value):
+    """Mirror the views: any non-empty value other than 'true' means False"""
+    if not value:
+        return None
+    return 'true' if value.lower() == 'true' else 'false'
+
+
+def normalize_datetime(value):
+    """Dates and datetimes that mean the same instant share one form"""
+    value = value.strip()
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            parsed = datetime.combine(parsed_date, datetime.min.time()) if parsed_date else None
+    except ValueError:
+        parsed = None
+    return parsed.isoformat() if parsed else value # Unparseable values are passed through untouched
+
+
+def normalize_int(value):
+    try:
+        return str(int(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def normalize_positive_int(value):
+    """Integers where non-positive or invalid values fall back to the default"""
+    normalized = normalize_int(value)
+    return normalized if normalized and int(normalized) > 0 else None
+
+
+def normalize_opaque(value):
+    """Values compared byte for byte, such as pagination cursors"""
+    return value or None
+
+
+def normalize_params(params, normalizers):
+    """
+    Reduce query params to a sorted list of (name, canonical value) pairs.
+    Params without a normalizer do not affect the response and are dropped, so
+    arbitrary extra params cannot fan out the keyspace.
+    """
+    normalized = []
+    for name, normalizer in normalizers.items():
+        value = params.get(name)
+        if value is None:
+            continue
+        value = normalizer(value)
+        if value is not None:
+            normalized.append((name, value))
+    return sorted(normalized)
+
+
+def make_cache_key(family, params=None, normalizers=None):
+    """
+    Build a bounded cache key for a response family.
+    The normalized params are hashed, so user input never lands in key names:
+    `stories_list` for the bare request, `stories_list_<digest>` otherwise.
+    """
+    normalized = normalize_params(params or {}, normalizers or {})
+    if not normalized:
+        return family
+    digest = hashlib.blake2b(urlencode(normalized).encode('utf-8'), digest_size=CACHE_KEY_DIGEST_SIZE)
+    return f"{family}_{digest.hexdigest()}"
+
+
+CACHE_HIT = 'hits'
+CACHE_STALE = 'stale' # Served an expired value while another request recomputed it
+CACHE_MISS = 'misses'
+
+
+class CacheStats:
+    """Thread-safe per-process hit/stale/miss counters, keyed by response family"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = defaultdict(lambda: {CACHE_HIT: 0, CACHE_STALE: 0, CACHE_MISS: 0})
+
+    def record(self, family, outcome):
+        with self._lock:
+            self._counts[family][outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            counts = {family: dict(values) for family, values in self._counts.items()}
+        for values in counts.values():
+            served = values[CACHE_HIT] + values[CACHE_STALE]
+            total = served + values[CACHE_MISS]
+            values['hit_ratio'] = round(served / total, 4) if total else 0.0
+        return dict(sorted(counts.items()))
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+cache_stats = CacheStats()
+
+
+def _payload_size(value):
+    """Approximate memory held by a cached value; payloads are dominated by their encoded body"""
+    if isinstance(value, dict) and isinstance(value.get('content'), bytes):
+        return len(value['content'])
+    return sys.getsizeof(value)
+
+
+class LocalCache:
+    """
+    Thread-safe in-process LRU bounded by total payload size, with per-entry expiry.
+    Hits cost a dict lookup: no network round trip and no unpickling.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict() # key -> (value, expires_at, size)
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if item[1] <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, expires_at):
+        size = _payload_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self.size += size
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._entries))) # Least recently used first
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self.size -= size
+
+
+local_cache = LocalCache(settings.API_CACHE_LOCAL_MAX_BYTES)
+# family -> (generation, trusted_until); saves a Redis read per request for the generation
+_local_generations = {}
+
+
+def clear_local_caches():
+    """Drop this process's in-memory tier, e.g. after the shared cache was flushed"""
+    local_cache.clear()
+    _local_generations.clear()
+
+
+def story_cache_key(story_id):
+    return f"{STORY_FAMILY}_{story_id}"
+
+
+def story_velocity_cache_key(story_id):
+    return f"{STORY_FAMILY}_{story_id}_velocity"
+
+
+def _generation_key(family):
+    return f"{GENERATION_KEY_PREFIX}_{family}"
+
+
+def _new_generation():
+    # Seeded from the clock, so a counter lost to eviction never restarts at a
+    # generation whose entries may still be cached
+    return time.time_ns() // 1_000_000
+
+
+def get_generation(family):
+    """
+    Current generation of a response family; created on first use.
+    Each process trusts its last read for API_CACHE_GENERATION_TTL seconds.
+    """
+    local = _local_generations.get(family)
+    if local is not None and local[1] > time.time():
+        return local[0]
+
+    key = _generation_key(family)
+    generation = cache.get(key)
+    if generation is None:
+        seeded = _new_generation()
+        cache.add(key, seeded, timeout=None)
+        # Evicted again before the re-read, or the backend swallowed an error: use our own seed
+        generation = cache.get(key) or seeded
+    _local_generations[family] = (generation, time.time() + settings.API_CACHE_GENERATION_TTL)
+    return generation
+
+
+def bump_generations(families):
+    """Invalidate every cached entry of the given families with one counter bump each"""
+    for family in families:
+        key = _generation_key(family)
+        try:
+            cache.incr(key)
+        except ValueError: # No counter yet, so nothing of this family is reachable
+            cache.add(key, _new_generation(), timeout=None)
+        _local_generations.pop(family, None) # This process sees its own bump immediately
+
+
+def cache_versions(family):
+    """
+    Versions passed to the cache backend for entries of a family: (current, previous).
+    previous names the generation before the last bump, whose entries may be served
+    stale; it is None for families invalidated by key.
+    """
+    if family in GENERATIONAL_FAMILIES:
+        generation = get_generation(family)
+        return f"{API_CACHE_SCHEMA}.{generation}", f"{API_CACHE_SCHEMA}.{generation - 1}"
+    return API_CACHE_SCHEMA, None
+
+
+def invalidate_stories(changed_story_ids):
+    """
+    Drop cached data that depends on the given stories: their own entries, plus
+    every list and insight family. A no-op when nothing changed, so unchanged
+    ingests keep the whole cache warm.
+    """
+    if not changed_story_ids:
+        return
+    keys = [key for story_id in changed_story_ids for key in (story_cache_key(story_id), story_velocity_cache_key(story_id))]
+    cache.delete_many(keys, version=API_CACHE_SCHEMA)
+    bump_generations(GENERATIONAL_FAMILIES)
+    logger.info(f"Invalidated cache for {len(changed_story_ids)} changed stories.")
+
+
+def invalidate_story_velocity(story_ids):
+    """Drop cached velocity responses of the given stories, e.g. after their snapshots were pruned"""
+    keys = [story_velocity_cache_key(story_id) for story_id in story_ids]
+    if keys:
+        cache.delete_many(keys, version=API_CACHE_SCHEMA)
+
+
+def _should_refresh(entry, now):
+    """
+    Probabilistic early expiration (XFetch): the closer an entry is to expiry, and the
+    longer it took to compute, the likelier a request is to refresh it ahead of time.
+    Refreshes are spread out instead of all requests missing at the same instant.
+    """
+    beta = settings.API_CACHE_EARLY_REFRESH_BETA
+    return now - entry['compute_time'] * beta * math.log(1.0 - random.random()) >= entry['expires_at']
+
+
+def _local_key(key, version):
+    return f"{version}:{key}"
+
+
+def _store_local(family, key, version, entry):
+    if family in LOCAL_CACHE_FAMILIES:
+        # Never outlive the shared entry's logical expiry, so refresh decisions stay in Redis
+        expires_at = min(entry['expires_at'], time.time() + settings.API_CACHE_LOCAL_TTL)
+        local_cache.set(_local_key(key, version), entry['value'], expires_at)
+
+
+def _compute_and_store(family, key, compute, timeout, version):
+    started = time.monotonic()
+    value = compute()
+    now = time.time()
+    entry = {'value': value, 'expires_at': now + timeout, 'compute_time': time.monotonic() - started}
+    # Kept past its logical expiry so it can be served stale while being recomputed
+    cache.set(key, entry, timeout=timeout + settings.API_CACHE_STALE_TTL, version=version)
+    _store_local(family, key, version, entry)
+    return value
+
+
+def _wait_for_entry(key, version):
+    """Poll for an entry another request is computing; None if it does not arrive in time"""
+    deadline = time.monotonic() + settings.API_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = cache.get(key, version=version)
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_or_compute(family, key, compute, timeout):
+    """
+    Return the cached value for key, computing and storing it on a miss.
+
+    Families in LOCAL_CACHE_FAMILIES are first looked up in this process's memory and
+    only then in the shared cache.
+    Only one request recomputes a key at a time, guarded by a short lock in the
+    cache. While it does, the others serve the expired value, or the entry of the
+    previous generation right after an invalidation. With nothing to serve, they
+    wait briefly for the lock holder's result instead of hitting the database too.
+    """
+    version, previous_version = cache_versions(family)
+    if family in LOCAL_CACHE_FAMILIES:
+        value = local_cache.get(_local_key(key, version))
+        if value is not None:
+            cache_stats.record(family, CACHE_HIT)
+            return value
+
+    entry = cache.get(key, version=version)
+    if entry is not None and not _should_refresh(entry, time.time()):
+        cache_stats.record(family, CACHE_HIT)
+        _store_local(family, key, version, entry)
+        return entry['value']
+
+    stale = entry
+    if stale is None and previous_version is not None:
+        stale = cache.get(key, version=previous_version)
+
+    lock_key = f"{key}_lock"
+    token = uuid.uuid4().hex
+    if cache.add(lock_key, token, timeout=settings.API_CACHE_LOCK_TIMEOUT, version=version):
+        try:
+            cache_stats.record(family, CACHE_MISS)
+            return _compute_and_store(family, key, compute, timeout, version)
+        finally:
+            # Release only our own lock; it may have expired and been taken over
+            if cache.get(lock_key, version=version) == token:
+                cache.delete(lock_key, version=version)
+
+    if stale is not None:
+        cache_stats.record(family, CACHE_STALE)
+        return stale['value']
+
+    entry = _wait_for_entry(key, version)
+    if entry is not None:
+        cache_stats.record(family, CACHE_HIT)
+        _store_local(family, key, version, entry)
+        return entry['value']
+
+    # The lock holder is slow or failed; compute rather than fail the request
+    cache_stats.record(family, CACHE_MISS)
+    return _compute_and_store(family, key, compute, timeout, version)
@@ -0,0 +1,143 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class TimestampCursorPagination(BasePagination):
+    """
+    Keyset pagination over (timestamp, id), newest first.
+
+    Each page is fetched with a `WHERE (timestamp, id) < cursor` predicate instead of an
+    OFFSET, so deep pages cost the same as the first one. The response body stays a plain
+    list for existing clients; the next page is advertised through a `Link: <...>; rel="next"`
+    header and the raw cursor in `X-Next-Cursor`.
+
+    When the queryset carries a `search_rank` annotation, results are ordered by relevance
+    first and the rank becomes the leading keyset field.
+    """
+    page_size = settings.STORIES_PAGE_SIZE
+    max_page_size = settings.STORIES_MAX_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+    keyset_fields = ('timestamp', 'id') # All descending
+    rank_annotation = 'search_rank'
+    cursor_value_parsers = {'timestamp': datetime.fromisoformat, 'id': int, 'search_rank': float}
+
+    def get_keyset_fields(self, queryset):
+        if self.rank_annotation in queryset.query.annotations:
+            return (self.rank_annotation, *self.keyset_fields)
+        return self.keyset_fields
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = self.get_keyset_fields(queryset)
+        position = self.decode_cursor(request)
+
+        queryset = queryset.order_by(*[f'-{field}' for field in self.fields])
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(position))
+
+        # Fetch one extra row to learn whether another page exists
+        page = list(queryset[:self.page_size + 1])
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.next_cursor = self.encode_cursor(self.get_position(page[-1])) if self.has_next else None
+        return page
+
+    def get_keyset_filter(self, position):
+        """(f1, f2, ...) < (v1, v2, ...) expanded as f1 < v1 OR (f1 = v1 AND f2 < v2) OR ..."""
+        condition = Q()
+        for index, field in enumerate(self.fields):
+            equal_prefix = dict(zip(self.fields[:index], position[:index]))
+            condition |= Q(**equal_prefix, **{f'{field}__lt': position[index]})
+        return condition
+
+    def get_position(self, item):
+        """Keyset values of a page item; works for model instances and .values() rows"""
+        if isinstance(item, dict):
+            return [item[field] for field in self.fields]
+        return [getattr(item, field) for field in self.fields]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, position):
+        raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in position])
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(self.fields):
+                raise ValueError('Cursor does not match the current ordering')
+            return [self.cursor_value_parsers[field](value) for field, value in zip(self.fields, values)]
+        except (TypeError, ValueError, UnicodeError, binascii.Error):
+            raise NotFound(self.invalid_cursor_message)
+
+    def build_next_link(self, request, next_cursor):
+        return replace_query_param(request.build_absolute_uri(), self.cursor_query_param, next_cursor)
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        return self.build_next_link(self.request, self.next_cursor)
+
+    def get_cacheable_headers(self):
+        """Pagination headers that are the same for every client; add_link_header() completes them"""
+        return {'X-Next-Cursor': self.next_cursor} if self.next_cursor else {}
+
+    def add_link_header(self, request, headers):
+        """
+        Headers plus the Link to the next page, built from X-Next-Cursor for this request,
+        so a cached page never replays another client's scheme and host.
+        """
+        next_cursor = headers.get('X-Next-Cursor')
+        if not next_cursor:
+            return headers
+        return {**headers, 'Link': f'<{self.build_next_link(request, next_cursor)}>; rel="next"'}
+
+    def get_pagination_headers(self):
+        return self.add_link_header(self.request, self.get_cacheable_headers())
+
+    def get_paginated_response(self, data):
+        return Response(data, headers=self.get_pagination_headers())
+
+    def get_paginated_response_schema(self, schema):
+        return schema
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque cursor from the X-Next-Cursor header of the previous page.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
@@ -1,5 +1,8 @@
+import orjson
 from rest_framework import serializers
-from core.models import Story, KeywordMention, DomainStats
+from datetime import timedelta
+from django.utils import timezone
+from core.models import Story, KeywordMention, DomainStats, TrendRollup
 
 class StorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -10,6 +13,36 @@ class StorySerializer(serializers.ModelSerializer):
             'is_ai_related'
         ]
 
+# Fast read-only path for story lists. Rows come from
+# Story.objects.values(*StorySerializer.Meta.fields), i.e. plain column tuples zipped
+# with field names, and are encoded by orjson straight to bytes without any per-field
+# DRF work. OPT_UTC_Z keeps datetimes in the same ISO 8601 form DRF's DateTimeField emits.
+STORY_ROW_FIELDS = StorySerializer.Meta.fields
+STORY_JSON_OPTIONS = orjson.OPT_UTC_Z
+
+def encode_story_rows(rows):
+    """Encode a list of story value dicts as a JSON array (bytes)"""
+    return orjson.dumps(rows, option=STORY_JSON_OPTIONS)
+
+def encode_story_row_line(row):
+    """Encode one story value dict as an NDJSON line (bytes)"""
+    return orjson.dumps(row, option=STORY_JSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+class SnapshotPointSerializer(serializers.Serializer):
+    fetched_at = serializers.DateTimeField()
+    score = serializers.IntegerField()
+    comments_count = serializers.IntegerField()
+    score_per_hour = serializers.FloatField(allow_null=True, help_text='Change since the previous point; null for the first.')
+    comments_per_hour = serializers.FloatField(allow_null=True)
+
+class StoryVelocitySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    points = SnapshotPointSerializer(many=True, help_text='One point per recorded change, oldest first.')
+
+def encode_json(data):
+    """Encode already-serialized data (e.g. serializer.data) as JSON bytes"""
+    return orjson.dumps(data, option=STORY_JSON_OPTIONS)
+
 class KeywordMentionSerializer(serializers.ModelSerializer):
     class Meta:
         model = KeywordMention
@@ -23,3 +56,57 @@ class DomainStatsSerializer(serializers.ModelSerializer):
 class KeywordFrequencySerializer(serializers.Serializer):
     keyword = serializers.CharField()
     count = serializers.IntegerField()
+
+class StoryListQuerySerializer(serializers.Serializer):
+    """Filters of the stories list and export endpoints; they combine with AND"""
+    search = serializers.CharField(
+        required=False,
+        help_text='Full-text search over titles (web search syntax: "quoted phrases", or, -exclude). '
+                  'The list endpoint then orders results by relevance.',
+    )
+    keyword = serializers.CharField(required=False, help_text='Case-insensitive substring of the title.')
+    is_ai_related = serializers.BooleanField(required=False)
+    domain = serializers.CharField(required=False, help_text='Case-insensitive substring of the domain.')
+    start_date = serializers.DateTimeField(required=False, help_text='Stories posted at or after this time.')
+    end_date = serializers.DateTimeField(required=False, help_text='Stories posted at or before this time.')
+
+# Range served when a trends request gives no start
+TREND_DEFAULT_SPANS = {
+    TrendRollup.GRANULARITY_HOUR: timedelta(days=7),
+    TrendRollup.GRANULARITY_DAY: timedelta(days=30),
+}
+
+class TrendQuerySerializer(serializers.Serializer):
+    """Query parameters of the trends endpoint"""
+    dimension = serializers.ChoiceField(choices=TrendRollup.DIMENSION_CHOICES, default=TrendRollup.DIMENSION_KEYWORD)
+    granularity = serializers.ChoiceField(choices=TrendRollup.GRANULARITY_CHOICES, default=TrendRollup.GRANULARITY_DAY)
+    values = serializers.CharField(
+        required=False, help_text='Comma-separated keywords or domains. Defaults to the top values in the range.'
+    )
+    start = serializers.DateTimeField(required=False, help_text='Inclusive. Defaults to 7 days (hourly) or 30 days (daily) before end.')
+    end = serializers.DateTimeField(required=False, help_text='Exclusive. Defaults to now.')
+    limit = serializers.IntegerField(default=10, min_value=1, max_value=100, help_text='Series returned when values is omitted.')
+
+    def validate(self, attrs):
+        attrs['end'] = attrs.get('end') or timezone.now()
+        attrs['start'] = attrs.get('start') or attrs['end'] - TREND_DEFAULT_SPANS[attrs['granularity']]
+        if attrs['start'] >= attrs['end']:
+            raise serializers.ValidationError('start must be before end')
+        attrs['values'] = sorted({value.strip() for value in attrs.get('values', '').split(',') if value.strip()})
+        return attrs
+
+class TrendPointSerializer(serializers.Serializer):
+    bucket = serializers.DateTimeField()
+    count = serializers.IntegerField()
+
+class TrendSeriesSerializer(serializers.Serializer):
+    value = serializers.CharField()
+    total = serializers.IntegerField()
+    points = TrendPointSerializer(many=True, help_text='Non-empty buckets only, oldest first.')
+
+class TrendsSerializer(serializers.Serializer):
+    dimension = serializers.CharField()
+    granularity = serializers.CharField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    series = TrendSeriesSerializer(many=True)
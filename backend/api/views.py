@@ -1,28 +1,113 @@
 from django.utils import timezone
-from django.db.models import Count, Avg
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import FloatField, Sum
+from django.db.models.functions import Cast
+from django.contrib.postgres.search import SearchQuery, SearchRank
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.core.cache import cache
-
-from core.models import Story, KeywordMention, DomainStats
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from core.models import (
+    Story, DomainStats, KeywordCount, InsightsSummary, TrendRollup, STORY_SEARCH_CONFIG, story_search_vector,
+)
+from .caching import (
+    STORY_FAMILY, STORY_VELOCITY_FAMILY, cache_stats, get_or_compute, make_cache_key,
+    story_cache_key, story_velocity_cache_key,
+    normalize_bool, normalize_csv, normalize_datetime, normalize_int, normalize_opaque,
+    normalize_positive_int, normalize_search, normalize_text,
+)
+from .pagination import TimestampCursorPagination
 from .serializers import (
     StorySerializer, KeywordMentionSerializer, 
-    DomainStatsSerializer, KeywordFrequencySerializer
+    DomainStatsSerializer, KeywordFrequencySerializer, TrendQuerySerializer, TrendsSerializer,
+    StoryListQuerySerializer, StoryVelocitySerializer,
+    STORY_ROW_FIELDS, encode_json, encode_story_rows, encode_story_row_line,
 )
 
+EXPORT_CHUNK_SIZE = 2000 # Rows fetched per server-side cursor round trip
+
+# Query params that shape each cached response, with their canonical forms
+STORY_LIST_CACHE_PARAMS = {
+    'search': normalize_search,
+    'keyword': normalize_text,
+    'is_ai_related': normalize_bool,
+    'domain': normalize_text,
+    'start_date': normalize_datetime,
+    'end_date': normalize_datetime,
+    'cursor': normalize_opaque,
+    'page_size': normalize_positive_int,
+}
+AI_RELATED_CACHE_PARAMS = {
+    'cursor': normalize_opaque,
+    'page_size': normalize_positive_int,
+}
+TOP_DOMAINS_CACHE_PARAMS = {
+    'limit': normalize_int,
+}
+TRENDS_CACHE_PARAMS = {
+    'dimension': normalize_text,
+    'granularity': normalize_text,
+    'values': normalize_csv,
+    'start': normalize_datetime,
+    'end': normalize_datetime,
+    'limit': normalize_positive_int,
+}
+
+STORY_LIST_CACHE_TIMEOUT = 60 * 5 # 5 minutes
+STORY_CACHE_TIMEOUT = 60 * 60 * 24 # 24 hours
+INSIGHTS_CACHE_TIMEOUT = 60 * 10 # 10 minutes
+
+def velocity_points(snapshots):
+    """Annotate (fetched_at, score, comments_count) rows with per-hour change since the previous row"""
+    points = []
+    previous = None
+    for fetched_at, score, comments_count in snapshots:
+        point = {
+            'fetched_at': fetched_at, 'score': score, 'comments_count': comments_count,
+            'score_per_hour': None, 'comments_per_hour': None,
+        }
+        if previous is not None:
+            hours = (fetched_at - previous['fetched_at']).total_seconds() / 3600
+            if hours > 0:
+                point['score_per_hour'] = round((score - previous['score']) / hours, 2)
+                point['comments_per_hour'] = round((comments_count - previous['comments_count']) / hours, 2)
+        points.append(point)
+        previous = point
+    return points
+
+def json_payload(data):
+    """Encode serialized data once into the cacheable payload served by json_bytes_response"""
+    return {'content': encode_json(data), 'headers': {}}
+
+def json_bytes_response(payload):
+    """Wrap a pre-encoded JSON payload; it bypasses DRF rendering"""
+    return HttpResponse(payload['content'], content_type='application/json', headers=payload['headers'])
+
 class StoryViewSet(viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for stories
     """
     queryset = Story.objects.all().order_by('-timestamp')
     serializer_class = StorySerializer
+    pagination_class = TimestampCursorPagination
     
     def get_queryset(self):
         queryset = Story.objects.all().order_by('-timestamp')
         
         # Apply filters if provided
+        search = self.request.query_params.get('search')
+        if search:
+            # Full-text match served by the title search index, ranked by relevance
+            query = SearchQuery(search, config=STORY_SEARCH_CONFIG, search_type='websearch')
+            queryset = queryset.annotate(
+                search_vector=story_search_vector(),
+                # ts_rank is float4; cast so the rank survives the cursor round-trip exactly
+                search_rank=Cast(SearchRank(story_search_vector(), query), FloatField()),
+            ).filter(search_vector=query)
+
         keyword = self.request.query_params.get('keyword')
         if keyword:
             queryset = queryset.filter(title__icontains=keyword)
@@ -46,44 +131,102 @@ class StoryViewSet(viewsets.ReadOnlyModelViewSet):
             
         return queryset
     
+    @extend_schema(parameters=[StoryListQuerySerializer])
     def list(self, request, *args, **kwargs):
-        """Cache the stories list to improve performance"""
-        cache_key = 'stories_list'
-        # Generate a unique cache key based on query parameters
-        if request.query_params:
-            param_str = "&".join([f"{k}={v}" for k, v in request.query_params.items()])
-            cache_key = f"{cache_key}_{param_str}"
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data)
-        
-        queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        cache.set(cache_key, serializer.data, timeout=60*5)  # Cache for 5 minutes
-        return Response(serializer.data)
-    
+        """Cache each page of the stories list to improve performance"""
+        cache_key = make_cache_key('stories_list', request.query_params, STORY_LIST_CACHE_PARAMS)
+        page = get_or_compute('stories_list', cache_key, lambda: self.render_story_page_payload(self.get_queryset()),
+                              timeout=STORY_LIST_CACHE_TIMEOUT)
+        return self.story_page_response(page)
+
+    def render_story_page_payload(self, queryset):
+        """Cacheable form of render_story_page"""
+        content, headers = self.render_story_page(queryset)
+        return {'content': content, 'headers': headers}
+
+    def story_page_response(self, page):
+        """Serve a cached story page with the Link header built for this request"""
+        return json_bytes_response({**page, 'headers': self.paginator.add_link_header(self.request, page['headers'])})
+
+    def render_story_page(self, queryset):
+        """Paginate and encode a story queryset via the fast path. Returns (content bytes, headers)."""
+        keyset_only = [f for f in self.paginator.get_keyset_fields(queryset) if f not in STORY_ROW_FIELDS]
+        page = self.paginate_queryset(queryset.values(*STORY_ROW_FIELDS, *keyset_only))
+        for row in page:
+            for field in keyset_only:
+                del row[field] # Needed for the cursor only, not part of the Story schema
+        return encode_story_rows(page), self.paginator.get_cacheable_headers()
+
     def retrieve(self, request, *args, **kwargs):
         """Cache individual story retrieval"""
-        pk = kwargs.get('pk')
-        cache_key = f"story_{pk}"
-        cached_story = cache.get(cache_key)
+        pk = normalize_int(kwargs.get('pk'))
+        if pk is None:
+            return Response(self.get_serializer(self.get_object()).data) # Not a story ID; 404s without a cache entry
 
-        if cached_story:
-            return Response(cached_story)
+        # Cache the encoded story so hits skip serialization entirely
+        payload = get_or_compute(STORY_FAMILY, story_cache_key(pk),
+                                 lambda: json_payload(self.get_serializer(self.get_object()).data),
+                                 timeout=STORY_CACHE_TIMEOUT)
+        return json_bytes_response(payload)
 
-        instance = self.get_object()
-        serializer = self.get_serializer(instance)
-        # Cache the serialized data for consistency with list view if that's preferred
-        cache.set(cache_key, serializer.data, timeout=60 * 60 * 24) # Cache for 24 hours
-        return Response(serializer.data)
+    @extend_schema(responses=StoryVelocitySerializer)
+    @action(detail=True, methods=['get'])
+    def velocity(self, request, pk=None):
+        """Get a story's score and comment history with per-hour rates of change"""
+        story_id = normalize_int(pk)
+        if story_id is None:
+            self.get_object() # Not a story ID; 404s without a cache entry
 
+        def compute():
+            story = self.get_object()
+            snapshots = story.snapshots.order_by('fetched_at').values_list('fetched_at', 'score', 'comments_count')
+            return json_payload(StoryVelocitySerializer({'id': story.id, 'points': velocity_points(snapshots)}).data)
+
+        payload = get_or_compute(STORY_VELOCITY_FAMILY, story_velocity_cache_key(story_id), compute,
+                                 timeout=STORY_LIST_CACHE_TIMEOUT)
+        return json_bytes_response(payload)
+
+    @extend_schema(responses=StorySerializer(many=True))
     @action(detail=False, methods=['get'])
     def ai_related(self, request):
         """Get only AI-related stories"""
         queryset = Story.objects.filter(is_ai_related=True).order_by('-timestamp')
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        cache_key = make_cache_key('stories_ai_related', request.query_params, AI_RELATED_CACHE_PARAMS)
+        page = get_or_compute('stories_ai_related', cache_key, lambda: self.render_story_page_payload(queryset),
+                              timeout=STORY_LIST_CACHE_TIMEOUT)
+        return self.story_page_response(page)
+
+    @extend_schema(
+        parameters=[StoryListQuerySerializer],
+        responses={(200, 'application/x-ndjson'): OpenApiTypes.STR},
+        description='One JSON-encoded story per line, using the same filters as the list endpoint.',
+    )
+    @action(detail=False, methods=['get'], pagination_class=None)
+    def export(self, request):
+        """
+        Stream every story matching the list filters as newline-delimited JSON.
+        Rows are read with a server-side cursor and encoded one at a time, so the
+        full result set is never held in memory.
+        """
+        queryset = self.get_queryset().order_by('-timestamp', '-id').values(*STORY_ROW_FIELDS)
+        if isinstance(request._request, ASGIRequest):
+            # Under ASGI a sync generator would be drained into a list before sending
+            rows = self._aexport_rows(queryset)
+        else:
+            rows = self._export_rows(queryset)
+        response = StreamingHttpResponse(rows, content_type='application/x-ndjson')
+        response['Content-Disposition'] = 'attachment; filename="stories.ndjson"'
+        return response
+
+    @staticmethod
+    def _export_rows(queryset):
+        for row in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield encode_story_row_line(row)
+
+    @staticmethod
+    async def _aexport_rows(queryset):
+        async for row in queryset.aiterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield encode_story_row_line(row)
 
 class InsightsViewSet(viewsets.ViewSet):
     """
@@ -93,55 +236,84 @@ class InsightsViewSet(viewsets.ViewSet):
     @action(detail=False, methods=['get'])
     def keyword_frequency(self, request):
         """Get frequency of AI-related keywords"""
-        cache_key = 'ai_keywords'
-        cached_data = cache.get(cache_key)
-        
-        if cached_data:
-            return Response(cached_data)
-        
-        # Count keyword occurrences
-        keyword_counts = KeywordMention.objects.values('keyword').annotate(
-            count=Count('keyword')
-        ).order_by('-count')
-        
-        serializer = KeywordFrequencySerializer(keyword_counts, many=True)
-        cache.set(cache_key, serializer.data, timeout=60*10)  # Cache for 10 minutes
-        
-        return Response(serializer.data)
+        def compute():
+            # Counts are maintained at ingest, so this is an index scan rather than a GROUP BY
+            keyword_counts = KeywordCount.objects.filter(count__gt=0).values('keyword', 'count').order_by('-count', 'keyword')
+            return json_payload(KeywordFrequencySerializer(keyword_counts, many=True).data)
+
+        payload = get_or_compute('ai_keywords', 'ai_keywords', compute, timeout=INSIGHTS_CACHE_TIMEOUT)
+        return json_bytes_response(payload)
     
     @action(detail=False, methods=['get'])
     def top_domains(self, request):
         """Get top domains by frequency"""
         limit = int(request.query_params.get('limit', 10))
-        cache_key = f'top_domains_limit_{limit}'
-        
-        cached_data = cache.get(cache_key)
-        if cached_data:
-            return Response(cached_data) 
-        
-        domains = DomainStats.objects.all().order_by('-count')[:limit]
-        serializer = DomainStatsSerializer(domains, many=True)
-        
-        cache.set(cache_key, serializer.data, timeout=60*10)  # Cache for 10 minutes
-        
-        return Response(serializer.data)
+        cache_key = make_cache_key('top_domains', {'limit': str(limit)}, TOP_DOMAINS_CACHE_PARAMS)
+
+        def compute():
+            domains = DomainStats.objects.all().order_by('-count')[:limit]
+            return json_payload(DomainStatsSerializer(domains, many=True).data)
+
+        payload = get_or_compute('top_domains', cache_key, compute, timeout=INSIGHTS_CACHE_TIMEOUT)
+        return json_bytes_response(payload)
     
     @action(detail=False, methods=['get'])
     def stats_summary(self, request):
         """Get overall statistics summary"""
-        total_stories = Story.objects.count()
-        ai_related_count = Story.objects.filter(is_ai_related=True).count()
-        domains_count = DomainStats.objects.count()
-        avg_score = Story.objects.all().aggregate(Avg('score'))['score__avg'] or 0
-        avg_comments = Story.objects.all().aggregate(Avg('comments_count'))['comments_count__avg'] or 0
-        
+        payload = get_or_compute('stats_summary', 'stats_summary',
+                                 lambda: json_payload(self._compute_stats_summary()),
+                                 timeout=INSIGHTS_CACHE_TIMEOUT)
+        return json_bytes_response(payload)
+
+    @staticmethod
+    def _compute_stats_summary():
+        # Running totals maintained at ingest: one single-row read instead of five aggregates
+        summary = InsightsSummary.objects.filter(pk=InsightsSummary.SINGLETON_PK).first() or InsightsSummary()
+        total_stories = summary.total_stories
+
         data = {
             'total_stories': total_stories,
-            'ai_related_count': ai_related_count,
-            'ai_percentage': (ai_related_count / total_stories * 100) if total_stories > 0 else 0,
-            'unique_domains': domains_count,
-            'avg_score': round(avg_score, 2),
-            'avg_comments': round(avg_comments, 2),
+            'ai_related_count': summary.ai_related_count,
+            'ai_percentage': (summary.ai_related_count / total_stories * 100) if total_stories > 0 else 0,
+            'unique_domains': summary.unique_domains,
+            'avg_score': round(summary.score_sum / total_stories, 2) if total_stories > 0 else 0,
+            'avg_comments': round(summary.comments_sum / total_stories, 2) if total_stories > 0 else 0,
         }
-        
-        return Response(data)
+        return data
+
+    @extend_schema(parameters=[TrendQuerySerializer], responses=TrendsSerializer)
+    @action(detail=False, methods=['get'])
+    def trends(self, request):
+        """Get keyword or domain counts per hour or day over a time range"""
+        query = TrendQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        cache_key = make_cache_key('trends', request.query_params, TRENDS_CACHE_PARAMS)
+        payload = get_or_compute('trends', cache_key, lambda: json_payload(self._compute_trends(**query.validated_data)),
+                                 timeout=INSIGHTS_CACHE_TIMEOUT)
+        return json_bytes_response(payload)
+
+    @staticmethod
+    def _compute_trends(dimension, granularity, values, start, end, limit):
+        # Reads only the rollups in range, so cost follows the range and not the number of stories
+        rows = TrendRollup.objects.filter(
+            dimension=dimension, granularity=granularity, bucket__gte=start, bucket__lt=end
+        )
+        if not values:
+            top = rows.values('value').annotate(total=Sum('count')).order_by('-total', 'value')[:limit]
+            values = [row['value'] for row in top]
+
+        series = {value: {'value': value, 'total': 0, 'points': []} for value in values}
+        points = rows.filter(value__in=values).order_by('value', 'bucket').values_list('value', 'bucket', 'count')
+        for value, bucket, count in points:
+            series[value]['points'].append({'bucket': bucket, 'count': count})
+            series[value]['total'] += count
+
+        return TrendsSerializer({
+            'dimension': dimension, 'granularity': granularity, 'start': start, 'end': end,
+            'series': list(series.values()),
+        }).data
+
+    @action(detail=False, methods=['get'])
+    def cache_stats(self, request):
+        """Get API cache hit/miss counters for this worker process"""
+        return Response(cache_stats.snapshot())
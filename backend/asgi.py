@@ -2,4 +2,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+from core.startup import run_startup_tasks # After Django is set up
+
+run_startup_tasks() # No-op unless STARTUP_FETCH_ENABLED; never blocks the worker
@@ -0,0 +1,2 @@
+# Micro-benchmarks for hot paths. Run from the backend directory, e.g.:
+#   python -m benchmarks.bench_keyword_detector
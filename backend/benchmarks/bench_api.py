@@ -0,0 +1,250 @@
+"""
+Benchmark: latency, throughput and SQL queries of the read API at several data scales.
+
+For each scale, Story and KeywordMention rows are seeded into the configured database
+and the ingest-maintained aggregates (DomainStats, KeywordCount, TrendRollup,
+InsightsSummary) are rebuilt from them, inside a transaction that is rolled back
+afterwards. Every endpoint is then requested through the full Django stack
+(django.test.Client) with a cold cache (flushed before each request) and a warm one
+(primed once). The configured cache is flushed, so point the benchmark at a
+development cache.
+
+Endpoints: /api/stories/ with each filter get_queryset supports, alone and combined,
+plus a second cursor page; /api/stories/ai_related/; and every /api/insights/ action.
+
+Results can be written as a JSON baseline and compared against an earlier one; with
+--max-regression the script exits non-zero when a median latency grows by more than
+that fraction, or an endpoint issues more SQL queries than in the baseline.
+
+Usage (from the backend directory, with the database and cache reachable):
+    python -m benchmarks.bench_api [--scales 10000 100000 1000000] [--requests 50]
+                                   [--output benchmarks/baseline_api.json]
+                                   [--baseline benchmarks/baseline_api.json --max-regression 0.25]
+"""
+import argparse
+import json
+import platform
+import statistics
+import time
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+
+from benchmarks.utils import setup_django
+
+FIRST_STORY_ID = 10_000_000
+SEED_BATCH_SIZE = 10_000
+SEED_SPAN = timedelta(days=90) # Seeded stories are spread over this period, ending now
+DOMAINS = 2_000
+AUTHORS = 5_000
+TITLES = (
+    ('New {n} large language model beats GPT-4 on reasoning', ['llm', 'large language model', 'gpt-4']),
+    ('Training a neural network on {n} GPUs', ['neural network']),
+    ('OpenAI releases ChatGPT update {n}', ['openai', 'chatgpt']),
+    ('Stable Diffusion {n} runs on a laptop', ['stable diffusion', 'diffusion']),
+    ('The economics of {n} fibre networks', []),
+    ('Show HN: A {n} line text editor', []),
+    ('Why we moved {n} services back to a monolith', []),
+    ('Postgres {n} release notes', []),
+    ('A history of the {n} calculator', []),
+)
+
+
+def seed(count, end):
+    """Seed `count` stories with their keyword mentions, then rebuild the aggregates"""
+    from core.models import KeywordMention, Story
+    from tasks import rebuild_insights
+
+    step = SEED_SPAN / count
+    for offset in range(0, count, SEED_BATCH_SIZE):
+        stories, mentions = [], []
+        for i in range(offset, min(offset + SEED_BATCH_SIZE, count)):
+            title, keywords = TITLES[i % len(TITLES)]
+            story_id = FIRST_STORY_ID + i
+            domain = f'bench{i % DOMAINS}.example.com'
+            stories.append(Story(
+                id=story_id, title=title.format(n=i), url=f'https://{domain}/{i}', domain=domain,
+                score=i % 1000, comments_count=i % 300, author=f'user{i % AUTHORS}',
+                timestamp=end - step * (count - i), is_ai_related=bool(keywords),
+            ))
+            mentions.extend(KeywordMention(keyword=keyword, story_id=story_id) for keyword in keywords)
+        Story.objects.bulk_create(stories, batch_size=SEED_BATCH_SIZE)
+        KeywordMention.objects.bulk_create(mentions, batch_size=SEED_BATCH_SIZE)
+    rebuild_insights()
+
+
+def analyze():
+    """Refresh planner statistics so queries are planned for the seeded row counts"""
+    from django.db import connection
+    from core.models import DomainStats, KeywordCount, KeywordMention, Story, TrendRollup
+
+    with connection.cursor() as cursor:
+        for model in (Story, KeywordMention, DomainStats, KeywordCount, TrendRollup):
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(model._meta.db_table)}')
+
+
+def endpoints(client, end):
+    """(name, path) of every benchmarked request"""
+    week_ago = (end - timedelta(days=7)).isoformat()
+    month_ago = (end - timedelta(days=30)).isoformat()
+    stories = [
+        ('stories', {}),
+        ('stories page_size=100', {'page_size': 100}),
+        ('stories search', {'search': 'language model'}),
+        ('stories keyword', {'keyword': 'diffusion'}),
+        ('stories is_ai_related', {'is_ai_related': 'true'}),
+        ('stories domain', {'domain': 'bench42.example.com'}),
+        ('stories date range', {'start_date': month_ago, 'end_date': week_ago}),
+        ('stories combined', {'is_ai_related': 'true', 'keyword': 'GPT', 'start_date': month_ago}),
+        ('stories search+filters', {'search': 'neural network', 'is_ai_related': 'true', 'start_date': month_ago}),
+    ]
+    paths = [(name, f"/api/stories/?{urlencode(params)}" if params else '/api/stories/') for name, params in stories]
+
+    next_cursor = client.get('/api/stories/').headers.get('X-Next-Cursor')
+    if next_cursor:
+        paths.append(('stories next page', f"/api/stories/?{urlencode({'cursor': next_cursor})}"))
+
+    return paths + [
+        ('ai_related', '/api/stories/ai_related/'),
+        ('insights keyword_frequency', '/api/insights/keyword_frequency/'),
+        ('insights top_domains', '/api/insights/top_domains/?limit=10'),
+        ('insights stats_summary', '/api/insights/stats_summary/'),
+        ('insights trends keyword/day', '/api/insights/trends/'),
+        ('insights trends domain/hour', '/api/insights/trends/?dimension=domain&granularity=hour'),
+        ('insights trends values', '/api/insights/trends/?values=llm,openai,chatgpt&granularity=day'),
+        ('insights cache_stats', '/api/insights/cache_stats/'),
+    ]
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def flush_cache():
+    from django.core.cache import cache
+    from api.caching import clear_local_caches
+
+    cache.clear()
+    clear_local_caches()
+
+
+def measure(client, path, requests, cold):
+    """Latency, throughput and queries per request of `requests` sequential GETs"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    if not cold:
+        client.get(path) # Prime the cache
+    latencies, queries = [], []
+    for _ in range(requests):
+        if cold:
+            flush_cache()
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = client.get(path)
+            latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise SystemExit(f"GET {path} returned {response.status_code}")
+        queries.append(len(captured))
+    return {
+        'requests': requests,
+        'throughput_rps': round(requests / sum(latencies), 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'queries': round(statistics.fmean(queries), 2),
+    }
+
+
+def run_scale(count, requests):
+    """Seed `count` stories, benchmark every endpoint cold and warm, roll back; returns the results"""
+    from django.db import transaction
+    from django.test import Client
+
+    client = Client()
+    end = datetime.now().replace(minute=0, second=0, microsecond=0)
+    results = {}
+    with transaction.atomic():
+        start = time.perf_counter()
+        seed(count, end)
+        analyze()
+        print(f"\n{count} stories (seeded in {time.perf_counter() - start:.1f}s)")
+        print(f"{'endpoint':<32} {'cache':<5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8}")
+
+        flush_cache()
+        for name, path in endpoints(client, end):
+            results[name] = {'path': path}
+            for mode in ('cold', 'warm'):
+                stats = measure(client, path, requests, cold=mode == 'cold')
+                results[name][mode] = stats
+                print(
+                    f"{name:<32} {mode:<5} {stats['throughput_rps']:>8.1f} {stats['p50_ms']:>8.2f} "
+                    f"{stats['p95_ms']:>8.2f} {stats['p99_ms']:>8.2f} {stats['queries']:>8g}"
+                )
+        transaction.set_rollback(True)
+    flush_cache() # Entries computed from the rolled-back rows must not outlive them
+    return results
+
+
+def compare(results, baseline, max_regression):
+    """Print changes against a baseline; returns the regressions beyond max_regression"""
+    regressions = []
+    print(f"\n{'scale':>8} {'endpoint':<32} {'cache':<5} {'p50 ms':>17} {'change':>8} {'queries':>11}")
+    for scale, scale_results in results.items():
+        for name, endpoint in scale_results.items():
+            previous = baseline.get('results', {}).get(scale, {}).get(name)
+            if previous is None:
+                continue
+            for mode in ('cold', 'warm'):
+                old, new = previous[mode], endpoint[mode]
+                change = (new['p50_ms'] - old['p50_ms']) / old['p50_ms'] if old['p50_ms'] else 0.0
+                print(
+                    f"{scale:>8} {name:<32} {mode:<5} {old['p50_ms']:>8.2f} -> {new['p50_ms']:>5.2f} {change:>+8.1%} "
+                    f"{old['queries']:>4g} -> {new['queries']:<4g}"
+                )
+                if max_regression is not None and change > max_regression:
+                    regressions.append(f"{name} ({mode}, {scale} stories): p50 {change:+.1%}")
+                if new['queries'] > old['queries']:
+                    regressions.append(f"{name} ({mode}, {scale} stories): {old['queries']:g} -> {new['queries']:g} queries")
+    return regressions
+
+
+def run(scales, requests, output, baseline_path, max_regression):
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment() # Lets the test client's host through ALLOWED_HOSTS
+    results = {str(count): run_scale(count, requests) for count in scales}
+    report = {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'requests_per_endpoint': requests,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+        },
+        'results': results,
+    }
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nWrote results to {output}")
+
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), max_regression)
+        if regressions and max_regression is not None:
+            raise SystemExit("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scales', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint and cache state')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--baseline', help='Compare against results written earlier with --output')
+    parser.add_argument('--max-regression', type=float, default=None,
+                        help='Fail when a p50 grows by more than this fraction (e.g. 0.25) or queries increase')
+    args = parser.parse_args()
+    setup_django()
+    run(args.scales, args.requests, args.output, args.baseline, args.max_regression)
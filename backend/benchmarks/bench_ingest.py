@@ -0,0 +1,160 @@
+"""
+Benchmark: end-to-end ingest throughput against a local stand-in for the HN API.
+
+Starts benchmarks.fake_hn in a child process and runs the real fetch pipeline
+(fetch_top_stories_logic: feed and item fetches, keyword detection, DB writes, feed
+ranks, comment crawl and cache invalidation) against it. Each run executes inside a
+transaction that is rolled back, so every run ingests into the same starting state and
+the benchmark leaves no data behind.
+
+Reported per run: stories/sec, p50/p99 latency of item fetches as seen by the pipeline
+(including rate-limit and concurrency-slot waits), upstream requests and errors, and SQL
+statements by kind with their total time. The HN rate limit defaults to off here so the
+numbers measure the pipeline; pass --rate-limit to include it.
+
+Usage (from the backend directory, with the database and cache reachable):
+    python -m benchmarks.bench_ingest [--stories 2000] [--comments-per-story 0] [--runs 3]
+                                      [--latency lognormal] [--latency-ms 20] [--error-rate 0.0]
+                                      [--min-stories-per-sec 200]
+
+With --min-stories-per-sec the script exits non-zero when the median throughput falls
+below it, so it can guard against ingest regressions before a deploy.
+"""
+import argparse
+import logging
+import statistics
+import time
+from collections import Counter
+from unittest import mock
+
+from benchmarks.fake_hn import LATENCY_DISTRIBUTIONS, fake_hn_process, fetch_stats
+from benchmarks.utils import setup_django
+
+# Statements issued by the benchmark's own rollback transaction, not by the pipeline
+TRANSACTION_STATEMENTS = {'SAVEPOINT', 'RELEASE', 'ROLLBACK'}
+
+
+def percentile(samples, fraction):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class StatementCounter:
+    """connection.execute_wrapper hook counting statements by kind and timing them"""
+
+    def __init__(self):
+        self.kinds = Counter()
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        kind = sql.lstrip().split(None, 1)[0].upper()
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if kind not in TRANSACTION_STATEMENTS:
+                self.kinds[kind] += 1
+                self.seconds += time.perf_counter() - start
+
+    @property
+    def total(self):
+        return sum(self.kinds.values())
+
+
+def ingest_once(stories):
+    """Run one full fetch cycle of the top feed; returns its measurements"""
+    from django.db import connection, transaction
+    from services.hacker_news import AsyncHackerNewsClient, reset_flow_control
+    import tasks
+
+    reset_flow_control()
+    item_latencies = []
+    get_json = AsyncHackerNewsClient._get_json
+
+    async def timed_get_json(client, path):
+        start = time.perf_counter()
+        try:
+            return await get_json(client, path)
+        finally:
+            if path.startswith('item/'):
+                item_latencies.append(time.perf_counter() - start)
+
+    statements = StatementCounter()
+    with transaction.atomic():
+        with connection.execute_wrapper(statements), \
+                mock.patch.object(AsyncHackerNewsClient, '_get_json', timed_get_json):
+            start = time.perf_counter()
+            result = tasks.fetch_top_stories_logic({'mode': 'full', 'feeds': {'top': stories}})
+            elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+
+    if result.get('status') != 'success':
+        raise SystemExit(f"Ingest failed: {result.get('reason', 'unknown error')}")
+    return {
+        'seconds': elapsed,
+        'stories': result['processed_stories'],
+        'failed': result['failed_fetches'],
+        'comments': result.get('comments', 0),
+        'p50': percentile(item_latencies, 0.50),
+        'p99': percentile(item_latencies, 0.99),
+        'statements': statements,
+    }
+
+
+def run(stories, comments_per_story, latency, latency_ms, error_rate, runs, rate_limit, min_stories_per_sec):
+    from django.conf import settings
+
+    with fake_hn_process(stories, comments_per_story, latency, latency_ms, error_rate) as base_url:
+        settings.HN_API_BASE_URL = base_url
+        settings.HN_RATE_LIMIT = rate_limit
+        print(
+            f"{stories} stories x {comments_per_story} comments, {latency} latency {latency_ms:g}ms, "
+            f"{error_rate:.1%} errors, rate limit {rate_limit or 'off'}"
+        )
+        print(
+            f"{'run':>4} {'stories':>8} {'failed':>7} {'comments':>9} {'seconds':>8} {'stories/s':>10} "
+            f"{'p50 ms':>7} {'p99 ms':>7} {'requests':>9} {'errors':>7} {'SQL':>6} {'SQL ms':>8}  statements"
+        )
+        throughputs = []
+        for index in range(1, runs + 1):
+            before = fetch_stats(base_url)
+            sample = ingest_once(stories)
+            after = fetch_stats(base_url)
+            per_second = sample['stories'] / sample['seconds'] if sample['seconds'] else 0.0
+            throughputs.append(per_second)
+            statements = sample['statements']
+            kinds = ', '.join(f"{kind} {count}" for kind, count in statements.kinds.most_common())
+            print(
+                f"{index:>4} {sample['stories']:>8} {sample['failed']:>7} {sample['comments']:>9} "
+                f"{sample['seconds']:>8.2f} {per_second:>10.1f} {sample['p50'] * 1000:>7.1f} {sample['p99'] * 1000:>7.1f} "
+                f"{after['requests'] - before['requests']:>9} {after['errors'] - before['errors']:>7} "
+                f"{statements.total:>6} {statements.seconds * 1000:>8.1f}  {kinds}"
+            )
+
+    median = statistics.median(throughputs)
+    print(f"median {median:.1f} stories/s over {runs} run(s)")
+    if min_stories_per_sec is not None and median < min_stories_per_sec:
+        raise SystemExit(f"Ingest throughput {median:.1f} stories/s is below the {min_stories_per_sec:g} stories/s floor")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stories', type=int, default=2000)
+    parser.add_argument('--comments-per-story', type=int, default=0)
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='lognormal')
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--rate-limit', type=float, default=0, help='HN_RATE_LIMIT for the run; 0 disables it')
+    parser.add_argument('--min-stories-per-sec', type=float, default=None)
+    parser.add_argument('--verbose', action='store_true', help='Keep the pipeline\'s INFO logging')
+    args = parser.parse_args()
+    setup_django()
+    if not args.verbose:
+        logging.disable(logging.INFO)
+    run(
+        args.stories, args.comments_per_story, args.latency, args.latency_ms, args.error_rate,
+        args.runs, args.rate_limit, args.min_stories_per_sec,
+    )
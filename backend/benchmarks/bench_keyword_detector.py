@@ -0,0 +1,73 @@
+"""
+Micro-benchmark: single-pass KeywordDetector matcher vs. the previous per-keyword scan.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_keyword_detector [--titles 2000] [--extra-keywords 0 100 300]
+"""
+import argparse
+import random
+import re
+import timeit
+
+from services.keyword_detector import KeywordDetector
+
+# Previous implementation: one regex search per keyword plus one per variant pattern
+LEGACY_VARIANT_MAP = {
+    re.compile(r'\bllms?\b', re.IGNORECASE): ['llm', 'large language model'],
+    re.compile(r'\bml\b', re.IGNORECASE): ['machine learning'],
+    re.compile(r'\bdall-e\b', re.IGNORECASE): ['dall-e', 'dalle'],
+}
+
+def legacy_find_ai_keywords(keywords, text):
+    if not text:
+        return []
+    found_keywords_set = set()
+    for keyword in keywords:
+        if re.search(r'\b' + re.escape(keyword) + r'\b', text, re.IGNORECASE):
+            found_keywords_set.add(keyword)
+    for pattern_regex, canonical_keywords_to_add in LEGACY_VARIANT_MAP.items():
+        if re.search(pattern_regex, text):
+            for canonical_keyword in canonical_keywords_to_add:
+                if canonical_keyword in keywords:
+                    found_keywords_set.add(canonical_keyword)
+    return sorted(found_keywords_set)
+
+WORDS = (
+    "show hn ask hn rust python database postgres kernel startup release open source "
+    "compiler browser security privacy cloud apple google linux web design"
+).split()
+
+def make_titles(count, keywords, seed=42):
+    rng = random.Random(seed)
+    titles = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=rng.randint(4, 12))
+        if rng.random() < 0.3: # Roughly the share of AI-related HN titles
+            words.insert(rng.randrange(len(words)), rng.choice(keywords + ['LLMs', 'ML', 'Dall-E']))
+        titles.append(' '.join(words).capitalize())
+    return titles
+
+def run(title_count, extra_keyword_counts):
+    print(f"{'keywords':>9} {'legacy us/title':>16} {'compiled us/title':>18} {'speedup':>8}")
+    for extra in extra_keyword_counts:
+        keywords = KeywordDetector.AI_KEYWORDS + [f'synthetic term {i}' for i in range(extra)]
+        detector = type('BenchKeywordDetector', (KeywordDetector,), {'AI_KEYWORDS': keywords})
+        titles = make_titles(title_count, KeywordDetector.AI_KEYWORDS)
+
+        mismatches = [t for t in titles if detector.find_ai_keywords(t) != legacy_find_ai_keywords(keywords, t)]
+        if mismatches:
+            raise SystemExit(f"Output mismatch for {len(mismatches)} titles, e.g. {mismatches[0]!r}")
+
+        legacy = min(timeit.repeat(lambda: [legacy_find_ai_keywords(keywords, t) for t in titles], number=1, repeat=3))
+        compiled = min(timeit.repeat(lambda: [detector.find_ai_keywords(t) for t in titles], number=1, repeat=3))
+        print(
+            f"{len(keywords):>9} {legacy / title_count * 1e6:>16.2f} "
+            f"{compiled / title_count * 1e6:>18.2f} {legacy / compiled:>7.1f}x"
+        )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--titles', type=int, default=2000)
+    parser.add_argument('--extra-keywords', type=int, nargs='+', default=[0, 100, 300])
+    args = parser.parse_args()
+    run(args.titles, args.extra_keywords)
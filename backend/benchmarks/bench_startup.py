@@ -0,0 +1,69 @@
+"""
+Benchmark: cold start of a server worker, i.e. a fresh interpreter importing asgi.py
+(Django setup, app loading, URL and view imports).
+
+Each sample runs in a new subprocess so nothing is already imported. The report also
+lists heavyweight modules that a worker loaded, since startup should not pull in the
+ingest stack (tasks, confluent_kafka, aiohttp) or open network connections.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_startup [--runs 5] [--max-seconds 3.0]
+
+With --max-seconds the script exits non-zero when the median cold start exceeds the
+budget, or a worker imports the ingest stack, so it can guard cold start in CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Modules a web worker has no business importing at startup
+INGEST_MODULES = ('tasks', 'confluent_kafka', 'aiohttp')
+
+PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import asgi
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {INGEST_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def cold_start():
+    """Time one import of asgi.py in a fresh interpreter; returns (seconds, ingest modules loaded)"""
+    env = dict(os.environ, STARTUP_FETCH_ENABLED='False')
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    completed = subprocess.run(
+        [sys.executable, '-c', PROBE], env=env, capture_output=True, text=True, check=True,
+    )
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    return result['seconds'], result['loaded']
+
+
+def run(runs, max_seconds):
+    samples = []
+    loaded = set()
+    for _ in range(runs):
+        seconds, modules = cold_start()
+        samples.append(seconds)
+        loaded.update(modules)
+
+    median = statistics.median(samples)
+    print(f"{'runs':>5} {'median s':>9} {'min s':>7} {'max s':>7}  ingest modules loaded")
+    print(f"{runs:>5} {median:>9.3f} {min(samples):>7.3f} {max(samples):>7.3f}  {', '.join(sorted(loaded)) or 'none'}")
+
+    if max_seconds is not None:
+        if median > max_seconds:
+            raise SystemExit(f"Cold start {median:.3f}s exceeds the {max_seconds:.3f}s budget")
+        if loaded:
+            raise SystemExit(f"Server workers import the ingest stack at startup: {', '.join(sorted(loaded))}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-seconds', type=float, default=None)
+    args = parser.parse_args()
+    run(args.runs, args.max_seconds)
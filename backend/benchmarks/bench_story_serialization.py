@@ -0,0 +1,67 @@
+"""
+Benchmark: StorySerializer (DRF ModelSerializer + JSONRenderer) vs. the values()/orjson
+fast path used by /api/stories/ and /api/stories/ai_related/.
+
+Rows are seeded into the configured database inside a transaction that is rolled back,
+so the benchmark leaves no data behind. Both paths include the DB fetch.
+
+Usage (from the backend directory, with the database reachable):
+    python -m benchmarks.bench_story_serialization [--rows 1000 10000 100000]
+"""
+import argparse
+import json
+from datetime import datetime, timedelta
+
+from benchmarks.utils import setup_django, best_of
+
+
+def seed_stories(count):
+    from core.models import Story
+
+    base = datetime(2024, 1, 1)
+    Story.objects.bulk_create(
+        [
+            Story(
+                id=10_000_000 + i, title=f'Benchmark story {i} about LLMs', url=f'https://example{i % 500}.com/{i}',
+                domain=f'example{i % 500}.com', score=i % 1000, comments_count=i % 300, author=f'user{i % 2000}',
+                timestamp=base + timedelta(seconds=i), is_ai_related=i % 3 == 0,
+            )
+            for i in range(count)
+        ],
+        batch_size=5000,
+    )
+
+
+def run(row_counts):
+    from django.db import transaction
+    from rest_framework.renderers import JSONRenderer
+    from api.serializers import StorySerializer, STORY_ROW_FIELDS, encode_story_rows
+    from core.models import Story
+
+    print(f"{'rows':>8} {'serializer ms':>14} {'fast path ms':>13} {'speedup':>8} {'same output':>12}")
+    with transaction.atomic():
+        seed_stories(max(row_counts))
+        for count in sorted(row_counts):
+            # Build a fresh queryset per run so neither path reuses a result cache
+            def stories():
+                return Story.objects.filter(id__gte=10_000_000).order_by('-timestamp')
+
+            drf_time, drf_bytes = best_of(
+                lambda: JSONRenderer().render(StorySerializer(stories()[:count], many=True).data)
+            )
+            fast_time, fast_bytes = best_of(
+                lambda: encode_story_rows(list(stories().values(*STORY_ROW_FIELDS)[:count]))
+            )
+            print(
+                f"{count:>8} {drf_time * 1000:>14.1f} {fast_time * 1000:>13.1f} "
+                f"{drf_time / fast_time:>7.1f}x {str(json.loads(drf_bytes) == json.loads(fast_bytes)):>12}"
+            )
+        transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    args = parser.parse_args()
+    setup_django()
+    run(args.rows)
@@ -0,0 +1,229 @@
+"""
+Local stand-in for the HackerNews Firebase API, for ingest benchmarks.
+
+Serves the feed, /item, maxitem and updates endpoints under /v0 for a synthetic set of
+stories (and optionally comment threads) generated from item IDs, so any size costs no
+memory up front. Every response can be delayed by a sampled latency and replaced by a
+503 at a given error rate. Request counts are served at /__stats.
+
+Usage (from the backend directory):
+    python -m benchmarks.fake_hn [--stories 5000] [--comments-per-story 0] [--latency lognormal]
+                                 [--latency-ms 20] [--error-rate 0.0] [--port 8765]
+
+Point the ingest at it with HN_API_BASE_URL=http://127.0.0.1:8765/v0.
+"""
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+from contextlib import contextmanager
+
+from aiohttp import web
+
+FIRST_ITEM_ID = 40_000_000
+COMMENT_BRANCHING = 3 # Replies per comment; the first COMMENT_BRANCHING comments reply to the story
+LATENCY_DISTRIBUTIONS = ('constant', 'uniform', 'exponential', 'lognormal')
+FEEDS = ('top', 'new', 'best', 'ask', 'show', 'job')
+READY_PREFIX = 'Serving fake HN API at '
+
+TITLES = (
+    'Show HN: A tiny {n} database written in Rust',
+    'Why our build times dropped {n}% after switching compilers',
+    'Fine-tuning an LLM on {n} support tickets',
+    'The history of the {n} typewriter',
+    'OpenAI and Anthropic publish {n} page safety report',
+    'Deep learning on microcontrollers with {n}KB of RAM',
+    'Postgres tricks we learned running {n} shards',
+    'Ask HN: Is machine learning worth learning in {n}?',
+)
+COMMENT_TEXTS = (
+    'I tried this with <i>an LLM</i> and it worked {n} times out of ten.',
+    'We ran something similar in production for {n} months.',
+    'This reminds me of a <a href="https://example.com/{n}">talk</a> from years ago.',
+    'Neural network inference on the edge is underrated; {n} ms is plenty.',
+)
+
+
+class FakeHackerNews:
+    """
+    aiohttp application serving a deterministic synthetic HN dataset.
+
+    Story i (0-based) has item ID FIRST_ITEM_ID + i * (comments_per_story + 1); its
+    comments take the IDs that follow, arranged as a COMMENT_BRANCHING-ary tree.
+    """
+
+    def __init__(self, stories=5000, comments_per_story=0, latency='constant', latency_ms=20.0,
+                 error_rate=0.0, seed=0):
+        if latency not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"latency must be one of {', '.join(LATENCY_DISTRIBUTIONS)}")
+        self.stories = stories
+        self.comments_per_story = comments_per_story
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.counts = {'requests': 0, 'errors': 0, 'items': 0, 'feeds': 0}
+
+    @property
+    def stride(self):
+        return self.comments_per_story + 1
+
+    @property
+    def story_ids(self):
+        """Story IDs in rank order (the order topstories.json serves them in)"""
+        return [FIRST_ITEM_ID + i * self.stride for i in range(self.stories)]
+
+    def sample_latency(self):
+        """Seconds to delay one response"""
+        mean = self.latency_ms / 1000
+        if self.latency == 'uniform':
+            return self.random.uniform(0, 2 * mean)
+        if self.latency == 'exponential':
+            return self.random.expovariate(1 / mean) if mean else 0.0
+        if self.latency == 'lognormal':
+            # Median latency_ms with a heavy tail: p99 is roughly 10x the median
+            return self.random.lognormvariate(0, 1) * mean
+        return mean
+
+    def feed(self, name):
+        story_ids = self.story_ids
+        if name == 'new':
+            return story_ids[::-1]
+        if name == 'top':
+            return story_ids
+        # Other feeds list a deterministic, overlapping subset so cross-feed dedup has work to do
+        offset = FEEDS.index(name)
+        return story_ids[offset::len(FEEDS) - 1]
+
+    def item(self, item_id):
+        """The payload of an item, or None for IDs outside the dataset"""
+        index, position = divmod(item_id - FIRST_ITEM_ID, self.stride)
+        if item_id < FIRST_ITEM_ID or index >= self.stories:
+            return None
+        story_id = item_id - position
+        time = 1_700_000_000 + index * 60
+        if position == 0:
+            return {
+                'id': item_id, 'type': 'story', 'by': f'user{index % 997}', 'time': time,
+                'title': TITLES[index % len(TITLES)].format(n=index),
+                'url': f'https://example{index % 250}.com/posts/{index}',
+                'score': 1 + index % 500, 'descendants': self.comments_per_story,
+                'kids': self.kids(story_id, -1),
+            }
+        comment = position - 1
+        parent = story_id if comment < COMMENT_BRANCHING else story_id + comment // COMMENT_BRANCHING
+        return {
+            'id': item_id, 'type': 'comment', 'by': f'user{(index + comment) % 997}', 'time': time + position,
+            'parent': parent, 'text': COMMENT_TEXTS[comment % len(COMMENT_TEXTS)].format(n=comment),
+            'kids': self.kids(story_id, comment),
+        }
+
+    def kids(self, story_id, comment):
+        """Reply IDs of a comment (or of the story, for comment -1)"""
+        first = COMMENT_BRANCHING * (comment + 1)
+        return [
+            story_id + 1 + reply
+            for reply in range(first, min(first + COMMENT_BRANCHING, self.comments_per_story))
+        ]
+
+    async def respond(self, payload):
+        self.counts['requests'] += 1
+        delay = self.sample_latency()
+        if delay:
+            await asyncio.sleep(delay)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.counts['errors'] += 1
+            return web.Response(status=503, text='Service Unavailable')
+        return web.json_response(payload)
+
+    async def handle_feed(self, request):
+        self.counts['feeds'] += 1
+        return await self.respond(self.feed(request.match_info['feed']))
+
+    async def handle_item(self, request):
+        self.counts['items'] += 1
+        return await self.respond(self.item(int(request.match_info['item_id'])))
+
+    async def handle_max_item(self, request):
+        return await self.respond(FIRST_ITEM_ID + self.stories * self.stride - 1)
+
+    async def handle_updates(self, request):
+        return await self.respond({'items': [], 'profiles': []})
+
+    async def handle_stats(self, request):
+        return web.json_response(self.counts)
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get(r'/v0/{feed:(%s)}stories.json' % '|'.join(FEEDS), self.handle_feed)
+        app.router.add_get(r'/v0/item/{item_id:\d+}.json', self.handle_item)
+        app.router.add_get('/v0/maxitem.json', self.handle_max_item)
+        app.router.add_get('/v0/updates.json', self.handle_updates)
+        app.router.add_get('/__stats', self.handle_stats)
+        return app
+
+
+async def serve(server, host, port):
+    runner = web.AppRunner(server.app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = runner.addresses[0][1]
+    print(f"{READY_PREFIX}http://{host}:{bound_port}/v0", flush=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+@contextmanager
+def fake_hn_process(stories, comments_per_story=0, latency='constant', latency_ms=20.0, error_rate=0.0, seed=0):
+    """
+    Run the server in a child process (so it does not compete with the ingest for the GIL)
+    on a free port; yields its base URL, ending in /v0.
+    """
+    args = [
+        sys.executable, '-m', 'benchmarks.fake_hn', '--port', '0',
+        '--stories', str(stories), '--comments-per-story', str(comments_per_story),
+        '--latency', latency, '--latency-ms', str(latency_ms), '--error-rate', str(error_rate), '--seed', str(seed),
+    ]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+    try:
+        line = process.stdout.readline()
+        if not line.startswith(READY_PREFIX):
+            raise RuntimeError(f"Fake HN server failed to start (exit code {process.poll()})")
+        yield line[len(READY_PREFIX):].strip()
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def fetch_stats(base_url):
+    """Request counts of a running server"""
+    from urllib.request import urlopen
+
+    with urlopen(f"{base_url.rsplit('/v0', 1)[0]}/__stats") as response:
+        return json.load(response)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--stories', type=int, default=5000)
+    parser.add_argument('--comments-per-story', type=int, default=0)
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='constant')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='Mean (median for lognormal) response delay')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of responses replaced by a 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765, help='0 picks a free port')
+    args = parser.parse_args()
+    fake = FakeHackerNews(
+        stories=args.stories, comments_per_story=args.comments_per_story, latency=args.latency,
+        latency_ms=args.latency_ms, error_rate=args.error_rate, seed=args.seed,
+    )
+    try:
+        asyncio.run(serve(fake, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
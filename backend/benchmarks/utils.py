@@ -0,0 +1,20 @@
+import os
+import time
+
+
+def setup_django():
+    """Configure Django for standalone benchmark scripts (run from the backend directory)."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'settings')
+    import django
+    django.setup()
+
+
+def best_of(func, repeat=3):
+    """Run func `repeat` times; return (best wall time in seconds, last result)."""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
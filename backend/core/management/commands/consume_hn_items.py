@@ -0,0 +1,32 @@
+import logging
+from django.conf import settings
+
+from core.management.commands.consume_hn_stories import Command as ConsumeCommand
+from tasks import FETCH_ITEMS_TOPIC, fetch_item_batches_logic
+
+logger = logging.getLogger(__name__)
+
+
+def process_item_batches(payloads):
+    """Batch handler: fetch and write every fetch_items payload; True once all are recorded"""
+    results = fetch_item_batches_logic(payloads)
+    logger.info(
+        f"Processed {len(results)} item batches: {sum(result['new'] for result in results)} new, "
+        f"{sum(result['updated'] for result in results)} updated, "
+        f"{sum(result['failed_fetches'] for result in results)} failed fetches."
+    )
+    return True
+
+
+class Command(ConsumeCommand):
+    help = (
+        'Runs a Kafka consumer for fan-out fetch cycles: fetches and stores the story ID batches '
+        'published to the fetch_items topic. Run one replica (or worker) per partition to scale ingest.'
+    )
+    topic = FETCH_ITEMS_TOPIC
+    group_name = 'fetch_items'
+    handler = f'{__name__}.process_item_batches'
+    batch_size_help = 'Maximum fetch_items messages (each a batch of story IDs) consumed at once.'
+
+    def get_default_batch_size(self):
+        return settings.KAFKA_ITEMS_CONSUMER_BATCH_SIZE
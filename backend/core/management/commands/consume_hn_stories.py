@@ -1,19 +1,119 @@
-import json
 import logging
-import time
+import signal
 from django.core.management.base import BaseCommand
 from django.conf import settings
-from confluent_kafka import Consumer, KafkaError, KafkaException
+from django.utils.module_loading import import_string
+from confluent_kafka import Consumer, KafkaException
 
-from tasks import FETCH_STORIES_TOPIC, fetch_top_stories_logic, producer_config as base_producer_config
+from services.kafka_consumer import BatchConsumer, run_workers
+from tasks import (
+    FETCH_STORIES_TOPIC, coalesce_fetch_triggers, fetch_top_stories_logic, get_kafka_producer,
+    producer_config as base_producer_config,
+)
 
 logger = logging.getLogger(__name__)
 
+DEAD_LETTER_SUFFIX = '.dead_letter' # Batches that exhaust their attempts are republished to <topic>.dead_letter
+
+
+def consumer_config(group_name):
+    # Consumer config uses the same base settings as producer for bootstrap, security, etc.
+    return {
+        **base_producer_config, # Re-use producer config for server details & auth
+        'group.id': f'{settings.KAFKA_TOPIC_PREFIX}{group_name}_consumer_group', # Unique consumer group ID
+        'auto.offset.reset': 'earliest', # Start reading at the earliest offset if no offset is stored
+        'enable.auto.commit': False, # Offsets are committed once a batch has been processed
+    }
+
+
+def process_fetch_triggers(payloads):
+    """Batch handler: run one fetch for the whole batch of triggers; True if it succeeded"""
+    payload = coalesce_fetch_triggers(payloads)
+    if payload is None:
+        logger.info(f"Batch of {len(payloads)} messages held no fetch trigger; nothing to do.")
+        return True
+
+    result = fetch_top_stories_logic(message_payload=payload)
+    if result.get("status") != "success":
+        logger.error(f"Failed to process HN story fetch for {payload['coalesced']} triggers: "
+                     f"{result.get('reason', 'Unknown error')}")
+        return False
+    logger.info(
+        f"Processed HN story fetch for {payload['coalesced']} triggers ({result.get('mode')} mode): "
+        f"{result.get('processed_stories', 0)} processed, {result.get('new', 0)} new, "
+        f"{result.get('updated', 0)} updated."
+    )
+    return True
+
+
+def dead_letter_publisher(topic):
+    """BatchConsumer dead_letter callback republishing the raw messages to `topic`"""
+    def publish(messages):
+        kafka_producer = get_kafka_producer()
+        if not kafka_producer:
+            return False
+        queued = [kafka_producer.produce(topic, key=msg.key(), value=msg.value()) for msg in messages]
+        # Delivered before the batch is committed past, so a crash cannot lose the messages
+        return all(queued) and not kafka_producer.flush()
+    return publish
+
+
+def run_worker(topic, group_name, handler, batch_size, batch_timeout, retry_backoff, max_attempts):
+    """Consume topic in this process with the handler (a dotted path) until SIGTERM or Ctrl+C"""
+    batch_consumer = BatchConsumer(
+        Consumer(consumer_config(group_name)), [topic],
+        batch_size=batch_size, batch_timeout=batch_timeout, retry_backoff=retry_backoff,
+        max_attempts=max_attempts, dead_letter=dead_letter_publisher(f'{topic}{DEAD_LETTER_SUFFIX}'),
+    )
+    signal.signal(signal.SIGTERM, batch_consumer.stop)
+    batch_consumer.run(import_string(handler))
+
+
 class Command(BaseCommand):
     help = 'Runs the Kafka consumer for fetching Hacker News stories triggered by messages.'
+    topic = FETCH_STORIES_TOPIC
+    group_name = 'fetch_stories'
+    handler = f'{__name__}.process_fetch_triggers'
+    batch_size_help = 'Maximum messages consumed per batch; duplicate triggers in a batch run a single fetch.'
+
+    def get_default_batch_size(self):
+        return settings.KAFKA_CONSUMER_BATCH_SIZE
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=self.get_default_batch_size(),
+            help=self.batch_size_help,
+        )
+        parser.add_argument(
+            '--batch-timeout',
+            type=float,
+            default=settings.KAFKA_CONSUMER_BATCH_TIMEOUT,
+            help='Seconds to wait for a batch to fill.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.KAFKA_CONSUMER_WORKERS,
+            help='Consumer processes in the group; each is assigned a share of the topic partitions.',
+        )
+        parser.add_argument(
+            '--retry-backoff',
+            type=float,
+            default=settings.KAFKA_CONSUMER_RETRY_BACKOFF,
+            help='Seconds to wait before a failed batch is redelivered.',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=settings.KAFKA_CONSUMER_MAX_ATTEMPTS,
+            help=f'Attempts before a failing batch is logged, republished to <topic>{DEAD_LETTER_SUFFIX} '
+                 'and skipped; 0 retries forever.',
+        )
 
     def handle(self, *args, **options):
-        self.stdout.write(self.style.SUCCESS('Starting Kafka consumer for Hacker News stories fetch...'))
+        self.stdout.write(self.style.SUCCESS(f'Starting Kafka consumer for {self.topic}...'))
 
         if not settings.KAFKA_BOOTSTRAP_SERVERS or settings.KAFKA_BOOTSTRAP_SERVERS == 'your_kafka_bootstrap_servers':
             self.stderr.write(self.style.ERROR(
@@ -21,64 +121,27 @@ class Command(BaseCommand):
             ))
             return
 
-        # Consumer config uses the same base settings as producer for bootstrap, security, etc.
-        consumer_conf = {
-            **base_producer_config, # Re-use producer config for server details & auth
-            'group.id': f'{settings.KAFKA_TOPIC_PREFIX}fetch_stories_consumer_group', # Unique consumer group ID
-            'auto.offset.reset': 'earliest', # Start reading at the earliest offset if no offset is stored
+        worker_options = {
+            'topic': self.topic,
+            'group_name': self.group_name,
+            'handler': self.handler,
+            'batch_size': max(1, options['batch_size']),
+            'batch_timeout': options['batch_timeout'],
+            'retry_backoff': options['retry_backoff'],
+            'max_attempts': max(0, options['max_attempts']),
         }
+        workers = max(1, options['workers'])
+        self.stdout.write(
+            f"Consuming {self.topic} with {workers} worker(s), batches of up to {worker_options['batch_size']}"
+        )
 
-        consumer = None
         try:
-            consumer = Consumer(consumer_conf)
-            consumer.subscribe([FETCH_STORIES_TOPIC])
-            self.stdout.write(f'Subscribed to Kafka topic: {FETCH_STORIES_TOPIC}')
-
-            while True:
-                msg = consumer.poll(timeout=1.0)  # Poll for new messages with a 1-second timeout
-
-                if msg is None:
-                    continue # No message_received, keep polling
-                
-                if msg.error():
-                    if msg.error().code() == KafkaError._PARTITION_EOF:
-                        # End of partition event
-                        logger.info(f'%% {msg.topic()} [{msg.partition()}] reached end at offset {msg.offset()}')
-                    elif msg.error():
-                        # Actual error
-                        logger.error(f'Kafka error: {msg.error()}')
-                        time.sleep(5) # Wait before retrying to connect or poll
-                    continue
-
-                # Message successfully consumed
-                try:
-                    payload = json.loads(msg.value().decode('utf-8'))
-                    self.stdout.write(f'Received message from {msg.topic()}: {payload}')
-                    logger.info(f"Processing message from {msg.topic()} with key {msg.key()}: {payload}")
-
-                    # Call the actual logic function from tasks.py
-                    result = fetch_top_stories_logic(message_payload=payload)
-
-                    if result.get("status") == "success":
-                        self.stdout.write(self.style.SUCCESS(
-                            f"Successfully processed HN story fetch from Kafka message: "
-                            f"{result.get('processed_stories', 0)} processed, "
-                            f"{result.get('new', 0)} new, "
-                            f"{result.get('updated', 0)} updated."
-                        ))
-                    else:
-                        self.stderr.write(self.style.ERROR(
-                            f"Failed to process HN story fetch from Kafka message: {result.get('reason', 'Unknown error')}"
-                        ))
-                    
-
-                except json.JSONDecodeError as e:
-                    logger.error(f"Error decoding JSON payload: {msg.value().decode('utf-8')} - {e}")
-                    self.stderr.write(self.style.ERROR(f"Could not decode message payload: {e}"))
-                except Exception as e:
-                    logger.error(f"Error processing message payload {msg.value().decode('utf-8')}: {e}", exc_info=True)
-                    self.stderr.write(self.style.ERROR(f"Error processing message: {e}"))
-
+            if workers == 1:
+                run_worker(**worker_options)
+            else:
+                exit_codes = run_workers(f'{__name__}.run_worker', workers, **worker_options)
+                if any(exit_codes):
+                    self.stderr.write(self.style.ERROR(f"Consumer workers exited with codes {exit_codes}."))
         except KafkaException as ke:
             logger.error(f"KafkaException encountered: {ke}", exc_info=True)
             self.stderr.write(self.style.ERROR(f"Critical Kafka error: {ke}. Consumer will exit."))
@@ -88,6 +151,4 @@ class Command(BaseCommand):
             logger.error(f"Unexpected error in Kafka consumer: {e}", exc_info=True)
             self.stderr.write(self.style.ERROR(f"An unexpected critical error occurred: {e}. Consumer will exit."))
         finally:
-            if consumer:
-                consumer.close()
-                self.stdout.write(self.style.SUCCESS('Kafka consumer closed.')) 
\ No newline at end of file
+            self.stdout.write(self.style.SUCCESS('Kafka consumer closed.'))
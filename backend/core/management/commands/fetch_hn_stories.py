@@ -8,21 +8,30 @@ logger = logging.getLogger(__name__)
 class Command(BaseCommand):
     help = 'Fetches top stories from Hacker News and populates the database.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='Only fetch stories that are new or listed in updates.json since the last run.',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Starting to fetch Hacker News stories...'))
+        mode = 'incremental' if options['incremental'] else 'full'
         
         try:
             # The `fetch_top_stories_logic` function in tasks.py expects an optional
             # message_payload argument if triggered by Kafka. For a direct call,
             # we can pass None or a dummy dict.
-            result = fetch_top_stories_logic(message_payload={'source': 'management_command'})
+            result = fetch_top_stories_logic(message_payload={'source': 'management_command', 'mode': mode})
             
             if result.get("status") == "success":
                 self.stdout.write(self.style.SUCCESS(
                     f"Successfully processed stories: "
                     f"{result.get('processed_stories', 0)} processed, "
                     f"{result.get('new', 0)} new, "
-                    f"{result.get('updated', 0)} updated."
+                    f"{result.get('updated', 0)} updated, "
+                    f"{result.get('skipped', 0)} skipped ({result.get('mode')} mode)."
                 ))
             else:
                 self.stderr.write(self.style.ERROR(
@@ -0,0 +1,61 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import DateTimeField, Exists, ExpressionWrapper, OuterRef, Value
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from api.caching import invalidate_story_velocity
+from core.models import StorySnapshot
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Downsamples old story score/comment snapshots to hourly and deletes those past retention.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full-resolution-days', type=int, default=settings.SNAPSHOT_FULL_RESOLUTION_DAYS,
+            help='Snapshots newer than this are kept as fetched.',
+        )
+        parser.add_argument(
+            '--retention-days', type=int, default=settings.SNAPSHOT_RETENTION_DAYS,
+            help='Snapshots older than this are deleted.',
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        full_resolution_cutoff = now - timedelta(days=options['full_resolution_days'])
+        retention_cutoff = now - timedelta(days=options['retention_days'])
+        try:
+            expired, downsampled = self.prune(full_resolution_cutoff, retention_cutoff)
+        except Exception as e:
+            logger.error(f"Error during prune_story_snapshots command: {e}", exc_info=True)
+            self.stderr.write(self.style.ERROR(f"An unexpected error occurred: {e}"))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {expired} expired snapshots and {downsampled} superseded by hourly downsampling."
+        ))
+
+    def prune(self, full_resolution_cutoff, retention_cutoff):
+        """Returns (expired_deleted, downsampled_deleted); cached velocity of every pruned story is dropped"""
+        expired_rows = StorySnapshot.objects.filter(fetched_at__lt=retention_cutoff)
+        pruned_story_ids = set(expired_rows.values_list('story_id', flat=True).distinct())
+        expired, _ = expired_rows.delete()
+
+        # Past full resolution, keep only the last snapshot of each story in each hour
+        old = StorySnapshot.objects.filter(fetched_at__lt=full_resolution_cutoff)
+        superseded = old.annotate(
+            hour_end=ExpressionWrapper(TruncHour('fetched_at') + Value(timedelta(hours=1)), output_field=DateTimeField()),
+        ).filter(Exists(old.filter(
+            story_id=OuterRef('story_id'),
+            fetched_at__gt=OuterRef('fetched_at'),
+            fetched_at__lt=OuterRef('hour_end'),
+        )))
+        pruned_story_ids.update(superseded.values_list('story_id', flat=True).distinct())
+        downsampled, _ = StorySnapshot.objects.filter(id__in=superseded.values('id')).delete()
+
+        invalidate_story_velocity(pruned_story_ids)
+        return expired, downsampled
@@ -0,0 +1,118 @@
+import logging
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.caching import INSIGHTS_FAMILIES, bump_generations, invalidate_stories
+from core.models import Story, KeywordMention
+from tasks import rebuild_insights
+from services.keyword_detector import KeywordDetector
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Re-runs AI keyword detection over all stored stories (e.g. after a taxonomy change).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Stories classified per batch.')
+        parser.add_argument('--dry-run', action='store_true', help='Report changes without writing them.')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        dry_run = options['dry_run']
+        self.stdout.write(self.style.SUCCESS(
+            f"Reclassifying stories in chunks of {chunk_size}{' (dry run)' if dry_run else ''}..."
+        ))
+
+        totals = {'stories': 0, 'flags_changed': 0, 'mentions_added': 0, 'mentions_removed': 0}
+        last_id = None
+        try:
+            while True:
+                # Keyset pagination over the primary key keeps memory flat on large tables
+                rows = Story.objects.order_by('id')
+                if last_id is not None:
+                    rows = rows.filter(id__gt=last_id)
+                rows = list(rows.values_list('id', 'title', 'is_ai_related')[:chunk_size])
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+
+                chunk_stats = self.reclassify_chunk(rows, dry_run)
+                for key, value in chunk_stats.items():
+                    totals[key] += value
+                logger.info(f"reclassify_stories: processed up to story {last_id} ({totals['stories']} so far)")
+        except Exception as e:
+            logger.error(f"Error during reclassify_stories command: {e}", exc_info=True)
+            self.stderr.write(self.style.ERROR(f"An unexpected error occurred: {e}"))
+            return
+        finally:
+            # Chunks commit one at a time, so a failed run may still have changed flags and mentions
+            if not dry_run and (totals['flags_changed'] or totals['mentions_added'] or totals['mentions_removed']):
+                self.rebuild_insights()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Reclassified {totals['stories']} stories: "
+            f"{totals['flags_changed']} is_ai_related flags changed, "
+            f"{totals['mentions_added']} keyword mentions added, "
+            f"{totals['mentions_removed']} removed."
+        ))
+
+    def rebuild_insights(self):
+        """
+        Rebuild the aggregates that flag and mention changes bypass, and drop cached insights.
+        A failure is logged rather than raised, so it cannot hide an error already propagating.
+        """
+        try:
+            rebuild_insights()
+            bump_generations(INSIGHTS_FAMILIES)
+        except Exception as e:
+            logger.error(f"reclassify_stories: rebuilding insights failed: {e}", exc_info=True)
+            self.stderr.write(self.style.ERROR(
+                f"Reclassified stories were saved, but rebuilding insights failed: {e}. "
+                f"Run reconcile_insights to bring the aggregates up to date."
+            ))
+
+    def reclassify_chunk(self, rows, dry_run=False):
+        """Classify one chunk of (id, title, is_ai_related) rows and rewrite it in bulk."""
+        story_ids = [story_id for story_id, _, _ in rows]
+        keyword_indices = KeywordDetector.find_ai_keywords_batch([title for _, title, _ in rows])
+
+        wanted_mentions = {
+            (keyword, story_ids[index])
+            for keyword, indices in keyword_indices.items()
+            for index in indices
+        }
+        ai_story_ids = {story_id for _, story_id in wanted_mentions}
+        to_flag = [story_id for story_id, _, is_ai in rows if not is_ai and story_id in ai_story_ids]
+        to_unflag = [story_id for story_id, _, is_ai in rows if is_ai and story_id not in ai_story_ids]
+
+        existing_mentions = {
+            (keyword, story_id): mention_id
+            for mention_id, keyword, story_id in KeywordMention.objects.filter(
+                story_id__in=story_ids
+            ).values_list('id', 'keyword', 'story_id')
+        }
+        stale_mention_ids = [
+            mention_id for pair, mention_id in existing_mentions.items() if pair not in wanted_mentions
+        ]
+        new_mentions = [
+            KeywordMention(keyword=keyword, story_id=story_id)
+            for keyword, story_id in wanted_mentions if (keyword, story_id) not in existing_mentions
+        ]
+
+        if not dry_run:
+            with transaction.atomic():
+                if to_flag:
+                    Story.objects.filter(id__in=to_flag).update(is_ai_related=True)
+                if to_unflag:
+                    Story.objects.filter(id__in=to_unflag).update(is_ai_related=False)
+                if stale_mention_ids:
+                    KeywordMention.objects.filter(id__in=stale_mention_ids).delete()
+                KeywordMention.objects.bulk_create(new_mentions, ignore_conflicts=True)
+            invalidate_stories(to_flag + to_unflag)
+
+        return {
+            'stories': len(rows),
+            'flags_changed': len(to_flag) + len(to_unflag),
+            'mentions_added': len(new_mentions),
+            'mentions_removed': len(stale_mention_ids),
+        }
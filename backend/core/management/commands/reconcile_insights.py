@@ -0,0 +1,33 @@
+import logging
+from django.core.management.base import BaseCommand
+
+from api.caching import INSIGHTS_FAMILIES, bump_generations
+from core.models import InsightsSummary
+from tasks import rebuild_insights
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuilds the ingest-maintained insight aggregates (domain, keyword and summary counts) from scratch.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS('Rebuilding insight aggregates...'))
+        before = InsightsSummary.objects.filter(pk=InsightsSummary.SINGLETON_PK).first()
+        try:
+            summary = rebuild_insights()
+        except Exception as e:
+            logger.error(f"Error during reconcile_insights command: {e}", exc_info=True)
+            self.stderr.write(self.style.ERROR(f"An unexpected error occurred: {e}"))
+            return
+
+        bump_generations(INSIGHTS_FAMILIES)
+        drift = ''
+        if before is not None:
+            drift = (
+                f" (was {before.total_stories} stories, {before.ai_related_count} AI-related,"
+                f" {before.unique_domains} domains)"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt insights: {summary.total_stories} stories, {summary.ai_related_count} AI-related, "
+            f"{summary.unique_domains} domains{drift}."
+        ))
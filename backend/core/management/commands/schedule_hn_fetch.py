@@ -3,13 +3,26 @@ from django.core.management.base import BaseCommand
 from django.conf import settings
 
 
-from tasks import schedule_fetch_top_stories_task
+from tasks import schedule_fetch_cycle_task, schedule_fetch_top_stories_task
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
     help = 'Sends a message to Kafka to trigger fetching of Hacker News stories.'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Request a full refetch of all top stories instead of an incremental one.',
+        )
+        parser.add_argument(
+            '--fan-out',
+            action='store_true',
+            help='Plan the cycle here and publish its story IDs in batches to the fetch_items topic '
+                 '(processed by consume_hn_items) instead of sending a single fetch trigger.',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS('Attempting to schedule Hacker News stories fetch via Kafka...'))
 
@@ -20,7 +33,11 @@ class Command(BaseCommand):
             return
 
         try:
-            success = schedule_fetch_top_stories_task()
+            mode = 'full' if options['full'] else 'incremental'
+            if options['fan_out']:
+                success = schedule_fetch_cycle_task(mode=mode)
+            else:
+                success = schedule_fetch_top_stories_task(mode=mode)
             if success:
                 self.stdout.write(self.style.SUCCESS(
                     'Successfully sent message to Kafka to trigger Hacker News stories fetch.'
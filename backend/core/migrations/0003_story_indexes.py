@@ -0,0 +1,44 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:44
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently, TrigramExtension
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    atomic = False # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+
+    dependencies = [
+        ('core', '0002_ingestcursor'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        AddIndexConcurrently(
+            model_name='story',
+            index=models.Index(fields=['-timestamp', '-id'], name='story_timestamp_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='story',
+            index=models.Index(fields=['is_ai_related', '-timestamp', '-id'], name='story_ai_timestamp_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='story',
+            index=models.Index(fields=['domain', '-timestamp', '-id'], name='story_domain_timestamp_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='story',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('title'), name='gin_trgm_ops'), name='story_title_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='story',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('domain'), name='gin_trgm_ops'), name='story_domain_trgm_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='story',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('title', config='english'), name='story_title_search_idx'),
+        ),
+    ]
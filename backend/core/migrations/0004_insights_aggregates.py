@@ -0,0 +1,72 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:52
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_insights(apps, schema_editor):
+    """Seed the ingest-maintained aggregates from existing data"""
+    Story = apps.get_model('core', 'Story')
+    KeywordMention = apps.get_model('core', 'KeywordMention')
+    DomainStats = apps.get_model('core', 'DomainStats')
+    KeywordCount = apps.get_model('core', 'KeywordCount')
+    InsightsSummary = apps.get_model('core', 'InsightsSummary')
+
+    totals = Story.objects.aggregate(
+        total_stories=Count('id'),
+        ai_related_count=Count('id', filter=Q(is_ai_related=True)),
+        score_sum=Sum('score'),
+        comments_sum=Sum('comments_count'),
+    )
+    InsightsSummary.objects.create(
+        pk=1,
+        total_stories=totals['total_stories'],
+        ai_related_count=totals['ai_related_count'],
+        score_sum=totals['score_sum'] or 0,
+        comments_sum=totals['comments_sum'] or 0,
+        unique_domains=DomainStats.objects.count(),
+    )
+    KeywordCount.objects.bulk_create([
+        KeywordCount(keyword=row['keyword'], count=row['count'])
+        for row in KeywordMention.objects.values('keyword').annotate(count=Count('id'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_story_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InsightsSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_stories', models.IntegerField(default=0)),
+                ('ai_related_count', models.IntegerField(default=0)),
+                ('score_sum', models.BigIntegerField(default=0)),
+                ('comments_sum', models.BigIntegerField(default=0)),
+                ('unique_domains', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='KeywordCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('keyword', models.CharField(max_length=100, unique=True)),
+                ('count', models.IntegerField(default=0)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='domainstats',
+            index=models.Index(fields=['-count'], name='domainstats_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='keywordcount',
+            index=models.Index(fields=['-count'], name='keywordcount_count_idx'),
+        ),
+        migrations.RunPython(backfill_insights, migrations.RunPython.noop),
+    ]
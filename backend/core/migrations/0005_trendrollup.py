@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_insights_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('keyword', 'Keyword'), ('domain', 'Domain')], max_length=10)),
+                ('granularity', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=10)),
+                ('value', models.CharField(max_length=255)),
+                ('bucket', models.DateTimeField()),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dimension', 'granularity', 'bucket'], name='trendrollup_range_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='trendrollup',
+            constraint=models.UniqueConstraint(fields=('dimension', 'granularity', 'value', 'bucket'), name='trendrollup_unique_bucket'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-17 23:55
+
+from itertools import islice
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SEED_BATCH_SIZE = 5000
+
+
+def seed_snapshots(apps, schema_editor):
+    """Start every stored story's history from its current values, one batch in memory at a time"""
+    Story = apps.get_model('core', 'Story')
+    StorySnapshot = apps.get_model('core', 'StorySnapshot')
+    stories = Story.objects.values_list('id', 'updated_at', 'score', 'comments_count').iterator(chunk_size=SEED_BATCH_SIZE)
+    # bulk_create() would list() a generator, so feed it one chunk per call
+    while chunk := list(islice(stories, SEED_BATCH_SIZE)):
+        StorySnapshot.objects.bulk_create([
+            StorySnapshot(story_id=story_id, fetched_at=updated_at, score=score, comments_count=comments_count)
+            for story_id, updated_at, score, comments_count in chunk
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_trendrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fetched_at', models.DateTimeField()),
+                ('score', models.IntegerField()),
+                ('comments_count', models.IntegerField()),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='core.story')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['story', 'fetched_at'], name='snapshot_story_time_idx'), models.Index(fields=['fetched_at'], name='snapshot_fetched_at_idx')],
+            },
+        ),
+        migrations.RunPython(seed_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_storysnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FetchCycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mode', models.CharField(max_length=20)),
+                ('total_batches', models.IntegerField()),
+                ('max_item', models.IntegerField(blank=True, null=True)),
+                ('skipped', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FetchCycleBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.IntegerField()),
+                ('new', models.IntegerField(default=0)),
+                ('updated', models.IntegerField(default=0)),
+                ('failed_fetches', models.IntegerField(default=0)),
+                ('changed_story_ids', models.JSONField(default=list)),
+                ('cycle', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='core.fetchcycle')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='fetchcyclebatch',
+            constraint=models.UniqueConstraint(fields=('cycle', 'index'), name='fetchcyclebatch_unique_index'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_fetchcycle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Comment',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('parent_id', models.IntegerField()),
+                ('author', models.CharField(blank=True, max_length=255)),
+                ('text', models.TextField(blank=True)),
+                ('timestamp', models.DateTimeField()),
+                ('depth', models.IntegerField()),
+                ('kids', models.JSONField(default=list)),
+                ('deleted', models.BooleanField(default=False)),
+                ('dead', models.BooleanField(default=False)),
+                ('is_ai_related', models.BooleanField(default=False)),
+                ('ai_keywords', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comments', to='core.story')),
+            ],
+        ),
+    ]
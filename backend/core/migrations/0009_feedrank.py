@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_comment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fetchcycle',
+            name='feeds',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.CreateModel(
+            name='FeedRank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('feed', models.CharField(max_length=10)),
+                ('rank', models.IntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('story', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_ranks', to='core.story')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['feed', 'rank'], name='feedrank_feed_rank_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feedrank',
+            constraint=models.UniqueConstraint(fields=('feed', 'story'), name='feedrank_unique_story'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 00:32
+
+from django.db import migrations, models
+
+
+def mark_completed_cycles_finalized(apps, schema_editor):
+    """Cycles completed before finalization was tracked were finalized in the same step"""
+    FetchCycle = apps.get_model('core', 'FetchCycle')
+    FetchCycle.objects.filter(completed_at__isnull=False).update(finalized_at=models.F('completed_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_feedrank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fetchcycle',
+            name='finalized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_completed_cycles_finalized, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,16 @@
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVector
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
 
+# Text search configuration shared by the title search index and StoryViewSet's search filter;
+# both must use the same expression for Postgres to pick the index.
+STORY_SEARCH_CONFIG = 'english'
+
+def story_search_vector():
+    return SearchVector('title', config=STORY_SEARCH_CONFIG)
+
 class Story(models.Model):
     """Model for storing HackerNews stories"""
     id = models.IntegerField(primary_key=True)
@@ -14,10 +24,77 @@ class Story(models.Model):
     fetched_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_ai_related = models.BooleanField(default=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order for the unfiltered list and date-range filters
+            models.Index(fields=['-timestamp', '-id'], name='story_timestamp_id_idx'),
+            models.Index(fields=['is_ai_related', '-timestamp', '-id'], name='story_ai_timestamp_idx'),
+            models.Index(fields=['domain', '-timestamp', '-id'], name='story_domain_timestamp_idx'),
+            # icontains compiles to UPPER(col) LIKE UPPER('%...%'); trigram indexes serve it
+            GinIndex(OpClass(Upper('title'), name='gin_trgm_ops'), name='story_title_trgm_idx'),
+            GinIndex(OpClass(Upper('domain'), name='gin_trgm_ops'), name='story_domain_trgm_idx'),
+            GinIndex(story_search_vector(), name='story_title_search_idx'),
+        ]
     
     def __str__(self):
         return self.title
 
+class StorySnapshot(models.Model):
+    """
+    Model for a story's score and comment count as of one fetch. Append-only, and only
+    written when either value changed since the story was last stored, so a story's
+    history is its list of change points.
+    """
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='snapshots')
+    fetched_at = models.DateTimeField()
+    score = models.IntegerField()
+    comments_count = models.IntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['story', 'fetched_at'], name='snapshot_story_time_idx'),
+            models.Index(fields=['fetched_at'], name='snapshot_fetched_at_idx'), # Retention sweeps
+        ]
+
+    def __str__(self):
+        return f"{self.story_id} @ {self.fetched_at}: {self.score} points, {self.comments_count} comments"
+
+class FeedRank(models.Model):
+    """Model for a story's position in a HackerNews feed (top, new, best, ask, show, job) as of the last crawl"""
+    feed = models.CharField(max_length=10)
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='feed_ranks')
+    rank = models.IntegerField() # 1-based position in the feed
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['feed', 'story'], name='feedrank_unique_story'),
+        ]
+        indexes = [models.Index(fields=['feed', 'rank'], name='feedrank_feed_rank_idx')]
+
+    def __str__(self):
+        return f"{self.story_id} #{self.rank} in {self.feed}"
+
+class Comment(models.Model):
+    """Model for a comment in a story's discussion thread, stored by the breadth-first crawler"""
+    id = models.IntegerField(primary_key=True)
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='comments')
+    parent_id = models.IntegerField() # The story or comment replied to
+    author = models.CharField(max_length=255, blank=True)
+    text = models.TextField(blank=True) # HTML, as served by the API
+    timestamp = models.DateTimeField()
+    depth = models.IntegerField() # 1 for top-level comments
+    kids = models.JSONField(default=list) # Reply IDs; lets later crawls walk unchanged subtrees without fetching
+    deleted = models.BooleanField(default=False)
+    dead = models.BooleanField(default=False)
+    is_ai_related = models.BooleanField(default=False)
+    ai_keywords = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Comment {self.id} on {self.story_id}"
+
 class KeywordMention(models.Model):
     """Model for tracking AI-related keyword mentions"""
     keyword = models.CharField(max_length=100)
@@ -34,6 +111,116 @@ class DomainStats(models.Model):
     domain = models.CharField(max_length=255, unique=True)
     count = models.IntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-count'], name='domainstats_count_idx')]
     
     def __str__(self):
         return f"{self.domain} ({self.count})"
+
+class KeywordCount(models.Model):
+    """Model for the number of stories mentioning each keyword, maintained at ingest"""
+    keyword = models.CharField(max_length=100, unique=True)
+    count = models.IntegerField(default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['-count'], name='keywordcount_count_idx')]
+
+    def __str__(self):
+        return f"{self.keyword} ({self.count})"
+
+class InsightsSummary(models.Model):
+    """Single-row model of running story totals behind the stats summary, maintained at ingest"""
+    SINGLETON_PK = 1
+
+    total_stories = models.IntegerField(default=0)
+    ai_related_count = models.IntegerField(default=0)
+    score_sum = models.BigIntegerField(default=0)
+    comments_sum = models.BigIntegerField(default=0)
+    unique_domains = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Insights summary ({self.total_stories} stories)"
+
+class TrendRollup(models.Model):
+    """Model for per-bucket keyword and domain counts at hourly and daily granularity, maintained at ingest"""
+    GRANULARITY_HOUR = 'hour'
+    GRANULARITY_DAY = 'day'
+    GRANULARITY_CHOICES = [(GRANULARITY_HOUR, 'Hour'), (GRANULARITY_DAY, 'Day')]
+    DIMENSION_KEYWORD = 'keyword'
+    DIMENSION_DOMAIN = 'domain'
+    DIMENSION_CHOICES = [(DIMENSION_KEYWORD, 'Keyword'), (DIMENSION_DOMAIN, 'Domain')]
+
+    dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    granularity = models.CharField(max_length=10, choices=GRANULARITY_CHOICES)
+    value = models.CharField(max_length=255) # The keyword or domain
+    bucket = models.DateTimeField() # Start of the hour/day the stories were posted in
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also serves series lookups for given values
+            models.UniqueConstraint(fields=['dimension', 'granularity', 'value', 'bucket'], name='trendrollup_unique_bucket'),
+        ]
+        indexes = [
+            # Top values over a range when none are named
+            models.Index(fields=['dimension', 'granularity', 'bucket'], name='trendrollup_range_idx'),
+        ]
+
+    @classmethod
+    def bucket_start(cls, timestamp, granularity):
+        """Truncate a timestamp to the start of its bucket, as TruncHour/TruncDay do"""
+        timestamp = timestamp.replace(minute=0, second=0, microsecond=0)
+        return timestamp.replace(hour=0) if granularity == cls.GRANULARITY_DAY else timestamp
+
+    def __str__(self):
+        return f"{self.dimension} {self.value} @ {self.bucket} ({self.granularity}): {self.count}"
+
+class IngestCursor(models.Model):
+    """Model for persisting incremental ingestion progress (HN maxitem high-water mark)"""
+    name = models.CharField(max_length=100, unique=True)
+    max_item = models.IntegerField(default=0)
+    last_full_fetch_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} (max_item={self.max_item})"
+
+class FetchCycle(models.Model):
+    """
+    Model for one fanned-out fetch cycle: the story IDs are split into batches published to
+    the fetch_items topic, and the cycle is finalized once every batch has reported back.
+    completed_at is set when the last batch lands; finalized_at only once its aggregation
+    (cache invalidation, feed ranks, ingest cursor) has succeeded.
+    """
+    mode = models.CharField(max_length=20)
+    total_batches = models.IntegerField()
+    max_item = models.IntegerField(null=True, blank=True) # HN maxitem when the cycle was planned
+    skipped = models.IntegerField(default=0) # Top stories left out as unchanged
+    feeds = models.JSONField(default=dict) # Ranked IDs per crawled feed, stored as FeedRank once the cycle completes
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    finalized_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        state = 'finalized' if self.finalized_at else 'completed' if self.completed_at else 'running'
+        return f"Fetch cycle {self.pk} ({self.mode}, {self.total_batches} batches, {state})"
+
+class FetchCycleBatch(models.Model):
+    """Model for the outcome of one fetch_items batch; one row per batch, so redeliveries are not counted twice"""
+    cycle = models.ForeignKey(FetchCycle, on_delete=models.CASCADE, related_name='batches')
+    index = models.IntegerField()
+    new = models.IntegerField(default=0)
+    updated = models.IntegerField(default=0)
+    failed_fetches = models.IntegerField(default=0)
+    changed_story_ids = models.JSONField(default=list)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['cycle', 'index'], name='fetchcyclebatch_unique_index'),
+        ]
+
+    def __str__(self):
+        return f"Cycle {self.cycle_id} batch {self.index}: {self.new} new, {self.updated} updated"
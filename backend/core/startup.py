@@ -0,0 +1,51 @@
+import logging
+import os
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = logging.getLogger(__name__)
+
+STARTUP_FETCH_LEASE_KEY = 'startup_fetch_lease'
+
+
+def acquire_startup_lease():
+    """
+    Elect one process to run the startup one-shot. The lease is a cache key added atomically,
+    so among all workers and replicas starting within STARTUP_FETCH_LEASE_TTL only one wins.
+    """
+    token = f"{os.getpid()}:{uuid.uuid4().hex}"
+    return cache.add(STARTUP_FETCH_LEASE_KEY, token, timeout=settings.STARTUP_FETCH_LEASE_TTL)
+
+
+def schedule_initial_fetch():
+    """Send the initial fetch trigger if this process wins the startup lease; True if it was sent"""
+    try:
+        if not acquire_startup_lease():
+            logger.info("Startup fetch already scheduled by another process; skipping.")
+            return False
+
+        from tasks import schedule_fetch_top_stories_task # Deferred: tasks pulls in the ingest stack
+        if schedule_fetch_top_stories_task():
+            logger.info("Scheduled initial fetch of top stories.")
+            return True
+        logger.warning("Failed to schedule initial fetch of top stories (Kafka producer might be unavailable).")
+    except Exception as e:
+        logger.error(f"Error during initial task scheduling: {e}", exc_info=True)
+    return False
+
+
+def run_startup_tasks(background=True):
+    """
+    Opt-in startup hook for the web server (see asgi.py); a no-op unless STARTUP_FETCH_ENABLED.
+    Runs on a daemon thread by default so workers accept requests without waiting on Redis or Kafka.
+    """
+    if not settings.STARTUP_FETCH_ENABLED:
+        return None
+    if not background:
+        return schedule_initial_fetch()
+    thread = threading.Thread(target=schedule_initial_fetch, name='startup-fetch', daemon=True)
+    thread.start()
+    return thread
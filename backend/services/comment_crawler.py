@@ -0,0 +1,75 @@
+import asyncio
+import logging
+from dataclasses import dataclass, field
+
+from services.hacker_news import parse_comment
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ThreadCrawl:
+    """Outcome of crawling one story's comment tree"""
+    comments: list = field(default_factory=list) # Parsed comments fetched this crawl
+    reached: int = 0 # Comments reached in the tree, fetched or followed from storage
+    fetched: int = 0 # Item requests made
+    truncated: bool = False # Stopped by the depth or size budget
+
+
+class CommentCrawler:
+    """
+    Breadth-first crawler for a story's comment tree.
+
+    Every level of the tree is requested concurrently, so a thread costs one round trip per
+    level rather than one per comment; the client's semaphore bounds in-flight requests across
+    all stories crawled at once. Comments that are already stored and not listed as changed
+    are not refetched: their stored kids are followed instead, so only new and changed parts
+    of a thread cost requests. Each story is bounded by max_depth levels and max_comments.
+    """
+
+    def __init__(self, client, max_depth, max_comments):
+        self.client = client
+        self.max_depth = max_depth
+        self.max_comments = max_comments
+
+    async def crawl(self, story_id, kids, known_kids, changed_ids=frozenset(), refresh_all=False):
+        """
+        Crawl the tree below a story's top-level kids.
+        known_kids maps stored comment IDs to their stored kids; refresh_all refetches them anyway.
+        """
+        result = ThreadCrawl()
+        level = list(kids)
+        depth = 1
+        while level:
+            if depth > self.max_depth:
+                result.truncated = True
+                break
+            room = self.max_comments - result.reached
+            if len(level) > room:
+                level = level[:room]
+                result.truncated = True
+
+            to_fetch = [
+                comment_id for comment_id in level
+                if refresh_all or comment_id not in known_kids or comment_id in changed_ids
+            ]
+            payloads = await asyncio.gather(*(self.client.get_item(comment_id) for comment_id in to_fetch))
+            result.fetched += len(to_fetch)
+
+            fetched_kids = {}
+            for payload in payloads:
+                comment = parse_comment(payload, story_id, depth)
+                if comment:
+                    result.comments.append(comment)
+                    fetched_kids[comment['id']] = comment['kids']
+
+            next_level = []
+            for comment_id in level:
+                # A failed fetch falls back to the stored kids, so the rest of the subtree is still reached
+                next_level.extend(fetched_kids.get(comment_id, known_kids.get(comment_id, ())))
+            result.reached += len(level)
+            if result.truncated:
+                break
+            level = next_level
+            depth += 1
+        return result
@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket allowing `rate` requests per second with bursts of up to `burst`.
+
+    reserve() takes a token immediately and returns how long the caller must wait before
+    using it, so callers on any thread or event loop can share one bucket and sleep in
+    their own way (acquire() on threads, aacquire() on an event loop). A rate of 0
+    disables limiting.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = max(1, burst or int(rate) or 1)
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._acquired = 0
+        self._throttled = 0
+        self._throttled_seconds = 0.0
+
+    def reserve(self):
+        """Take a token; returns the seconds to wait before it may be spent"""
+        if not self.rate:
+            with self._lock:
+                self._acquired += 1
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1 # Negative balance is debt that queued callers wait out in turn
+            self._acquired += 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if wait:
+                self._throttled += 1
+                self._throttled_seconds += wait
+        return wait
+
+    def acquire(self):
+        """Block the calling thread until a token is available"""
+        wait = self.reserve()
+        if wait:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        """Wait on the running event loop until a token is available"""
+        wait = self.reserve()
+        if wait:
+            await asyncio.sleep(wait)
+
+    def snapshot(self):
+        with self._lock:
+            elapsed = time.monotonic() - self._updated
+            tokens = min(self.burst, self._tokens + elapsed * self.rate) if self.rate else self.burst
+            return {
+                'rate': self.rate,
+                'burst': self.burst,
+                'tokens': round(tokens, 2),
+                'acquired': self._acquired,
+                'throttled': self._throttled,
+                'throttled_seconds': round(self._throttled_seconds, 3),
+            }
+
+
+class AIMDController:
+    """
+    Additive-increase/multiplicative-decrease concurrency limit driven by request outcomes.
+
+    Outcomes are recorded as (latency, ok) samples. Every `window` samples the limit grows
+    by one if the window's error rate and mean latency are within target, and is multiplied
+    by `decrease_factor` otherwise, staying within [minimum, maximum]. The controller only
+    computes the limit; callers gate their own in-flight requests on `limit`.
+    """
+
+    def __init__(self, initial, minimum, maximum, latency_target, error_threshold,
+                 window=20, decrease_factor=0.5):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.latency_target = latency_target
+        self.error_threshold = error_threshold
+        self.window = max(1, window)
+        self.decrease_factor = decrease_factor
+        self._lock = threading.Lock()
+        self._limit = float(min(max(initial, self.minimum), self.maximum))
+        self._samples = deque()
+        self._increases = 0
+        self._decreases = 0
+        self._last_latency = 0.0
+        self._last_error_rate = 0.0
+
+    @property
+    def limit(self):
+        return int(self._limit)
+
+    def record(self, latency, ok):
+        """Add one request outcome; adjusts the limit when a window has been collected"""
+        with self._lock:
+            self._samples.append((latency, ok))
+            if len(self._samples) < self.window:
+                return
+            latencies = [sample_latency for sample_latency, _ in self._samples]
+            errors = sum(1 for _, sample_ok in self._samples if not sample_ok)
+            self._samples.clear()
+            self._last_latency = sum(latencies) / len(latencies)
+            self._last_error_rate = errors / len(latencies)
+            previous = self.limit
+            if self._last_error_rate > self.error_threshold or self._last_latency > self.latency_target:
+                self._limit = max(self.minimum, self._limit * self.decrease_factor)
+                self._decreases += 1
+            else:
+                self._limit = min(self.maximum, self._limit + 1)
+                self._increases += 1
+            if self.limit < previous:
+                logger.warning(
+                    f"HN API concurrency lowered to {self.limit} (mean latency {self._last_latency:.3f}s, "
+                    f"error rate {self._last_error_rate:.1%})"
+                )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'minimum': self.minimum,
+                'maximum': self.maximum,
+                'increases': self._increases,
+                'decreases': self._decreases,
+                'window_mean_latency': round(self._last_latency, 4),
+                'window_error_rate': round(self._last_error_rate, 4),
+            }
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that the circuit breaker considers unhealthy"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"circuit open; retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Thread-safe circuit breaker.
+
+    After `failure_threshold` consecutive failures the circuit opens and before_call()
+    raises CircuitOpenError, so callers fail fast instead of waiting out timeouts. After
+    `recovery_timeout` seconds it lets `half_open_max_calls` probe requests through: a
+    successful probe closes the circuit, a failed one opens it again. A probe that ends
+    without a verdict (e.g. its task was cancelled) must be handed back with
+    release_probe(); one that never reports is written off after `probe_timeout` seconds,
+    so a lost probe cannot keep the circuit half-open for good.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=10, recovery_timeout=30.0, half_open_max_calls=1, probe_timeout=None):
+        self.failure_threshold = max(1, failure_threshold)
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self.probe_timeout = recovery_timeout if probe_timeout is None else probe_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._probe_admitted_at = 0.0
+        self._counts = dict.fromkeys(('successes', 'failures', 'rejected', 'opened', 'lost_probes'), 0)
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        now = time.monotonic()
+        if self._state == self.OPEN and now - self._opened_at >= self.recovery_timeout:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        elif self._state == self.HALF_OPEN and self._probes and now - self._probe_admitted_at >= self.probe_timeout:
+            self._counts['lost_probes'] += self._probes
+            self._probes = 0
+            logger.warning(f"HN API circuit probe did not report within {self.probe_timeout}s; admitting another.")
+        return self._state
+
+    def _retry_after(self):
+        if self._state == self.HALF_OPEN:
+            return max(0.0, self._probe_admitted_at + self.probe_timeout - time.monotonic())
+        return max(0.0, self._opened_at + self.recovery_timeout - time.monotonic())
+
+    def check(self):
+        """Raise CircuitOpenError while the circuit is open, without taking a probe"""
+        with self._lock:
+            if self._current_state() != self.OPEN:
+                return
+            self._counts['rejected'] += 1
+            retry_after = self._retry_after()
+        raise CircuitOpenError(retry_after)
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpenError"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                self._probe_admitted_at = time.monotonic()
+                return
+            self._counts['rejected'] += 1
+            retry_after = self._retry_after()
+        raise CircuitOpenError(retry_after)
+
+    def release_probe(self):
+        """Hand back a call admitted by before_call() that ended without success or failure"""
+        with self._lock:
+            if self._state == self.HALF_OPEN and self._probes:
+                self._probes -= 1
+
+    def record(self, healthy):
+        """Report a call admitted by before_call(): True, False, or None for no verdict"""
+        if healthy is None:
+            self.release_probe()
+        elif healthy:
+            self.record_success()
+        else:
+            self.record_failure()
+
+    def record_success(self):
+        with self._lock:
+            self._counts['successes'] += 1
+            self._consecutive_failures = 0
+            if self._state != self.CLOSED:
+                self._state = self.CLOSED
+                logger.info("HN API circuit closed; upstream recovered.")
+
+    def record_failure(self):
+        with self._lock:
+            self._counts['failures'] += 1
+            self._consecutive_failures += 1
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED and self._consecutive_failures >= self.failure_threshold
+            ):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._counts['opened'] += 1
+                logger.error(
+                    f"HN API circuit opened after {self._consecutive_failures} consecutive failures; "
+                    f"failing fast for {self.recovery_timeout}s."
+                )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'state': self._current_state(),
+                'consecutive_failures': self._consecutive_failures,
+                **self._counts,
+            }
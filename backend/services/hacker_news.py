@@ -1,58 +1,291 @@
-import requests
+import asyncio
+import aiohttp
 import logging
+import threading
 from datetime import datetime
 from django.conf import settings
 from urllib.parse import urlparse
 import time
 
+from services.flow_control import AIMDController, CircuitBreaker, CircuitOpenError, TokenBucket
+
 logger = logging.getLogger(__name__)
 
-class HackerNewsClient:
-    """Client for interacting with the HackerNews API"""
-    BASE_URL = "https://hacker-news.firebaseio.com/v0"
+_flow_control = {}
+_flow_control_lock = threading.Lock()
+
+def _shared(name, factory):
+    if name not in _flow_control:
+        with _flow_control_lock:
+            if name not in _flow_control:
+                _flow_control[name] = factory()
+    return _flow_control[name]
+
+def shared_rate_limiter():
+    """Process-wide token bucket for HN API requests, shared by every client"""
+    return _shared('rate_limiter', lambda: TokenBucket(settings.HN_RATE_LIMIT, settings.HN_RATE_BURST))
+
+def shared_concurrency_controller():
+    """Process-wide AIMD limit on in-flight HN API requests, so what one fetch cycle learns carries over"""
+    return _shared('concurrency_controller', lambda: AIMDController(
+        initial=settings.HN_AIMD_INITIAL_CONCURRENCY,
+        minimum=settings.HN_AIMD_MIN_CONCURRENCY,
+        maximum=settings.HN_ASYNC_CONCURRENCY,
+        latency_target=settings.HN_AIMD_LATENCY_TARGET,
+        error_threshold=settings.HN_AIMD_ERROR_THRESHOLD,
+        window=settings.HN_AIMD_WINDOW,
+    ))
+
+def shared_circuit_breaker():
+    """Process-wide circuit breaker tracking the health of the HN API"""
+    return _shared('circuit_breaker', lambda: CircuitBreaker(
+        failure_threshold=settings.HN_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout=settings.HN_BREAKER_RECOVERY_TIMEOUT,
+    ))
+
+def flow_control_metrics():
+    """Current state of the shared rate limiter, concurrency controller and circuit breaker"""
+    return {
+        'rate_limiter': shared_rate_limiter().snapshot(),
+        'concurrency': shared_concurrency_controller().snapshot(),
+        'circuit_breaker': shared_circuit_breaker().snapshot(),
+    }
+
+def reset_flow_control():
+    """Drop the shared instances; they are rebuilt from settings on next use"""
+    with _flow_control_lock:
+        _flow_control.clear()
+
+def _log_fetch_error(what, error):
+    if isinstance(error, CircuitOpenError):
+        logger.debug(f"Skipped fetching {what}: {error}") # The breaker already logged why it opened
+    else:
+        logger.error(f"Error fetching {what}: {error}")
+
+def parse_story(data):
+    """Transform a raw /item payload into story data, or None if it is not a story"""
+    # Transform and validate the data
+    if not data or 'title' not in data:
+        return None
+
+    # Extract domain from URL if present
+    domain = None
+    if 'url' in data and data['url']:
+        parsed_url = urlparse(data['url'])
+        domain = parsed_url.netloc
+
+    return {
+        'id': data.get('id'),
+        'title': data.get('title', ''),
+        'url': data.get('url', ''),
+        'domain': domain,
+        'score': data.get('score', 0),
+        'comments_count': data.get('descendants', 0),
+        'author': data.get('by', ''),
+        'timestamp': datetime.fromtimestamp(data.get('time', 0)),
+        'kids': data.get('kids', []), # Top-level comment IDs, in ranked order
+    }
+
+def parse_comment(data, story_id, depth):
+    """Transform a raw /item payload into comment data, or None if it is not a comment"""
+    if not data or data.get('type') != 'comment':
+        return None
+    return {
+        'id': data.get('id'),
+        'story_id': story_id,
+        'parent_id': data.get('parent'),
+        'author': data.get('by', ''),
+        'text': data.get('text', ''),
+        'timestamp': datetime.fromtimestamp(data.get('time', 0)),
+        'depth': depth,
+        'kids': data.get('kids', []),
+        'deleted': bool(data.get('deleted')),
+        'dead': bool(data.get('dead')),
+    }
+
+
+# Failures a fetch method turns into its failure value
+ASYNC_FETCH_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, CircuitOpenError)
+
+
+class AsyncHackerNewsClient:
+    """
+    Asyncio client for the HackerNews API.
+
+    Fetches run on a single event loop over one aiohttp connection pool. Each request
+    attempt passes the shared circuit breaker and token bucket, then waits for an
+    in-flight slot: the number of slots follows the shared AIMD controller, capped at
+    `concurrency`, so the client backs off when latency or errors rise and ramps up
+    again as the API recovers. Use it as an async context manager so the session is
+    opened and closed on the running loop:
+
+        async with AsyncHackerNewsClient() as client:
+            stories = await client.get_many_story_details(ids)
+    """
+    BASE_URL = "https://hacker-news.firebaseio.com/v0" # Default for HN_API_BASE_URL
     DEFAULT_TIMEOUT = 15 # seconds
-    
-    @classmethod
-    def get_top_stories(cls, limit=50):
-        """Fetch IDs of top stories"""
+    RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+    FEED_ENDPOINTS = {
+        'top': 'topstories.json',
+        'new': 'newstories.json',
+        'best': 'beststories.json',
+        'ask': 'askstories.json',
+        'show': 'showstories.json',
+        'job': 'jobstories.json',
+    }
+
+    def __init__(self, concurrency=None, pool_maxsize=None, max_retries=None, backoff_factor=None, timeout=None,
+                 rate_limiter=None, concurrency_controller=None, circuit_breaker=None, base_url=None):
+        self.base_url = (base_url or settings.HN_API_BASE_URL).rstrip('/')
+        self.concurrency = concurrency or settings.HN_ASYNC_CONCURRENCY
+        self.pool_maxsize = pool_maxsize or self.concurrency
+        self.max_retries = max_retries if max_retries is not None else settings.HN_MAX_RETRIES
+        self.backoff_factor = backoff_factor if backoff_factor is not None else settings.HN_BACKOFF_FACTOR
+        self.timeout = aiohttp.ClientTimeout(total=timeout or self.DEFAULT_TIMEOUT)
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
+        self.concurrency_controller = concurrency_controller or shared_concurrency_controller()
+        self.circuit_breaker = circuit_breaker or shared_circuit_breaker()
+        self.session = None
+        self._slots = None
+        self._in_flight = 0
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    async def open(self):
+        """Create the pooled session; must be called from the event loop that will use it"""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.pool_maxsize, limit_per_host=self.pool_maxsize)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._slots = asyncio.Condition()
+
+    async def close(self):
+        """Close the session and all pooled connections"""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    @property
+    def slot_limit(self):
+        """In-flight requests currently allowed: the AIMD limit, capped at `concurrency`"""
+        return min(self.concurrency, self.concurrency_controller.limit)
+
+    async def _acquire_slot(self):
+        async with self._slots:
+            await self._slots.wait_for(lambda: self._in_flight < self.slot_limit)
+            self._in_flight += 1
+
+    async def _release_slot(self):
+        async with self._slots:
+            self._in_flight -= 1
+            # Wake as many waiters as there are free slots, which is more than one after an increase
+            self._slots.notify(max(1, self.slot_limit - self._in_flight))
+
+    async def _get_once(self, url):
+        """One GET attempt, recording its latency and outcome for the controller and breaker"""
+        self.circuit_breaker.check() # Fail fast without queueing for a token or slot
+        await self.rate_limiter.aacquire()
+        await self._acquire_slot()
+        healthy = None
         try:
-            response = requests.get(f"{cls.BASE_URL}/topstories.json", timeout=cls.DEFAULT_TIMEOUT)
-            response.raise_for_status()
-            story_ids = response.json()
-            logger.info(f"Fetched {len(story_ids)} top story IDs from API.")
+            # Admitted only once nothing can be awaited before the outcome is reported below
+            self.circuit_breaker.before_call()
+            started = time.monotonic()
+            try:
+                async with self.session.get(url) as response:
+                    # Client errors such as 404 mean the API is up; only retryable statuses count against it
+                    healthy = response.status not in self.RETRY_STATUS_CODES
+                    response.raise_for_status()
+                    return await response.json()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                healthy = bool(healthy)
+                raise
+            finally:
+                if healthy is not None:
+                    self.concurrency_controller.record(time.monotonic() - started, healthy)
+                self.circuit_breaker.record(healthy) # None when cancelled: the probe is handed back
+        finally:
+            await self._release_slot()
+
+    async def _get_json(self, path):
+        """
+        GET a JSON document, retrying transient failures with exponential backoff.
+        Raises CircuitOpenError without retrying once the breaker has opened.
+        """
+        url = f"{self.base_url}/{path}"
+        attempt = 0
+        while True:
+            try:
+                return await self._get_once(url)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retryable = not isinstance(e, aiohttp.ClientResponseError) or e.status in self.RETRY_STATUS_CODES
+                if not retryable or attempt >= self.max_retries:
+                    raise
+            # Back off without holding a slot so waiting retries don't block other requests
+            await asyncio.sleep(self.backoff_factor * (2 ** attempt))
+            attempt += 1
+
+    async def get_feed_ids(self, feed, limit=50):
+        """Fetch the ranked item IDs of a feed (see FEED_ENDPOINTS)"""
+        try:
+            story_ids = await self._get_json(self.FEED_ENDPOINTS[feed])
+            logger.info(f"Fetched {len(story_ids)} {feed} story IDs from API.")
             return story_ids[:limit]
-        except requests.RequestException as e:
-            logger.error(f"Error fetching top stories: {e}")
+        except ASYNC_FETCH_ERRORS as e:
+            _log_fetch_error(f"{feed} stories", e)
             return []
-    
-    @classmethod
-    def get_story_details(cls, story_id):
+
+    async def get_top_stories(self, limit=50):
+        """Fetch IDs of top stories"""
+        return await self.get_feed_ids('top', limit)
+
+    async def get_feeds(self, limits):
+        """
+        Fetch several feeds concurrently, given {feed: limit}.
+        Returns {feed: ranked IDs}; a feed that fails to load maps to an empty list.
+        """
+        feeds = list(limits)
+        results = await asyncio.gather(*(self.get_feed_ids(feed, limits[feed]) for feed in feeds))
+        return dict(zip(feeds, results))
+
+    async def get_max_item(self):
+        """Fetch the current largest item ID, or None on failure"""
+        try:
+            return await self._get_json("maxitem.json")
+        except ASYNC_FETCH_ERRORS as e:
+            _log_fetch_error("max item", e)
+            return None
+
+    async def get_updated_item_ids(self):
+        """Fetch IDs of recently changed items, or None on failure"""
+        try:
+            updates = await self._get_json("updates.json")
+            return (updates or {}).get('items', [])
+        except ASYNC_FETCH_ERRORS as e:
+            _log_fetch_error("updated items", e)
+            return None
+
+    async def get_story_details(self, story_id):
         """Fetch details for a specific story"""
         try:
-            response = requests.get(f"{cls.BASE_URL}/item/{story_id}.json", timeout=cls.DEFAULT_TIMEOUT)
-            response.raise_for_status()
-            data = response.json()
-            
-            # Transform and validate the data
-            if not data or 'title' not in data:
-                return None
-                
-            # Extract domain from URL if present
-            domain = None
-            if 'url' in data and data['url']:
-                parsed_url = urlparse(data['url'])
-                domain = parsed_url.netloc
-            
-            return {
-                'id': data.get('id'),
-                'title': data.get('title', ''),
-                'url': data.get('url', ''),
-                'domain': domain,
-                'score': data.get('score', 0),
-                'comments_count': data.get('descendants', 0),
-                'author': data.get('by', ''),
-                'timestamp': datetime.fromtimestamp(data.get('time', 0)),
-            }
-        except requests.RequestException as e:
-            logger.error(f"Error fetching story {story_id}: {e}")
+            data = await self._get_json(f"item/{story_id}.json")
+            return parse_story(data)
+        except ASYNC_FETCH_ERRORS as e:
+            _log_fetch_error(f"story {story_id}", e)
             return None
+
+    async def get_item(self, item_id):
+        """Fetch the raw payload of any item, or None on failure"""
+        try:
+            return await self._get_json(f"item/{item_id}.json")
+        except ASYNC_FETCH_ERRORS as e:
+            _log_fetch_error(f"item {item_id}", e)
+            return None
+
+    async def get_many_story_details(self, story_ids):
+        """Fetch details for many stories concurrently; results align with story_ids"""
+        return await asyncio.gather(*(self.get_story_details(story_id) for story_id in story_ids))
@@ -0,0 +1,212 @@
+import json
+import logging
+import multiprocessing
+import signal
+import time
+from multiprocessing.connection import wait
+
+from confluent_kafka import KafkaError, KafkaException, TopicPartition
+
+logger = logging.getLogger(__name__)
+
+
+def decode_payload(msg):
+    """JSON payload of a message, or None if it cannot be decoded"""
+    try:
+        return json.loads(msg.value().decode('utf-8'))
+    except (AttributeError, UnicodeDecodeError, json.JSONDecodeError) as e:
+        logger.error(f"Skipping undecodable message at {msg.topic()} [{msg.partition()}] offset {msg.offset()}: {e}")
+        return None
+
+
+def commit_offsets(messages):
+    """Offsets to commit after messages were processed: one past the last message per partition"""
+    offsets = {}
+    for msg in messages:
+        key = (msg.topic(), msg.partition())
+        offsets[key] = max(offsets.get(key, -1), msg.offset() + 1)
+    return [TopicPartition(topic, partition, offset) for (topic, partition), offset in sorted(offsets.items())]
+
+
+def rewind_offsets(messages):
+    """Positions that redeliver messages: the first message of the batch per partition"""
+    offsets = {}
+    for msg in messages:
+        key = (msg.topic(), msg.partition())
+        offsets[key] = min(offsets.get(key, msg.offset()), msg.offset())
+    return [TopicPartition(topic, partition, offset) for (topic, partition), offset in sorted(offsets.items())]
+
+
+class BatchConsumer:
+    """
+    Runs a Kafka consumer that hands messages to a handler in batches.
+
+    Messages are read with consume(num_messages=...) instead of one poll() per message, and
+    offsets are committed manually (the consumer must be configured with enable.auto.commit
+    set to False). A batch is committed synchronously only after the handler returns True;
+    otherwise every partition in the batch is rewound to its first message, so the batch is
+    redelivered after `retry_backoff` seconds. Payloads that are not valid JSON are logged
+    and committed past, so one bad message cannot wedge a partition.
+
+    A batch that keeps failing is not retried forever: once the same partition positions
+    have failed `max_attempts` times, its payloads are logged, handed to the `dead_letter`
+    callback (if any, e.g. to republish them to a dead-letter topic) and committed past.
+    A max_attempts of 0 or None retries indefinitely.
+
+    The handler receives the decoded payloads of the batch, in partition-offset order.
+    """
+
+    def __init__(self, consumer, topics, batch_size, batch_timeout=1.0, retry_backoff=5.0,
+                 max_attempts=None, dead_letter=None):
+        self.consumer = consumer
+        self.topics = list(topics)
+        self.batch_size = batch_size
+        self.batch_timeout = batch_timeout
+        self.retry_backoff = retry_backoff
+        self.max_attempts = max_attempts
+        self.dead_letter = dead_letter
+        self.stopped = False
+        self._attempts = {} # (topic, partition, offset) a failed batch started at -> failures so far
+
+    def stop(self, *args):
+        """Finish the current batch, then leave the run loop (usable as a signal handler)"""
+        self.stopped = True
+
+    def consume_batch(self):
+        """Up to batch_size messages; partition EOF events and transient errors are dropped"""
+        messages = []
+        for msg in self.consumer.consume(num_messages=self.batch_size, timeout=self.batch_timeout):
+            error = msg.error()
+            if error is None:
+                messages.append(msg)
+            elif error.code() == KafkaError._PARTITION_EOF:
+                logger.debug(f'{msg.topic()} [{msg.partition()}] reached end at offset {msg.offset()}')
+            elif error.fatal():
+                raise KafkaException(error)
+            else:
+                logger.error(f'Kafka error: {error}')
+        return messages
+
+    def process_batch(self, handler):
+        """
+        Consume one batch and run the handler on it.
+        Returns None if nothing was consumed, otherwise whether the batch was committed.
+        """
+        messages = self.consume_batch()
+        if not messages:
+            return None
+
+        payloads = [payload for payload in map(decode_payload, messages) if payload is not None]
+        try:
+            succeeded = handler(payloads) if payloads else True
+        except Exception as e:
+            logger.error(f"Error processing batch of {len(messages)} messages: {e}", exc_info=True)
+            succeeded = False
+
+        if succeeded:
+            self._commit(messages)
+            return True
+
+        attempts = self._record_failure(messages)
+        if self.max_attempts and attempts >= self.max_attempts:
+            self._dead_letter(messages, attempts)
+            self._commit(messages)
+            return True
+
+        logger.warning(f"Batch of {len(messages)} messages failed; redelivering in {self.retry_backoff}s")
+        for position in rewind_offsets(messages):
+            try:
+                self.consumer.seek(position)
+            except KafkaException as e:
+                # The partition was revoked meanwhile; its new owner resumes from the committed offset
+                logger.warning(f"Could not rewind {position.topic} [{position.partition}]: {e}")
+        time.sleep(self.retry_backoff)
+        return False
+
+    def _commit(self, messages):
+        offsets = commit_offsets(messages)
+        self.consumer.commit(offsets=offsets, asynchronous=False)
+        committed = {(tp.topic, tp.partition) for tp in offsets}
+        self._attempts = {key: count for key, count in self._attempts.items() if key[:2] not in committed}
+
+    def _record_failure(self, messages):
+        """Count a failure against each partition position of the batch; returns the highest count"""
+        attempts = 0
+        for position in rewind_offsets(messages):
+            key = (position.topic, position.partition, position.offset)
+            self._attempts[key] = self._attempts.get(key, 0) + 1
+            attempts = max(attempts, self._attempts[key])
+        return attempts
+
+    def _dead_letter(self, messages, attempts):
+        """Log a batch that exhausted its attempts and hand it to the dead_letter callback"""
+        logger.error(f"Batch of {len(messages)} messages failed {attempts} times; dead-lettering it and moving on")
+        for msg in messages:
+            logger.error(f"Dead-lettered {msg.topic()} [{msg.partition()}] offset {msg.offset()}: {msg.value()!r}")
+        if self.dead_letter is None:
+            return
+        try:
+            published = self.dead_letter(messages)
+        except Exception as e:
+            logger.error(f"Dead-letter handler failed: {e}", exc_info=True)
+            published = False
+        if not published:
+            logger.error(f"Could not publish {len(messages)} dead-lettered messages; their payloads are logged above")
+
+    def run(self, handler):
+        """Subscribe and process batches until stop() is called; always closes the consumer"""
+        self.consumer.subscribe(self.topics)
+        logger.info(f"Subscribed to Kafka topics: {', '.join(self.topics)}")
+        try:
+            while not self.stopped:
+                self.process_batch(handler)
+        finally:
+            self.consumer.close()
+
+
+def _worker_main(target, kwargs):
+    """Entry point of a spawned worker: set up Django, then run the dotted-path target"""
+    import django
+    from django.utils.module_loading import import_string
+
+    django.setup()
+    try:
+        import_string(target)(**kwargs)
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(target, workers, **kwargs):
+    """
+    Run `target` (a dotted path to a callable) with kwargs in `workers` processes.
+
+    Each process builds its own consumer in the same consumer group, so Kafka spreads the
+    topic's partitions across them; workers beyond the partition count stay idle. Processes
+    are spawned rather than forked so no librdkafka threads or database connections are
+    inherited. Returns once any worker exits, after stopping the others.
+    """
+    context = multiprocessing.get_context('spawn')
+    processes = [
+        context.Process(target=_worker_main, args=(target, kwargs), name=f'kafka-worker-{index}')
+        for index in range(workers)
+    ]
+    for process in processes:
+        process.start()
+
+    previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: _terminate(processes))
+    try:
+        wait([process.sentinel for process in processes])
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        _terminate(processes)
+    return [process.exitcode for process in processes]
+
+
+def _terminate(processes):
+    for process in processes:
+        if process.is_alive():
+            process.terminate() # SIGTERM lets the worker finish its batch and close its consumer
+    for process in processes:
+        process.join()
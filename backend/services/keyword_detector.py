@@ -1,71 +1,144 @@
 import re
+from bisect import bisect_right
 from django.conf import settings
-import logging 
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == '_'
+
+
+def _trie_pattern(terms):
+    """
+    Build a regex alternation for literal terms, factored into a prefix trie.
+    Shared prefixes are matched once, so adding terms does not add a full scan per term,
+    and longer terms are tried before their prefixes.
+    """
+    trie = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[''] = {} # End-of-term marker
+
+    def to_regex(node):
+        is_end = '' in node
+        branches = [re.escape(char) + to_regex(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return f'(?:{body})?' if is_end else body
+
+    return to_regex(trie)
 
-logger = logging.getLogger(__name__) 
 
 class KeywordDetector:
     """Service for detecting AI-related keywords in text"""
-    
+
     # List of AI-related keywords to detect (canonical forms)
     AI_KEYWORDS = [
-        'chatgpt', 'gpt-4', 'gpt-3', 'openai', 'claude', 'anthropic', 
+        'chatgpt', 'gpt-4', 'gpt-3', 'openai', 'claude', 'anthropic',
         'gemini', 'bard', 'llm', 'large language model', 'artificial intelligence',
         'machine learning', 'deep learning', 'neural network', 'transformer',
         'diffusion', 'midjourney', 'stable diffusion', 'dalle', 'dall-e'
     ]
 
-    # Map specific text patterns to the list of canonical keywords they imply.
-    # Order can matter if patterns overlap; more specific should ideally be first,
-    # but set logic for found_keywords_set handles multiple paths to same keyword.
+    # Map alternative spellings (matched as whole words, case-insensitively) to the list
+    # of canonical keywords they imply. Canonical keywords not in AI_KEYWORDS are ignored.
     VARIANT_MAP = {
-        # Pattern: list of canonical keywords from AI_KEYWORDS to add if pattern matches
-        re.compile(r'\bllms?\b', re.IGNORECASE): ['llm', 'large language model'],
-        re.compile(r'\bml\b', re.IGNORECASE): ['machine learning'],
-        re.compile(r'\bdall-e\b', re.IGNORECASE): ['dall-e', 'dalle'],
+        'llm': ['llm', 'large language model'],
+        'llms': ['llm', 'large language model'],
+        'ml': ['machine learning'],
+        'dall-e': ['dall-e', 'dalle'],
         # If text is "dalle", it will be caught by direct match of 'dalle'.
         # If text is "dall-e", it's caught by direct match of 'dall-e' AND by this rule.
-        # The set ensures 'dall-e' and 'dalle' are added once.
     }
-    
+
+    @classmethod
+    def _build_matcher(cls):
+        """
+        Compile every canonical keyword and variant into one regex.
+        Returns (pattern, keywords_by_term) where keywords_by_term maps a lowercased
+        matched term to the canonical keywords it implies.
+        """
+        keywords_by_term = {}
+        for keyword in cls.AI_KEYWORDS:
+            keywords_by_term.setdefault(keyword.lower(), set()).add(keyword)
+        for variant, canonical_keywords in cls.VARIANT_MAP.items():
+            keywords_by_term.setdefault(variant.lower(), set()).update(
+                keyword for keyword in canonical_keywords if keyword in cls.AI_KEYWORDS
+            )
+        keywords_by_term = {term: keywords for term, keywords in keywords_by_term.items() if keywords}
+
+        # Only one term can match per start position, so a match also implies every
+        # shorter term that is a whole-word prefix of it (e.g. "gpt" in "gpt-4").
+        implied = {}
+        for term in keywords_by_term:
+            implied[term] = set(keywords_by_term[term])
+            for prefix in keywords_by_term:
+                if (len(prefix) < len(term) and term.startswith(prefix)
+                        and _is_word_char(prefix[-1]) != _is_word_char(term[len(prefix)])):
+                    implied[term] |= keywords_by_term[prefix]
+
+        # Zero-width lookahead lets matches overlap, e.g. "diffusion" inside "stable diffusion"
+        pattern = re.compile(r'(?=\b(' + _trie_pattern(keywords_by_term) + r')\b)', re.IGNORECASE)
+        return pattern, {term: frozenset(keywords) for term, keywords in implied.items()}
+
+    @classmethod
+    def _get_matcher(cls):
+        """Return the compiled matcher, building it once per class"""
+        matcher = cls.__dict__.get('_matcher')
+        if matcher is None:
+            matcher = cls._build_matcher()
+            cls._matcher = matcher
+        return matcher
+
     @classmethod
     def find_ai_keywords(cls, text):
         """
         Find AI-related keywords in the text.
-        Uses direct matching for canonical keywords and a variant map for common alternatives.
+        A single precompiled pass matches canonical keywords and their variants.
         Returns a sorted list of found canonical keywords.
         """
         if not text:
             return []
-            
+
+        pattern, keywords_by_term = cls._get_matcher()
         found_keywords_set = set()
-        
-        # 1. Try direct matches for keywords in AI_KEYWORDS (canonical forms)
-        for keyword in cls.AI_KEYWORDS:
-            try:
-                # Use word boundaries (\b) to match whole words.
-                # re.escape handles special characters in keywords.
-                # re.IGNORECASE makes the search case-insensitive.
-                pattern = r'\b' + re.escape(keyword) + r'\b'
-                if re.search(pattern, text, re.IGNORECASE):
-                    found_keywords_set.add(keyword) 
-            except re.error as e:
-                # Log regex compilation errors if a keyword is problematic
-                logger.error(f"Regex error compiling pattern for keyword '{keyword}': {e}")
-        
-        # 2. Process variants from the VARIANT_MAP
-        # This allows specific patterns to map to one or more canonical keywords
-        for pattern_regex, canonical_keywords_to_add in cls.VARIANT_MAP.items():
-            # pattern_regex is already a compiled regex object
-            if re.search(pattern_regex, text):
-                for canonical_keyword in canonical_keywords_to_add:
-                    # Ensure we only add keywords that are defined in our canonical list
-                    if canonical_keyword in cls.AI_KEYWORDS:
-                        found_keywords_set.add(canonical_keyword)
-                        
-        return sorted(list(found_keywords_set))
-    
+        for match in pattern.finditer(text):
+            found_keywords_set.update(keywords_by_term.get(match.group(1).lower(), ()))
+        return sorted(found_keywords_set)
+
+    @classmethod
+    def find_ai_keywords_batch(cls, titles):
+        """
+        Find AI-related keywords in many titles with one scan.
+        Titles are joined with newlines (a non-word separator, so word boundaries hold)
+        and each match is mapped back to its title by offset.
+        Returns a dict mapping each found canonical keyword to the sorted indices of
+        the titles that contain it.
+        """
+        pattern, keywords_by_term = cls._get_matcher()
+        texts = [title or '' for title in titles]
+        offsets = []
+        position = 0
+        for text in texts:
+            offsets.append(position)
+            position += len(text) + 1
+
+        indices_by_keyword = {}
+        for match in pattern.finditer('\n'.join(texts)):
+            index = bisect_right(offsets, match.start()) - 1
+            for keyword in keywords_by_term.get(match.group(1).lower(), ()):
+                indices_by_keyword.setdefault(keyword, set()).add(index)
+        return {keyword: sorted(indices) for keyword, indices in sorted(indices_by_keyword.items())}
+
     @classmethod
     def is_ai_related(cls, text):
         """Check if text contains any AI-related keywords"""
-        return len(cls.find_ai_keywords(text)) > 0
+        if not text:
+            return False
+        pattern, _ = cls._get_matcher()
+        return pattern.search(text) is not None
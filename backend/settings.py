@@ -23,6 +23,49 @@ KAFKA_SASL_MECHANISM = os.environ.get('KAFKA_SASL_MECHANISM', 'PLAIN')
 KAFKA_SASL_USERNAME = os.environ.get('KAFKA_SASL_USERNAME')
 KAFKA_SASL_PASSWORD = os.environ.get('KAFKA_SASL_PASSWORD')
 KAFKA_TOPIC_PREFIX = os.environ.get('KAFKA_TOPIC_PREFIX')
+STARTUP_FETCH_ENABLED = os.environ.get('STARTUP_FETCH_ENABLED', 'False') == 'True'  # Server workers send one fetch trigger at startup
+STARTUP_FETCH_LEASE_TTL = int(os.environ.get('STARTUP_FETCH_LEASE_TTL', '300'))  # Seconds one worker's startup trigger covers the whole fleet
+KAFKA_CONSUMER_BATCH_SIZE = int(os.environ.get('KAFKA_CONSUMER_BATCH_SIZE', '500'))  # Messages per consume() call
+KAFKA_CONSUMER_BATCH_TIMEOUT = float(os.environ.get('KAFKA_CONSUMER_BATCH_TIMEOUT', '1.0'))  # Seconds to wait for a batch to fill
+KAFKA_CONSUMER_WORKERS = int(os.environ.get('KAFKA_CONSUMER_WORKERS', '1'))  # Consumer processes; useful up to the partition count
+KAFKA_CONSUMER_RETRY_BACKOFF = float(os.environ.get('KAFKA_CONSUMER_RETRY_BACKOFF', '5'))  # Seconds before a failed batch is redelivered
+KAFKA_CONSUMER_MAX_ATTEMPTS = int(os.environ.get('KAFKA_CONSUMER_MAX_ATTEMPTS', '5'))  # Failures before a batch is dead-lettered; 0 retries forever
+KAFKA_ITEMS_CONSUMER_BATCH_SIZE = int(os.environ.get('KAFKA_ITEMS_CONSUMER_BATCH_SIZE', '10'))  # fetch_items messages per consume() call
+KAFKA_FLUSH_TIMEOUT = float(os.environ.get('KAFKA_FLUSH_TIMEOUT', '10'))  # Seconds to wait for queued messages on flush and at exit
+KAFKA_PRODUCER_LINGER_MS = int(os.environ.get('KAFKA_PRODUCER_LINGER_MS', '20'))  # Batching delay before a partially filled batch is sent
+KAFKA_PRODUCER_BATCH_BYTES = int(os.environ.get('KAFKA_PRODUCER_BATCH_BYTES', str(256 * 1024)))  # Max bytes per partition batch
+KAFKA_PRODUCER_COMPRESSION = os.environ.get('KAFKA_PRODUCER_COMPRESSION', 'lz4')  # none, gzip, snappy, lz4 or zstd
+KAFKA_PRODUCER_QUEUE_MAX_MESSAGES = int(os.environ.get('KAFKA_PRODUCER_QUEUE_MAX_MESSAGES', '10000'))  # Bound on the local send queue
+KAFKA_PRODUCER_BLOCK_TIMEOUT = float(os.environ.get('KAFKA_PRODUCER_BLOCK_TIMEOUT', '5'))  # Seconds produce waits for queue space before dropping
+
+# HackerNews API client
+HN_API_BASE_URL = os.environ.get('HN_API_BASE_URL', 'https://hacker-news.firebaseio.com/v0')  # Point at a local stand-in for benchmarks
+HN_MAX_RETRIES = int(os.environ.get('HN_MAX_RETRIES', '3'))
+HN_BACKOFF_FACTOR = float(os.environ.get('HN_BACKOFF_FACTOR', '0.3'))
+HN_ASYNC_CONCURRENCY = int(os.environ.get('HN_ASYNC_CONCURRENCY', '100'))  # In-flight requests for the async client
+HN_RATE_LIMIT = float(os.environ.get('HN_RATE_LIMIT', '200'))  # HN API requests per second per process; 0 disables limiting
+HN_RATE_BURST = int(os.environ.get('HN_RATE_BURST', '200'))  # Requests allowed at once before the rate applies
+HN_AIMD_INITIAL_CONCURRENCY = int(os.environ.get('HN_AIMD_INITIAL_CONCURRENCY', '20'))  # In-flight requests before any adjustment
+HN_AIMD_MIN_CONCURRENCY = int(os.environ.get('HN_AIMD_MIN_CONCURRENCY', '4'))  # Floor the limit is never cut below; HN_ASYNC_CONCURRENCY is the ceiling
+HN_AIMD_LATENCY_TARGET = float(os.environ.get('HN_AIMD_LATENCY_TARGET', '1.0'))  # Mean seconds per request above which the limit is cut
+HN_AIMD_ERROR_THRESHOLD = float(os.environ.get('HN_AIMD_ERROR_THRESHOLD', '0.05'))  # Error rate above which the limit is cut
+HN_AIMD_WINDOW = int(os.environ.get('HN_AIMD_WINDOW', '20'))  # Requests per adjustment of the limit
+HN_BREAKER_FAILURE_THRESHOLD = int(os.environ.get('HN_BREAKER_FAILURE_THRESHOLD', '10'))  # Consecutive failures that open the circuit
+HN_BREAKER_RECOVERY_TIMEOUT = float(os.environ.get('HN_BREAKER_RECOVERY_TIMEOUT', '30'))  # Seconds the circuit stays open before a probe request
+HN_FEEDS = {  # Feeds crawled each cycle and their limits, e.g. "top:500,new:200,show:50"
+    feed: int(limit)
+    for feed, limit in (item.split(':') for item in os.environ.get('HN_FEEDS', 'top:50,new:50,best:50,ask:30,show:30,job:30').split(','))
+}
+HN_FULL_REFRESH_INTERVAL = int(os.environ.get('HN_FULL_REFRESH_INTERVAL', '3600'))  # Seconds between forced full fetches in incremental mode
+HN_FETCH_SHARDS = int(os.environ.get('HN_FETCH_SHARDS', '12'))  # Message keys a fan-out cycle spreads story IDs over (>= fetch_items partitions)
+HN_FETCH_ITEMS_PER_MESSAGE = int(os.environ.get('HN_FETCH_ITEMS_PER_MESSAGE', '100'))  # Story IDs per fetch_items message
+HN_CRAWL_COMMENTS = os.environ.get('HN_CRAWL_COMMENTS', 'True') == 'True'  # Crawl and store comment threads of fetched stories
+HN_COMMENT_MAX_DEPTH = int(os.environ.get('HN_COMMENT_MAX_DEPTH', '64'))  # Reply levels crawled per story
+HN_COMMENT_MAX_PER_STORY = int(os.environ.get('HN_COMMENT_MAX_PER_STORY', '5000'))  # Comments crawled per story per cycle
+
+# Score/comment history retention (see the prune_story_snapshots command)
+SNAPSHOT_FULL_RESOLUTION_DAYS = int(os.environ.get('SNAPSHOT_FULL_RESOLUTION_DAYS', '2'))  # Older snapshots are downsampled to one per story per hour
+SNAPSHOT_RETENTION_DAYS = int(os.environ.get('SNAPSHOT_RETENTION_DAYS', '90'))  # Older snapshots are deleted
 
 
 CACHES = {
@@ -71,6 +114,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'corsheaders',
     'rest_framework',
     'drf_spectacular',
@@ -90,11 +134,33 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# DJANGO REST FRAMEWORK
+# ==============================================================================
+REST_FRAMEWORK = {
+    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',  # Required by drf-spectacular
+}
+
+# API PAGINATION
+# ==============================================================================
+STORIES_PAGE_SIZE = int(os.environ.get('STORIES_PAGE_SIZE', '50'))
+STORIES_MAX_PAGE_SIZE = int(os.environ.get('STORIES_MAX_PAGE_SIZE', '500'))
+
+# API CACHING
+# ==============================================================================
+API_CACHE_STALE_TTL = int(os.environ.get('API_CACHE_STALE_TTL', '120'))  # Seconds an expired entry may still be served while it is recomputed
+API_CACHE_LOCK_TIMEOUT = int(os.environ.get('API_CACHE_LOCK_TIMEOUT', '10'))  # Upper bound on a single recompute holding the lock
+API_CACHE_LOCK_WAIT = float(os.environ.get('API_CACHE_LOCK_WAIT', '2'))  # Seconds a cold miss waits for another request's recompute
+API_CACHE_EARLY_REFRESH_BETA = float(os.environ.get('API_CACHE_EARLY_REFRESH_BETA', '1.0'))  # >1 refreshes earlier, 0 disables early refresh
+API_CACHE_LOCAL_MAX_BYTES = int(os.environ.get('API_CACHE_LOCAL_MAX_BYTES', str(32 * 1024 * 1024)))  # Per-process in-memory tier size
+API_CACHE_LOCAL_TTL = int(os.environ.get('API_CACHE_LOCAL_TTL', '30'))  # Max seconds a payload lives in the in-memory tier
+API_CACHE_GENERATION_TTL = float(os.environ.get('API_CACHE_GENERATION_TTL', '1'))  # Seconds a process trusts its copy of a generation; bounds staleness after ingest
+
 # CORS CONFIGURATION
 # ==============================================================================
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",  # React frontend development server
 ]
+CORS_EXPOSE_HEADERS = ['Link', 'X-Next-Cursor']  # Pagination headers readable by the frontend
 
 # ==============================================================================
 
@@ -1,21 +1,36 @@
+import asyncio
+import html
 import json
 import logging
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from confluent_kafka import Producer, KafkaError
+import operator
+import re
+import threading
+from collections import Counter
+from datetime import timedelta
+from functools import reduce
+from asgiref.sync import async_to_sync, sync_to_async
+from confluent_kafka import KafkaException
 from django.utils import timezone
-from django.db import transaction # Import transaction for atomicity
-from django.db.models import F
-from django.core.cache import cache
+from django.db import connection, transaction # Import transaction for atomicity
+from django.db.models import F, Q, Case, When, Value, IntegerField, Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
 from django.conf import settings
 
-from core.models import Story, KeywordMention, DomainStats
-from services.hacker_news import HackerNewsClient
+from core.models import (
+    Story, KeywordMention, DomainStats, IngestCursor, KeywordCount, InsightsSummary, TrendRollup, StorySnapshot,
+    FetchCycle, FetchCycleBatch, Comment, FeedRank,
+)
+from api.caching import invalidate_stories
+from services.comment_crawler import CommentCrawler
+from services.hacker_news import AsyncHackerNewsClient, flow_control_metrics
+from services.kafka_producer import KafkaProducer
 from services.keyword_detector import KeywordDetector
 
 logger = logging.getLogger(__name__)
 
 # Kafka Topics
 FETCH_STORIES_TOPIC = f"{settings.KAFKA_TOPIC_PREFIX}fetch_stories"
+FETCH_ITEMS_TOPIC = f"{settings.KAFKA_TOPIC_PREFIX}fetch_items" # Partitioned work topic of story ID batches
 
 # Kafka Producer Configuration
 producer_config = {
@@ -26,68 +41,104 @@ producer_config = {
     'sasl.password': settings.KAFKA_SASL_PASSWORD,
 }
 
-kafka_producer = None
-try:
-    if settings.KAFKA_BOOTSTRAP_SERVERS and settings.KAFKA_BOOTSTRAP_SERVERS != 'your_kafka_bootstrap_servers': # Avoid creating producer with placeholder
-        kafka_producer = Producer(producer_config)
-        logger.info("Kafka producer initialized successfully.")
-    else:
-        logger.warning("Kafka producer not initialized due to missing or placeholder configuration.")
-except KafkaError as e:
-    logger.error(f"Failed to initialize Kafka producer: {e}")
-    kafka_producer = None
+# Batching, compression and local queue bounds; applied under producer_config
+producer_tuning = {
+    'linger.ms': settings.KAFKA_PRODUCER_LINGER_MS, # Wait this long to fill a batch before sending
+    'batch.size': settings.KAFKA_PRODUCER_BATCH_BYTES,
+    'compression.type': settings.KAFKA_PRODUCER_COMPRESSION,
+    'queue.buffering.max.messages': settings.KAFKA_PRODUCER_QUEUE_MAX_MESSAGES,
+    'enable.idempotence': True, # Retried sends are not duplicated and keep per-partition order
+}
 
+_kafka_producer = None
+_kafka_producer_lock = threading.Lock()
+
+def kafka_configured():
+    """Whether Kafka bootstrap servers are set to something other than the placeholder"""
+    return bool(settings.KAFKA_BOOTSTRAP_SERVERS) and settings.KAFKA_BOOTSTRAP_SERVERS != 'your_kafka_bootstrap_servers'
+
+def get_kafka_producer():
+    """
+    The process-wide producer, created on first use so importing this module stays free of
+    network setup. Returns None if Kafka is not configured or the producer cannot be created.
+    """
+    global _kafka_producer
+    if _kafka_producer is None and kafka_configured():
+        with _kafka_producer_lock:
+            if _kafka_producer is None:
+                try:
+                    _kafka_producer = KafkaProducer(
+                        producer_config, producer_options=producer_tuning,
+                        block_timeout=settings.KAFKA_PRODUCER_BLOCK_TIMEOUT, flush_timeout=settings.KAFKA_FLUSH_TIMEOUT,
+                    )
+                    logger.info("Kafka producer initialized successfully.")
+                except KafkaException as e:
+                    logger.error(f"Failed to initialize Kafka producer: {e}")
+    return _kafka_producer
 
-def delivery_report(err, msg):
-    """ Called once for each message produced to indicate delivery result. """
-    if err is not None:
-        logger.error(f'Message delivery failed: {err}')
-    else:
-        logger.info(f'Message delivered to {msg.topic()} [{msg.partition()}] at offset {msg.offset()}')
 
 def send_kafka_message(topic, message_key, message_payload):
+    """Queue a JSON message; delivery is batched, counted in kafka_producer.stats and flushed at exit."""
+    kafka_producer = get_kafka_producer()
     if not kafka_producer:
         logger.error(f"Kafka producer not available. Cannot send message to topic {topic}")
         return False
     try:
-        kafka_producer.produce(
+        return kafka_producer.produce(
             topic,
             key=str(message_key).encode('utf-8'),
             value=json.dumps(message_payload).encode('utf-8'),
-            callback=delivery_report
         )
-        kafka_producer.poll(0) # Trigger delivery report callbacks
-        return True
-    except BufferError:
-        logger.error(f"Kafka local producer queue is full ({len(kafka_producer)} messages awaiting delivery): try again")
-        return False
     except Exception as e:
         logger.error(f"Error sending message to Kafka topic {topic}: {e}")
         return False
 
 # --- Task Scheduling Functions (to be called by a scheduler) ---
 
-def schedule_fetch_top_stories_task():
-    """Sends a message to Kafka to trigger fetching top stories."""
-    payload = {'task_type': 'fetch_top_stories', 'timestamp': timezone.now().isoformat()}
+def schedule_fetch_top_stories_task(mode='incremental'):
+    """Sends a message to Kafka to trigger fetching top stories ('incremental' or 'full')."""
+    payload = {'task_type': 'fetch_top_stories', 'mode': mode, 'timestamp': timezone.now().isoformat()}
     if send_kafka_message(FETCH_STORIES_TOPIC, 'fetch_trigger', payload):
         logger.info(f"Successfully scheduled 'fetch_top_stories' task via Kafka.")
         return True
     logger.error(f"Failed to schedule 'fetch_top_stories' task via Kafka.")
     return False
 
+def coalesce_fetch_triggers(payloads):
+    """
+    Collapse a batch of fetch trigger payloads into the fetch that actually has to run.
+    Every trigger asks for the same top-stories fetch, so a batch needs at most one: full if any
+    trigger asked for a full fetch (it covers an incremental one), incremental otherwise.
+    Feed overrides of the triggers are merged.
+    Payloads without a task_type are treated as fetch triggers, as the consumer always has.
+    Returns the payload to run, or None if the batch holds no fetch trigger.
+    """
+    triggers = [
+        payload for payload in payloads
+        if isinstance(payload, dict) and payload.get('task_type', 'fetch_top_stories') == 'fetch_top_stories'
+    ]
+    if not triggers:
+        return None
+    modes = {trigger.get('mode', FETCH_MODE_FULL) for trigger in triggers}
+    mode = FETCH_MODE_INCREMENTAL if modes == {FETCH_MODE_INCREMENTAL} else FETCH_MODE_FULL
+    payload = {'task_type': 'fetch_top_stories', 'mode': mode, 'source': 'kafka', 'coalesced': len(triggers)}
+
+    # Feed overrides are merged, keeping the largest limit asked for each feed
+    feeds = {}
+    for trigger in triggers:
+        for feed, limit in (trigger.get('feeds') or {}).items():
+            feeds[feed] = max(feeds.get(feed, 0), limit)
+    if feeds:
+        payload['feeds'] = feeds
+    return payload
+
 
 # --- Core Task Logic (to be called by Kafka Consumers) ---
 
-MAX_WORKERS = 10 # Number of concurrent workers for fetching story details
+MAX_CONCURRENT_FETCHES = settings.HN_ASYNC_CONCURRENCY # In-flight item requests on the event loop
 
-def _fetch_and_process_story_details(story_id):
-    """Helper function to fetch details and prepare data for a single story."""
-    story_data = HackerNewsClient.get_story_details(story_id)
-    if not story_data:
-        logger.warning(f"No data retrieved for story ID {story_id}")
-        return None # Indicate failure for this ID
-    
+def _process_story_details(story_data):
+    """Helper function to prepare fetched data for a single story."""
     # Calculate AI related status
     story_is_ai_related = False
     ai_keywords_found = []
@@ -109,118 +160,497 @@ def _fetch_and_process_story_details(story_id):
             'timestamp': story_data.get('timestamp'), 
             'is_ai_related': story_is_ai_related,
         },
-        'cache_data': story_data, # Original data for cache
         'ai_keywords_found': ai_keywords_found,
+        'kids': story_data.get('kids', []), # Top-level comment IDs for the comment crawler
     }
     return processed_data
 
-def fetch_top_stories_logic(message_payload=None):
-    """Fetch top stories concurrently and save to database."""
-    logger.info(f"Executing fetch_top_stories_logic. Triggered by: {message_payload}")
-    
-    # Get top story IDs (using limit from spec, default in HackerNewsClient is 50)
-    story_ids = HackerNewsClient.get_top_stories()
+async def _afetch_and_process_story_details(client, story_id):
+    """Helper coroutine to fetch details and prepare data for a single story."""
+    story_data = await client.get_story_details(story_id)
+    if not story_data:
+        logger.warning(f"No data retrieved for story ID {story_id}")
+        return None # Indicate failure for this ID
+    return _process_story_details(story_data)
+
+async def afetch_story_batch(client, story_ids):
+    """
+    Fetch and process many stories concurrently on the running event loop.
+    Returns (processed_results, failed_fetches).
+    """
+    results = await asyncio.gather(
+        *(_afetch_and_process_story_details(client, story_id) for story_id in story_ids),
+        return_exceptions=True,
+    )
+
+    processed_results = []
+    failed_fetches = 0
+    for story_id, result_data in zip(story_ids, results):
+        if isinstance(result_data, Exception):
+            logger.error(f'Story ID {story_id} generated an exception during fetch/process: {result_data}')
+            failed_fetches += 1
+        elif result_data: # Check if fetching and processing succeeded
+            processed_results.append(result_data)
+        else:
+            failed_fetches += 1
+            logger.warning(f"Failed to fetch/process details for story {story_id}.")
+    return processed_results, failed_fetches
+
+# --- Incremental Ingestion ---
+
+FETCH_MODE_FULL = 'full'
+FETCH_MODE_INCREMENTAL = 'incremental'
+INGEST_CURSOR_NAME = 'hn_items'
+
+def get_ingest_cursor():
+    """Load (or create) the persisted ingestion cursor."""
+    cursor, _ = IngestCursor.objects.get_or_create(name=INGEST_CURSOR_NAME)
+    return cursor
+
+def needs_full_refresh(cursor):
+    """A full refresh is forced when no full fetch has run within HN_FULL_REFRESH_INTERVAL."""
+    if cursor.last_full_fetch_at is None:
+        return True
+    age = (timezone.now() - cursor.last_full_fetch_at).total_seconds()
+    return age >= settings.HN_FULL_REFRESH_INTERVAL
+
+def select_incremental_story_ids(story_ids, changed_ids, high_water_mark):
+    """
+    Pick the story IDs that need fetching this cycle.
+    IDs above the high-water mark are new by definition; the rest are fetched only
+    if they are not stored yet or appear in the updates.json changed-items list.
+    Stored stories that changed but left the top list are refreshed as well.
+    """
+    changed = set(changed_ids)
+    top_ids = set(story_ids)
+    candidates = {story_id for story_id in top_ids | changed if story_id <= high_water_mark}
+    stored_ids = set(Story.objects.filter(id__in=candidates).values_list('id', flat=True))
+
+    ids_to_fetch = [
+        story_id for story_id in story_ids
+        if story_id > high_water_mark or story_id not in stored_ids or story_id in changed
+    ]
+    ids_to_fetch.extend(sorted(changed & stored_ids - top_ids))
+    return ids_to_fetch
+
+def advance_ingest_cursor(cursor, max_item, full_fetch):
+    """Persist the new high-water mark after a successful cycle."""
+    if max_item is not None:
+        cursor.max_item = max(cursor.max_item, max_item)
+    if full_fetch:
+        cursor.last_full_fetch_at = timezone.now()
+    cursor.save()
+
+def save_feed_ranks(feed_ids):
+    """
+    Replace the stored ranking of each crawled feed with its current one, given {feed: ranked IDs}.
+    Only stored stories are ranked; items that failed to fetch are left out until they are stored.
+    """
+    if not feed_ids:
+        return
+    all_ids = {story_id for ids in feed_ids.values() for story_id in ids}
+    stored_ids = set(Story.objects.filter(id__in=all_ids).values_list('id', flat=True))
+    with transaction.atomic():
+        FeedRank.objects.filter(feed__in=list(feed_ids)).delete()
+        FeedRank.objects.bulk_create([
+            FeedRank(feed=feed, story_id=story_id, rank=rank)
+            for feed, ids in feed_ids.items()
+            for rank, story_id in enumerate(ids, start=1) if story_id in stored_ids
+        ])
+
+def resolve_feed_limits(feeds=None):
+    """Feed limits for a cycle: the given {feed: limit} (e.g. from a trigger payload) or HN_FEEDS; unknown feeds are dropped"""
+    limits = {}
+    for feed, limit in (feeds or settings.HN_FEEDS).items():
+        if feed in AsyncHackerNewsClient.FEED_ENDPOINTS:
+            limits[feed] = int(limit)
+        else:
+            logger.warning(f"Ignoring unknown feed {feed!r}")
+    return limits
+
+def merge_feed_ids(feed_ids):
+    """Story IDs of every feed, each once, in order of first appearance"""
+    return list(dict.fromkeys(story_id for ids in feed_ids.values() for story_id in ids))
+
+async def _aselect_story_ids(client, mode, cursor, feeds=None):
+    """
+    Decide which stories a cycle fetches across the crawled feeds.
+    An item listed in several feeds is fetched once.
+    Returns (story_ids, ids_to_fetch, max_item, full_fetch, feed_ids), or None if no story IDs were retrieved.
+    """
+    full_fetch = mode != FETCH_MODE_INCREMENTAL or await sync_to_async(needs_full_refresh)(cursor)
+
+    # A feed that failed to load is left out, so its stored ranking is kept
+    feed_ids = {feed: ids for feed, ids in (await client.get_feeds(resolve_feed_limits(feeds))).items() if ids}
+    story_ids = merge_feed_ids(feed_ids)
     if not story_ids:
         logger.warning("No story IDs retrieved from HackerNews API")
-        return {"status": "failure", "reason": "No story IDs retrieved"}
+        return None
+    listed = sum(len(ids) for ids in feed_ids.values())
+    logger.info(f"Fetched {listed} IDs from {len(feed_ids)} feeds: {len(story_ids)} unique, {listed - len(story_ids)} duplicates dropped.")
 
-    logger.info(f"Fetched {len(story_ids)} top story IDs. Fetching details concurrently...")
+    max_item = await client.get_max_item()
+    ids_to_fetch = story_ids
+    if not full_fetch:
+        changed_ids = await client.get_updated_item_ids()
+        if changed_ids is None:
+            # Without the changed list we can't tell what to skip; fall back to a full fetch
+            logger.warning("Could not fetch updates.json; falling back to a full fetch.")
+            full_fetch = True
+        else:
+            ids_to_fetch = await sync_to_async(select_incremental_story_ids)(
+                story_ids, changed_ids, cursor.max_item
+            )
+    return story_ids, ids_to_fetch, max_item, full_fetch, feed_ids
 
-    new_count = 0
-    updated_count = 0
-    processed_story_count = 0
-    failed_fetches = 0
-    
-    # Use ThreadPoolExecutor for concurrent fetching
-    processed_results = []
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        # Submit all fetch tasks
-        future_to_id = {executor.submit(_fetch_and_process_story_details, story_id): story_id for story_id in story_ids}
-        
-        # Process results as they complete
-        processed_count_fetch = 0 # Counter for logging fetch progress
-        for future in as_completed(future_to_id):
-            story_id = future_to_id[future]
-            processed_count_fetch += 1
-            try:
-                result_data = future.result()
-                if result_data: # Check if fetching and processing succeeded
-                    processed_results.append(result_data)
-                    if processed_count_fetch % 10 == 0: # Log every 10 fetches
-                        logger.info(f"Fetched details for {processed_count_fetch}/{len(story_ids)} stories...")
-                else:
-                    failed_fetches += 1
-                    logger.warning(f"Failed to fetch/process details for story {story_id} (attempt {processed_count_fetch}/{len(story_ids)}).")
-            except Exception as exc:
-                logger.error(f'Story ID {story_id} generated an exception during fetch/process (attempt {processed_count_fetch}/{len(story_ids)}): {exc}', exc_info=False) # Keep log less verbose
-                failed_fetches += 1
+def log_upstream_metrics():
+    """Log and return the HN API rate limiter, concurrency and circuit breaker state"""
+    metrics = flow_control_metrics()
+    limiter, concurrency, breaker = metrics['rate_limiter'], metrics['concurrency'], metrics['circuit_breaker']
+    logger.info(
+        f"HN API: circuit {breaker['state']} ({breaker['failures']} failures, {breaker['rejected']} rejected), "
+        f"concurrency limit {concurrency['limit']}, {limiter['throttled']} of {limiter['acquired']} requests "
+        f"throttled ({limiter['throttled_seconds']}s)."
+    )
+    return metrics
 
-    logger.info(f"Finished fetching details. Processing {len(processed_results)} successful results in database.")
+async def afetch_top_stories_logic(message_payload=None):
+    """
+    Fetch stories of the configured feeds concurrently on one event loop and save to database.
+    Pass {'mode': 'incremental'} in the payload to fetch only new or changed items, and
+    {'feeds': {'top': 100, 'show': 30}} to override HN_FEEDS.
+    """
+    logger.info(f"Executing fetch_top_stories_logic. Triggered by: {message_payload}")
+    mode = (message_payload or {}).get('mode', FETCH_MODE_FULL)
+    cursor = await sync_to_async(get_ingest_cursor)()
+
+    async with AsyncHackerNewsClient(concurrency=MAX_CONCURRENT_FETCHES) as client:
+        selection = await _aselect_story_ids(client, mode, cursor, (message_payload or {}).get('feeds'))
+        if selection is None:
+            return {"status": "failure", "reason": "No story IDs retrieved"}
+        story_ids, ids_to_fetch, max_item, full_fetch, feed_ids = selection
+        skipped = len(story_ids) - len(set(story_ids) & set(ids_to_fetch))
+        logger.info(
+            f"Selected {len(story_ids)} story IDs ({'full' if full_fetch else 'incremental'} mode). "
+            f"Fetching details for {len(ids_to_fetch)}, skipping {skipped} unchanged..."
+        )
+        processed_results, failed_fetches = await afetch_story_batch(client, ids_to_fetch)
+
+        if processed_results or failed_fetches:
+            # The ORM is synchronous; run the DB stage on the calling thread's connection
+            result = await sync_to_async(save_processed_stories)(processed_results, failed_fetches)
+        else:
+            result = {"status": "success", "processed_stories": 0, "new": 0, "updated": 0, "failed_fetches": 0}
+
+        if result.get("status") == "success":
+            await sync_to_async(save_feed_ranks)(feed_ids)
+            # Threads are crawled after their stories are stored, on the same connection pool
+            result["comments"] = await acrawl_and_save_comments(client, processed_results)
+
+    if result.get("status") == "success":
+        await sync_to_async(advance_ingest_cursor)(cursor, max_item, full_fetch)
+    result["mode"] = FETCH_MODE_FULL if full_fetch else FETCH_MODE_INCREMENTAL
+    result["skipped"] = skipped
+    result["upstream"] = log_upstream_metrics()
+    return result
+
+def fetch_top_stories_logic(message_payload=None):
+    """Fetch top stories concurrently and save to database (sync wrapper)."""
+    return async_to_sync(afetch_top_stories_logic)(message_payload)
+
+TREND_GRANULARITIES = (TrendRollup.GRANULARITY_HOUR, TrendRollup.GRANULARITY_DAY)
+TREND_KEY_FIELDS = ('dimension', 'granularity', 'value', 'bucket')
+TREND_REBUILD_BATCH_SIZE = 5000
+
+# Story columns whose values are served by the API
+STORY_CONTENT_FIELDS = [
+    'title', 'url', 'domain', 'score', 'comments_count',
+    'author', 'timestamp', 'is_ai_related',
+]
+# Story columns tracked over time by StorySnapshot
+SNAPSHOT_FIELDS = ['score', 'comments_count']
+# Story columns overwritten when an already-stored story is fetched again
+STORY_UPSERT_FIELDS = STORY_CONTENT_FIELDS + ['updated_at']
+
+def insert_missing_rows(model, objs):
+    """
+    INSERT ... ON CONFLICT DO NOTHING RETURNING the primary key; returns how many rows were
+    actually inserted. Unlike counting the keys beforehand this stays exact under concurrent
+    writers: an insert that races another transaction's waits for it, then skips the row.
+    bulk_create(ignore_conflicts=True) cannot report which rows it skipped, hence the SQL.
+    """
+    if not objs:
+        return 0
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    quote = connection.ops.quote_name
+    row = f"({', '.join(['%s'] * len(fields))})"
+    sql = (
+        f"INSERT INTO {quote(model._meta.db_table)} ({', '.join(quote(field.column) for field in fields)}) "
+        f"VALUES {', '.join([row] * len(objs))} "
+        f"ON CONFLICT DO NOTHING RETURNING {quote(model._meta.pk.column)}"
+    )
+    params = [field.get_db_prep_save(field.pre_save(obj, True), connection) for obj in objs for field in fields]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return len(cursor.fetchall())
+
+def increment_counters(model, key_fields, increments, **extra_updates):
+    """
+    Add per-row increments to a counter table: insert any missing rows at zero, lock the
+    rows, then one UPDATE applying each row's increment via CASE. Rows are inserted and
+    locked in key order, so concurrent batches touching overlapping keys cannot deadlock.
+    increments maps tuples of values for the model's unique key_fields to the amount to add.
+    Returns the number of rows that were inserted.
+    """
+    if not increments:
+        return 0
+    keys = sorted(increments)
+    lookups = [dict(zip(key_fields, key)) for key in keys]
+    inserted = insert_missing_rows(model, [model(**lookup, count=0) for lookup in lookups])
+
+    if len(key_fields) == 1:
+        rows = model.objects.filter(**{f'{key_fields[0]}__in': [key for key, in keys]})
+    else:
+        rows = model.objects.filter(reduce(operator.or_, (Q(**lookup) for lookup in lookups)))
+    list(rows.order_by(*key_fields).select_for_update().values_list('pk', flat=True))
+    rows.update(
+        count=F('count') + Case(
+            *[When(**lookup, then=Value(increments[key])) for lookup, key in zip(lookups, keys)],
+            default=Value(0),
+            output_field=IntegerField(),
+        ),
+        **extra_updates,
+    )
+    return inserted
+
+def trend_increments(stories_data, existing_ids, created_mentions):
+    """
+    TrendRollup increments for a write batch, keyed like its unique constraint:
+    one per new story for its domain, and one per new keyword mention, in each
+    granularity's bucket of the story's timestamp.
+    """
+    timestamps = {story_data['id']: story_data.get('timestamp') for story_data in stories_data}
+    events = [
+        (TrendRollup.DIMENSION_DOMAIN, story_data['domain'], story_data.get('timestamp'))
+        for story_data in stories_data
+        if story_data.get('domain') and story_data['id'] not in existing_ids
+    ] + [
+        (TrendRollup.DIMENSION_KEYWORD, keyword, timestamps.get(story_id))
+        for keyword, story_id in created_mentions
+    ]
+    increments = Counter()
+    for dimension, value, timestamp in events:
+        if timestamp is None:
+            continue
+        for granularity in TREND_GRANULARITIES:
+            increments[(dimension, granularity, value, TrendRollup.bucket_start(timestamp, granularity))] += 1
+    return increments
+
+def summary_deltas(stories_data, existing_rows):
+    """Change in each InsightsSummary total from writing stories_data over existing_rows"""
+    deltas = {'total_stories': 0, 'ai_related_count': 0, 'score_sum': 0, 'comments_sum': 0}
+    for story_data in stories_data:
+        old = existing_rows.get(story_data['id'])
+        deltas['total_stories'] += 0 if old else 1
+        deltas['ai_related_count'] += int(bool(story_data.get('is_ai_related'))) - int(bool(old and old['is_ai_related']))
+        deltas['score_sum'] += (story_data.get('score') or 0) - ((old and old['score']) or 0)
+        deltas['comments_sum'] += (story_data.get('comments_count') or 0) - ((old and old['comments_count']) or 0)
+    return deltas
+
+def apply_summary_deltas(deltas):
+    """Apply deltas to the InsightsSummary row in one UPDATE, rebuilding it if it is missing"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updated = InsightsSummary.objects.filter(pk=InsightsSummary.SINGLETON_PK).update(
+        updated_at=timezone.now(),
+        **{field: F(field) + delta for field, delta in deltas.items()},
+    )
+    if not updated:
+        # No running totals to adjust; derive them from the (already written) base tables
+        rebuild_insights_summary()
+
+def rebuild_insights_summary():
+    """Recompute the InsightsSummary row from Story and DomainStats"""
+    totals = Story.objects.aggregate(
+        total_stories=Count('id'),
+        ai_related_count=Count('id', filter=Q(is_ai_related=True)),
+        score_sum=Sum('score'),
+        comments_sum=Sum('comments_count'),
+    )
+    summary, _ = InsightsSummary.objects.update_or_create(
+        pk=InsightsSummary.SINGLETON_PK,
+        defaults={
+            'total_stories': totals['total_stories'],
+            'ai_related_count': totals['ai_related_count'],
+            'score_sum': totals['score_sum'] or 0,
+            'comments_sum': totals['comments_sum'] or 0,
+            'unique_domains': DomainStats.objects.count(),
+        },
+    )
+    return summary
+
+def rebuild_trends():
+    """Recompute every TrendRollup bucket from Story and KeywordMention"""
+    TrendRollup.objects.all().delete()
+    for granularity, trunc in ((TrendRollup.GRANULARITY_HOUR, TruncHour), (TrendRollup.GRANULARITY_DAY, TruncDay)):
+        domain_rows = (
+            Story.objects.exclude(domain__isnull=True).exclude(domain='')
+            .values(value=F('domain'), bucket=trunc('timestamp')).annotate(count=Count('id'))
+        )
+        keyword_rows = (
+            KeywordMention.objects.values(value=F('keyword'), bucket=trunc('story__timestamp'))
+            .annotate(count=Count('id'))
+        )
+        for dimension, rows in ((TrendRollup.DIMENSION_DOMAIN, domain_rows), (TrendRollup.DIMENSION_KEYWORD, keyword_rows)):
+            TrendRollup.objects.bulk_create(
+                (TrendRollup(dimension=dimension, granularity=granularity, **row) for row in rows.iterator()),
+                batch_size=TREND_REBUILD_BATCH_SIZE,
+            )
+
+def rebuild_insights():
+    """
+    Rebuild every ingest-maintained aggregate (DomainStats, KeywordCount, TrendRollup,
+    InsightsSummary) from the Story and KeywordMention tables. Returns the rebuilt summary.
+    """
+    with transaction.atomic():
+        rebuild_trends()
+
+        domain_counts = {
+            row['domain']: row['count']
+            for row in Story.objects.exclude(domain__isnull=True).exclude(domain='')
+            .values('domain').annotate(count=Count('id'))
+        }
+        DomainStats.objects.exclude(domain__in=list(domain_counts)).delete()
+        DomainStats.objects.bulk_create(
+            [DomainStats(domain=domain, count=count) for domain, count in domain_counts.items()],
+            update_conflicts=True, unique_fields=['domain'], update_fields=['count', 'last_updated'],
+        )
+
+        keyword_counts = {
+            row['keyword']: row['count']
+            for row in KeywordMention.objects.values('keyword').annotate(count=Count('id'))
+        }
+        KeywordCount.objects.exclude(keyword__in=list(keyword_counts)).delete()
+        KeywordCount.objects.bulk_create(
+            [KeywordCount(keyword=keyword, count=count) for keyword, count in keyword_counts.items()],
+            update_conflicts=True, unique_fields=['keyword'], update_fields=['count', 'last_updated'],
+        )
+        return rebuild_insights_summary()
+
+def changed_snapshots(stories_data, existing_rows, fetched_at):
+    """StorySnapshot rows for new stories and stories whose score or comment count moved"""
+    return [
+        StorySnapshot(
+            story_id=story_data['id'], fetched_at=fetched_at,
+            score=story_data.get('score') or 0, comments_count=story_data.get('comments_count') or 0,
+        )
+        for story_data in stories_data
+        if story_data['id'] not in existing_rows
+        or any(story_data.get(field) != existing_rows[story_data['id']][field] for field in SNAPSHOT_FIELDS)
+    ]
+
+def write_stories(stories_data, keyword_mentions):
+    """
+    bulk_write_stories without the InsightsSummary update: returns its result plus the
+    summary deltas, for callers that write more rows in the transaction before applying them.
+    """
+    # Rows are written in key order so overlapping batches lock them in the same order
+    stories_data = sorted(stories_data, key=operator.itemgetter('id'))
+    keyword_mentions = sorted(keyword_mentions, key=operator.itemgetter('story_id', 'keyword'))
+    story_ids = [story_data['id'] for story_data in stories_data]
+    existing_rows = {
+        row['id']: row for row in Story.objects.filter(id__in=story_ids).values('id', *STORY_CONTENT_FIELDS)
+    }
+    existing_ids = set(existing_rows)
+    changed_story_ids = [
+        story_data['id'] for story_data in stories_data
+        if story_data['id'] not in existing_rows
+        or any(story_data.get(field) != existing_rows[story_data['id']][field] for field in STORY_CONTENT_FIELDS)
+    ]
+
+    # One INSERT ... ON CONFLICT (id) DO UPDATE for every story in the batch
+    Story.objects.bulk_create(
+        [Story(**story_data) for story_data in stories_data],
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=STORY_UPSERT_FIELDS,
+    )
+    # Append history only where score or comments moved, so polling more often adds no rows for idle stories
+    StorySnapshot.objects.bulk_create(changed_snapshots(stories_data, existing_rows, timezone.now()))
+    new_count = len(story_ids) - len(existing_ids)
+    updated_count = len(existing_ids)
+
+    # Domain counts only grow for newly created stories
+    domain_increments = Counter(
+        story_data['domain'] for story_data in stories_data
+        if story_data.get('domain') and story_data['id'] not in existing_ids
+    )
+    deltas = summary_deltas(stories_data, existing_rows)
+    deltas['unique_domains'] = increment_counters(
+        DomainStats, ('domain',), {(domain,): n for domain, n in domain_increments.items()},
+        last_updated=timezone.now(),
+    )
+
+    existing_mentions = set(
+        KeywordMention.objects.filter(story_id__in=story_ids).values_list('keyword', 'story_id')
+    )
+    KeywordMention.objects.bulk_create(
+        [KeywordMention(keyword=mention['keyword'], story_id=mention['story_id']) for mention in keyword_mentions],
+        ignore_conflicts=True,
+    )
+    created_mentions = {(mention['keyword'], mention['story_id']) for mention in keyword_mentions} - existing_mentions
+    keyword_mentions_created_count = len(created_mentions)
+
+    keyword_increments = Counter((keyword,) for keyword, _ in created_mentions)
+    increment_counters(KeywordCount, ('keyword',), keyword_increments, last_updated=timezone.now())
+    increment_counters(TrendRollup, TREND_KEY_FIELDS, trend_increments(stories_data, existing_ids, created_mentions))
+    return new_count, updated_count, keyword_mentions_created_count, changed_story_ids, deltas
+
+def bulk_write_stories(stories_data, keyword_mentions):
+    """
+    Upsert stories and keyword mentions, and advance the aggregates derived from them
+    (DomainStats, KeywordCount, TrendRollup, InsightsSummary, StorySnapshot), with a constant number
+    of statements.
+    Must run inside a transaction. Returns (new_count, updated_count, keyword_mentions_created_count,
+    changed_story_ids), where changed_story_ids are the new stories and those whose content differs
+    from what was stored.
+    """
+    *result, deltas = write_stories(stories_data, keyword_mentions)
+    # Every writer updates the single summary row; doing it last holds its lock only until commit
+    apply_summary_deltas(deltas)
+    return tuple(result)
 
-    stories_to_update_or_create = []
+def collect_story_rows(processed_results):
+    """Story rows keyed by ID and keyword mention rows for bulk_write_stories"""
+    # Key by story ID: ON CONFLICT DO UPDATE cannot touch the same row twice in one statement
+    stories_by_id = {}
     keyword_mentions_to_create = []
-    story_ids_processed_db = set()
 
     for result in processed_results:
         db_data = result['db_data']
-        cache_data = result['cache_data']
-        ai_keywords = result['ai_keywords_found']
         story_id = db_data['id']
-
-        stories_to_update_or_create.append(db_data)
-        story_ids_processed_db.add(story_id)
+        stories_by_id[story_id] = db_data
 
         # Add keywords for bulk creation later
-        for keyword in ai_keywords:
+        for keyword in result['ai_keywords_found']:
             keyword_mentions_to_create.append({'keyword': keyword, 'story_id': story_id})
-            
-        # Cache the data
-        cache.set(f"story_{story_id}", cache_data, timeout=60 * 60 * 24)
-        
+    return list(stories_by_id.values()), keyword_mentions_to_create
 
-  
+def save_processed_stories(processed_results, failed_fetches=0):
+    """Write processed story results to the database and refresh caches."""
+    logger.info(f"Finished fetching details. Processing {len(processed_results)} successful results in database.")
+    stories_data, keyword_mentions_to_create = collect_story_rows(processed_results)
 
     # --- Perform Database Operations --- 
     try:
         # Use a transaction for atomicity
         with transaction.atomic():
-            # Loop through successfully fetched stories for DB update/create
-            processed_db_count_log = 0 # Counter for logging DB progress
-            for story_data in stories_to_update_or_create:
-                story_id = story_data['id']
-                defaults = story_data # The whole dict contains the defaults
-                created = Story.objects.update_or_create(id=story_id, defaults=defaults)
-                processed_db_count_log += 1 # Increment after processing
-                if created:
-                    new_count += 1
-                    # Handle domain count for newly created stories
-                    domain = story_data.get('domain')
-                    if domain:
-                         DomainStats.objects.get_or_create(
-                            domain=domain,
-                            defaults={'count': 0} 
-                         )
-                         # Use F expression for atomic increment
-                         DomainStats.objects.filter(domain=domain).update(count=F('count') + 1)
-                else:
-                    updated_count += 1
-                processed_story_count += 1 # This counts stories successfully processed in DB
-                
-                # Log progress every 10 DB operations
-                if processed_db_count_log % 10 == 0:
-                    logger.info(f"Database update progress: {processed_db_count_log}/{len(stories_to_update_or_create)} stories processed...")
-            
+            new_count, updated_count, keyword_mentions_created_count, changed_story_ids = bulk_write_stories(
+                stories_data, keyword_mentions_to_create
+            )
+            processed_story_count = new_count + updated_count
             logger.info(f"Finished story DB updates/creates.")
-            
-
-            keyword_mentions_created_count = 0
-            for mention in keyword_mentions_to_create:
-                 _, created_kw = KeywordMention.objects.get_or_create(
-                     keyword=mention['keyword'],
-                     story_id=mention['story_id'] # Use story_id directly
-                 )
-                 if created_kw:
-                     keyword_mentions_created_count += 1
             logger.info(f"Created {keyword_mentions_created_count} new KeywordMention records.")
 
     except Exception as e:
@@ -230,18 +660,8 @@ def fetch_top_stories_logic(message_payload=None):
 
     logger.info(f"Processed {processed_story_count} stories in DB: {new_count} new, {updated_count} updated. {failed_fetches} failed fetches.")
 
-    # Clear relevant cache keys using patterns since django-redis is used
-    if hasattr(cache, 'delete_pattern'):
-        logger.info("tasks.py: Clearing cache patterns after story fetch.")
-        cache.delete_pattern("stories_list_*")
-        cache.delete_pattern("story_*")
-        cache.delete("ai_keywords") # This is a fixed key
-        cache.delete_pattern("top_domains_limit_*")
-    else:
-        logger.warning("tasks.py: Cache backend does not support delete_pattern. Clearing specific keys only.")
-        cache.delete('stories_list') 
-        cache.delete('ai_keywords')
-        cache.delete('top_domains')
+    # Only entries that depend on changed stories are dropped; the rest of the cache stays warm
+    invalidate_stories(changed_story_ids)
 
     return {
         "status": "success", 
@@ -250,3 +670,272 @@ def fetch_top_stories_logic(message_payload=None):
         "updated": updated_count,
         "failed_fetches": failed_fetches
     }
+
+
+# --- Comment Threads ---
+
+COMMENT_UPSERT_FIELDS = [
+    'parent_id', 'author', 'text', 'timestamp', 'depth', 'kids', 'deleted', 'dead',
+    'is_ai_related', 'ai_keywords', 'updated_at',
+]
+COMMENT_BULK_BATCH_SIZE = 1000
+HTML_TAG_PATTERN = re.compile(r'<[^>]+>')
+
+def comment_plain_text(html_text):
+    """Comment HTML as plain text for keyword detection; tags become spaces so words stay apart"""
+    return html.unescape(HTML_TAG_PATTERN.sub(' ', html_text or ''))
+
+def load_comment_index(story_ids):
+    """Stored comment tree per story, as {story_id: {comment_id: kids}}"""
+    index = {}
+    for story_id, comment_id, kids in Comment.objects.filter(story_id__in=story_ids).values_list('story_id', 'id', 'kids'):
+        index.setdefault(story_id, {})[comment_id] = kids
+    return index
+
+def save_comments(comments):
+    """Run keyword detection over crawled comments and upsert them; returns the number written"""
+    if not comments:
+        return 0
+    indices_by_keyword = KeywordDetector.find_ai_keywords_batch([comment_plain_text(comment['text']) for comment in comments])
+    keywords_by_index = {}
+    for keyword, indices in indices_by_keyword.items():
+        for index in indices:
+            keywords_by_index.setdefault(index, []).append(keyword)
+
+    now = timezone.now()
+    rows = [
+        Comment(
+            id=comment['id'], story_id=comment['story_id'], parent_id=comment['parent_id'] or comment['story_id'],
+            author=comment['author'] or '', text=comment['text'] or '', timestamp=comment['timestamp'],
+            depth=comment['depth'], kids=comment['kids'], deleted=comment['deleted'], dead=comment['dead'],
+            is_ai_related=index in keywords_by_index, ai_keywords=keywords_by_index.get(index, []), updated_at=now,
+        )
+        # Key by ID: ON CONFLICT DO UPDATE cannot touch the same row twice in one statement
+        for index, comment in {comment['id']: (index, comment) for index, comment in enumerate(comments)}.values()
+    ]
+    Comment.objects.bulk_create(
+        rows, batch_size=COMMENT_BULK_BATCH_SIZE,
+        update_conflicts=True, unique_fields=['id'], update_fields=COMMENT_UPSERT_FIELDS,
+    )
+    return len(rows)
+
+async def acrawl_and_save_comments(client, processed_results):
+    """
+    Crawl the comment threads of stored stories breadth-first and upsert what was fetched.
+    A story is skipped when it has as many stored comments as it reports descendants and it
+    is not in updates.json. Returns the number of comments written; failures are logged,
+    never raised, so a thread cannot fail the story ingest.
+    """
+    if not settings.HN_CRAWL_COMMENTS:
+        return 0
+    threads = {
+        result['db_data']['id']: (result['kids'], result['db_data']['comments_count'])
+        for result in processed_results if result.get('kids')
+    }
+    if not threads:
+        return 0
+
+    try:
+        known = await sync_to_async(load_comment_index)(list(threads))
+        changed_ids = await client.get_updated_item_ids()
+        refresh_all = changed_ids is None # Without the changed list every stored comment must be refetched
+        changed = frozenset(changed_ids or ())
+        crawler = CommentCrawler(client, settings.HN_COMMENT_MAX_DEPTH, settings.HN_COMMENT_MAX_PER_STORY)
+
+        async def crawl_thread(story_id, kids, descendants):
+            known_kids = known.get(story_id, {})
+            if len(known_kids) >= descendants and story_id not in changed:
+                return None # Unchanged since the last crawl
+            crawl = await crawler.crawl(story_id, kids, known_kids, changed, refresh_all)
+            if crawl.reached < descendants and not crawl.truncated and not refresh_all:
+                # A reply under a stored comment was missed by updates.json; walk the thread in full
+                crawl = await crawler.crawl(story_id, kids, known_kids, refresh_all=True)
+            return crawl
+
+        crawls = [
+            crawl for crawl in await asyncio.gather(*(
+                crawl_thread(story_id, kids, descendants) for story_id, (kids, descendants) in threads.items()
+            ))
+            if crawl is not None
+        ]
+        comments = [comment for crawl in crawls for comment in crawl.comments]
+        written = await sync_to_async(save_comments)(comments)
+    except Exception as e:
+        logger.error(f"Comment crawl failed: {e}", exc_info=True)
+        return 0
+
+    logger.info(
+        f"Crawled {len(crawls)} of {len(threads)} threads: {sum(crawl.fetched for crawl in crawls)} comments fetched, "
+        f"{written} written, {sum(crawl.truncated for crawl in crawls)} truncated by budget."
+    )
+    return written
+
+
+# --- Fan-out Ingestion ---
+# The scheduler plans a cycle and publishes its story IDs to FETCH_ITEMS_TOPIC in batches.
+# Any number of consume_hn_items replicas fetch and write those batches in parallel; the
+# worker that records a cycle's last batch aggregates it: one cache invalidation for every
+# story the cycle changed, then the ingest cursor advance. If that fails, the batch is
+# redelivered and its redelivery finalizes the cycle instead.
+
+FETCH_CYCLE_RETENTION = timedelta(days=1) # Finished and abandoned cycles older than this are deleted
+
+def split_item_batches(story_ids, shards=None, batch_size=None):
+    """
+    Split story IDs into fetch_items batches, as (message_key, story_ids) pairs.
+    A story always maps to the same key (story_id % shards), so Kafka routes it to the same
+    partition every cycle and two consumers never write one story concurrently. A shard with
+    more than batch_size IDs is published as several messages with the same key.
+    """
+    shards = shards or settings.HN_FETCH_SHARDS
+    batch_size = batch_size or settings.HN_FETCH_ITEMS_PER_MESSAGE
+    ids_by_shard = {}
+    for story_id in story_ids:
+        ids_by_shard.setdefault(story_id % shards, []).append(story_id)
+
+    batches = []
+    for shard, shard_ids in sorted(ids_by_shard.items()):
+        for start in range(0, len(shard_ids), batch_size):
+            batches.append((str(shard), shard_ids[start:start + batch_size]))
+    return batches
+
+async def aplan_fetch_cycle(mode=FETCH_MODE_INCREMENTAL, feeds=None):
+    """
+    Select this cycle's story IDs and record the cycle.
+    Returns (cycle, messages) where messages are the (key, payload) pairs to publish to
+    FETCH_ITEMS_TOPIC, or None if no top stories were retrieved.
+    """
+    cursor = await sync_to_async(get_ingest_cursor)()
+    async with AsyncHackerNewsClient(concurrency=MAX_CONCURRENT_FETCHES) as client:
+        selection = await _aselect_story_ids(client, mode, cursor, feeds)
+    if selection is None:
+        return None
+    story_ids, ids_to_fetch, max_item, full_fetch, feed_ids = selection
+
+    batches = split_item_batches(ids_to_fetch)
+    cycle = await sync_to_async(FetchCycle.objects.create)(
+        mode=FETCH_MODE_FULL if full_fetch else FETCH_MODE_INCREMENTAL,
+        total_batches=len(batches),
+        max_item=max_item,
+        skipped=len(story_ids) - len(set(story_ids) & set(ids_to_fetch)),
+        feeds=feed_ids,
+        # Nothing changed since the last cycle, so there are no batches to wait for
+        completed_at=None if batches else timezone.now(),
+    )
+    if not batches:
+        await sync_to_async(finalize_fetch_cycle)(cycle)
+    messages = [
+        (key, {'task_type': 'fetch_items', 'cycle_id': cycle.pk, 'batch': index, 'story_ids': batch_ids})
+        for index, (key, batch_ids) in enumerate(batches)
+    ]
+    return cycle, messages
+
+def schedule_fetch_cycle_task(mode='incremental'):
+    """Plan a fan-out fetch cycle and publish its item batches to FETCH_ITEMS_TOPIC."""
+    kafka_producer = get_kafka_producer()
+    if not kafka_producer:
+        logger.error(f"Kafka producer not available. Cannot schedule a fetch cycle.")
+        return False
+    planned = async_to_sync(aplan_fetch_cycle)(mode)
+    if planned is None:
+        return False
+    cycle, messages = planned
+
+    sent = sum(send_kafka_message(FETCH_ITEMS_TOPIC, key, payload) for key, payload in messages)
+    undelivered = kafka_producer.flush() # The cron job exits right after scheduling
+    if sent < len(messages) or undelivered:
+        # The cycle cannot complete; its published batches are still written, and the next cycle catches up
+        logger.error(f"Fetch cycle {cycle.pk}: only {sent - undelivered} of {len(messages)} batches were published.")
+        return False
+    logger.info(f"Scheduled fetch cycle {cycle.pk} ({cycle.mode} mode): {len(messages)} batches, {cycle.skipped} skipped.")
+    return True
+
+def record_cycle_batch(cycle_id, index, new, updated, failed_fetches, changed_story_ids):
+    """
+    Record a written batch of a fan-out cycle; call it after the batch's writes, in their transaction.
+    The cycle row is locked, so exactly one worker sees the final batch land, and a
+    redelivered batch is recorded once. Returns the cycle if it is complete but not yet
+    finalized (the last batch, or a redelivery after finalizing failed), False if the cycle
+    is still running or already finalized, or None if the cycle no longer exists.
+    """
+    cycle = FetchCycle.objects.select_for_update().filter(pk=cycle_id).first()
+    if cycle is None:
+        return None
+    FetchCycleBatch.objects.get_or_create(cycle=cycle, index=index, defaults={
+        'new': new, 'updated': updated, 'failed_fetches': failed_fetches,
+        'changed_story_ids': sorted(changed_story_ids),
+    })
+    if cycle.completed_at is None:
+        if cycle.batches.count() < cycle.total_batches:
+            return False
+        cycle.completed_at = timezone.now()
+        cycle.save(update_fields=['completed_at'])
+    return cycle if cycle.finalized_at is None else False
+
+def finalize_fetch_cycle(cycle):
+    """
+    Aggregate a completed cycle: invalidate caches for every changed story once and advance the ingest cursor.
+    Every step is idempotent; the cycle is marked finalized only after all of them succeed.
+    """
+    batches = cycle.batches.all()
+    totals = batches.aggregate(new=Sum('new'), updated=Sum('updated'), failed_fetches=Sum('failed_fetches'))
+    changed_story_ids = {story_id for ids in batches.values_list('changed_story_ids', flat=True) for story_id in ids}
+
+    invalidate_stories(changed_story_ids)
+    save_feed_ranks(cycle.feeds)
+    advance_ingest_cursor(get_ingest_cursor(), cycle.max_item, cycle.mode == FETCH_MODE_FULL)
+    FetchCycle.objects.filter(pk=cycle.pk).update(finalized_at=timezone.now())
+    FetchCycle.objects.filter(created_at__lt=timezone.now() - FETCH_CYCLE_RETENTION).delete()
+
+    logger.info(
+        f"Fetch cycle {cycle.pk} completed ({cycle.mode} mode): {totals['new'] or 0} new, "
+        f"{totals['updated'] or 0} updated, {totals['failed_fetches'] or 0} failed fetches, {cycle.skipped} skipped."
+    )
+    return {key: value or 0 for key, value in totals.items()}
+
+def save_item_batch(payload, processed_results, failed_fetches):
+    """
+    Write one fetch_items batch and record it against its cycle in a single transaction.
+    Raises on database or finalization errors so the consumer redelivers the batch.
+    """
+    stories_data, keyword_mentions_to_create = collect_story_rows(processed_results)
+    with transaction.atomic():
+        new_count, updated_count, _, changed_story_ids, deltas = write_stories(stories_data, keyword_mentions_to_create)
+        completed = record_cycle_batch(
+            payload['cycle_id'], payload['batch'], new_count, updated_count, failed_fetches, changed_story_ids
+        )
+        apply_summary_deltas(deltas) # Last, so the shared summary row is locked only until commit
+
+    if completed is None:
+        # The cycle was cleaned up meanwhile; nothing will aggregate this batch
+        invalidate_stories(changed_story_ids)
+    elif completed:
+        finalize_fetch_cycle(completed)
+    return {"status": "success", "new": new_count, "updated": updated_count, "failed_fetches": failed_fetches}
+
+async def afetch_item_batches_logic(payloads):
+    """
+    Fetch the stories of a consumed batch of fetch_items payloads on one event loop, then
+    write each payload as its own batch. Payloads of other task types are ignored.
+    """
+    batches = [
+        payload for payload in payloads
+        if isinstance(payload, dict) and payload.get('task_type') == 'fetch_items'
+    ]
+    if not batches:
+        return []
+    async with AsyncHackerNewsClient(concurrency=MAX_CONCURRENT_FETCHES) as client:
+        fetched = await asyncio.gather(*(afetch_story_batch(client, payload['story_ids']) for payload in batches))
+
+        results = []
+        for payload, (processed_results, failed_fetches) in zip(batches, fetched):
+            results.append(await sync_to_async(save_item_batch)(payload, processed_results, failed_fetches))
+        stored_results = [result for processed_results, _ in fetched for result in processed_results]
+        await acrawl_and_save_comments(client, stored_results)
+    log_upstream_metrics()
+    return results
+
+def fetch_item_batches_logic(payloads):
+    """Fetch and write a batch of fetch_items payloads (sync wrapper)."""
+    return async_to_sync(afetch_item_batches_logic)(payloads)
+
@@ -1,9 +1,14 @@
+import json
 import pytest
+from datetime import datetime, timedelta
 from django.urls import reverse
 from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
-from core.models import Story, KeywordMention, DomainStats
+from api.serializers import StorySerializer
+from core.models import Story, KeywordMention, DomainStats, StorySnapshot
 from django.core.cache import cache
+from tasks import rebuild_insights
 
 @pytest.fixture
 def api_client():
@@ -79,6 +84,7 @@ def test_keyword_frequency_endpoint(api_client):
     KeywordMention.objects.create(keyword='openai', story=story1)
     KeywordMention.objects.create(keyword='llm', story=story2)
     KeywordMention.objects.create(keyword='openai', story=story3)
+    rebuild_insights() # Rows created directly bypass the ingest-time counters
     
     url = reverse('insights-keyword-frequency') # Action names use hyphens
     response = api_client.get(url)
@@ -110,4 +116,176 @@ def test_top_domains_endpoint(api_client):
     assert response_limit.status_code == 200
     data_limit = response_limit.json()
     assert len(data_limit) == 1
-    assert data_limit[0]['domain'] == 'another.net' 
\ No newline at end of file
+    assert data_limit[0]['domain'] == 'another.net' 
+
+@pytest.mark.django_db
+def test_list_stories_cursor_pagination(api_client):
+    now = timezone.now()
+    # Two stories share a timestamp so the id tie-breaker is exercised
+    for story_id, minutes_ago in [(401, 0), (402, 5), (403, 5), (404, 10)]:
+        Story.objects.create(id=story_id, title=f'Story {story_id}', author='a', timestamp=now - timedelta(minutes=minutes_ago))
+
+    url = reverse('story-list') + '?page_size=2'
+    seen = []
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == 200
+        seen.extend(story['id'] for story in response.json())
+        url = response.get('Link', '').partition('<')[2].partition('>')[0] or None
+    assert seen == [401, 403, 402, 404]
+
+@pytest.mark.django_db
+def test_list_stories_cached_page_links_to_the_requesting_host(api_client):
+    """Test that a cached page's next link uses each client's own scheme and host, not the first requester's."""
+    now = timezone.now()
+    for story_id in (451, 452):
+        Story.objects.create(id=story_id, title='s', author='a', timestamp=now - timedelta(minutes=story_id))
+    url = reverse('story-list') + '?page_size=1'
+
+    first = api_client.get(url, HTTP_HOST='localhost')
+    second = api_client.get(url, HTTP_HOST='127.0.0.1', secure=True)
+    assert first['X-Next-Cursor'] == second['X-Next-Cursor']
+    assert first['Link'].startswith('<http://localhost/api/stories/')
+    assert second['Link'].startswith('<https://127.0.0.1/api/stories/')
+
+@pytest.mark.django_db
+def test_list_stories_invalid_cursor(api_client):
+    response = api_client.get(reverse('story-list') + '?cursor=not-a-cursor')
+    assert response.status_code == 404
+
+@pytest.mark.django_db
+def test_list_stories_invalid_page_size_uses_default(api_client):
+    now = timezone.now()
+    Story.objects.bulk_create([
+        Story(id=500 + i, title='s', author='a', timestamp=now - timedelta(seconds=i)) for i in range(3)
+    ])
+    response = api_client.get(reverse('story-list') + '?page_size=0')
+    assert len(response.json()) == 3
+    assert 'X-Next-Cursor' not in response
+
+@pytest.mark.django_db
+def test_export_stories_ndjson(api_client):
+    now = timezone.now()
+    Story.objects.create(id=601, title='AI Story', author='a', timestamp=now, is_ai_related=True)
+    Story.objects.create(id=602, title='Other', author='b', timestamp=now - timedelta(minutes=1))
+
+    response = api_client.get(reverse('story-export') + '?is_ai_related=true')
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson'
+    lines = b''.join(response.streaming_content).decode().splitlines()
+    rows = [json.loads(line) for line in lines]
+    assert [row['id'] for row in rows] == [601]
+    assert rows[0]['title'] == 'AI Story'
+
+@pytest.mark.django_db
+def test_fast_story_encoding_matches_serializer(api_client):
+    """Test that the values()/orjson list path emits exactly what StorySerializer would."""
+    Story.objects.create(
+        id=701, title='Präzise "quotes"', url=None, domain=None, score=3, comments_count=0,
+        author='ü', timestamp=timezone.now().replace(microsecond=123456), is_ai_related=True,
+    )
+    Story.objects.create(id=702, title='Whole second', url='http://x.com/a', domain='x.com',
+                         author='b', timestamp=timezone.now().replace(microsecond=0) - timedelta(days=1))
+
+    response = api_client.get(reverse('story-list') + '?page_size=10&domain=')
+    expected = StorySerializer(Story.objects.order_by('-timestamp'), many=True).data
+    assert response.json() == json.loads(JSONRenderer().render(expected))
+
+    response_ai = api_client.get(reverse('story-ai-related'))
+    assert [story['id'] for story in response_ai.json()] == [701]
+
+@pytest.mark.django_db
+def test_list_stories_full_text_search(api_client):
+    now = timezone.now()
+    Story.objects.create(id=801, title='Training models with models', author='a', timestamp=now - timedelta(minutes=5))
+    Story.objects.create(id=802, title='A model zoo', author='b', timestamp=now)
+    Story.objects.create(id=803, title='Rust compiler internals', author='c', timestamp=now)
+
+    # Stemmed match, best rank first regardless of recency
+    response = api_client.get(reverse('story-list') + '?search=modelling')
+    assert response.status_code == 200
+    assert [story['id'] for story in response.json()] == [801, 802]
+    assert 'search_rank' not in response.json()[0]
+
+@pytest.mark.django_db
+def test_list_stories_search_cursor_pagination(api_client):
+    now = timezone.now()
+    Story.objects.bulk_create([
+        Story(id=900 + i, title='kafka ' * (1 + i % 2), author='a', timestamp=now - timedelta(minutes=i))
+        for i in range(5)
+    ])
+    url = reverse('story-list') + '?search=kafka&page_size=2'
+    seen = []
+    while url:
+        response = api_client.get(url)
+        assert response.status_code == 200
+        seen.extend(story['id'] for story in response.json())
+        url = response.get('Link', '').partition('<')[2].partition('>')[0] or None
+    # Titles with the term twice rank higher; ties fall back to newest first
+    assert seen == [901, 903, 900, 902, 904]
+
+@pytest.mark.django_db
+def test_stats_summary_endpoint(api_client):
+    now = timezone.now()
+    Story.objects.create(id=1101, title='a', author='a', score=10, comments_count=4, domain='x.com', timestamp=now, is_ai_related=True)
+    Story.objects.create(id=1102, title='b', author='b', score=5, comments_count=1, domain='y.com', timestamp=now)
+    Story.objects.create(id=1103, title='c', author='c', score=0, comments_count=0, timestamp=now)
+    rebuild_insights()
+
+    response = api_client.get(reverse('insights-stats-summary'))
+    assert response.json() == {
+        'total_stories': 3, 'ai_related_count': 1, 'ai_percentage': 1 / 3 * 100,
+        'unique_domains': 2, 'avg_score': 5.0, 'avg_comments': 1.67,
+    }
+
+@pytest.mark.django_db
+def test_trends_endpoint_serves_rollups(api_client):
+    first_hour = datetime(2026, 3, 1, 9, 15)
+    for story_id, posted, keywords in [(1201, first_hour, ['llm']), (1202, first_hour + timedelta(minutes=30), ['llm', 'openai']),
+                                       (1203, first_hour + timedelta(hours=2), ['llm'])]:
+        story = Story.objects.create(id=story_id, title='t', author='a', domain='x.com', timestamp=posted)
+        for keyword in keywords:
+            KeywordMention.objects.create(keyword=keyword, story=story)
+    rebuild_insights()
+
+    url = reverse('insights-trends')
+    response = api_client.get(url + '?granularity=hour&values=llm&start=2026-03-01&end=2026-03-02')
+    assert response.status_code == 200
+    [series] = response.json()['series']
+    assert series['total'] == 3
+    assert series['points'] == [
+        {'bucket': '2026-03-01T09:00:00', 'count': 2},
+        {'bucket': '2026-03-01T11:00:00', 'count': 1},
+    ]
+
+    # Without values, the top values in range are returned by total
+    response = api_client.get(url + '?start=2026-02-01&end=2026-03-02')
+    assert [(s['value'], s['total']) for s in response.json()['series']] == [('llm', 3), ('openai', 1)]
+    response = api_client.get(url + '?dimension=domain&start=2026-02-01&end=2026-03-02')
+    assert response.json()['series'][0]['points'] == [{'bucket': '2026-03-01T00:00:00', 'count': 3}]
+
+    assert api_client.get(url + '?granularity=minute').status_code == 400
+
+@pytest.mark.django_db
+def test_story_velocity_endpoint(api_client):
+    story = Story.objects.create(id=1301, title='t', author='a', timestamp=datetime(2026, 3, 1, 8, 0))
+    StorySnapshot.objects.bulk_create([
+        StorySnapshot(story=story, fetched_at=datetime(2026, 3, 1, 9, 0), score=10, comments_count=2),
+        StorySnapshot(story=story, fetched_at=datetime(2026, 3, 1, 9, 30), score=40, comments_count=5),
+    ])
+
+    response = api_client.get(reverse('story-velocity', kwargs={'pk': 1301}))
+    assert response.status_code == 200
+    assert response.json() == {'id': 1301, 'points': [
+        {'fetched_at': '2026-03-01T09:00:00', 'score': 10, 'comments_count': 2, 'score_per_hour': None, 'comments_per_hour': None},
+        {'fetched_at': '2026-03-01T09:30:00', 'score': 40, 'comments_count': 5, 'score_per_hour': 60.0, 'comments_per_hour': 6.0},
+    ]}
+    assert api_client.get(reverse('story-velocity', kwargs={'pk': 999})).status_code == 404
+
+@pytest.mark.django_db
+def test_schema_declares_story_list_filters(api_client):
+    """Test that search and the filters it combines with are discoverable in the OpenAPI schema."""
+    schema = api_client.get('/api/schema/?format=json').json()
+    for path in ('/api/stories/', '/api/stories/export/'):
+        names = {parameter['name'] for parameter in schema['paths'][path]['get']['parameters']}
+        assert {'search', 'keyword', 'is_ai_related', 'domain', 'start_date', 'end_date'} <= names
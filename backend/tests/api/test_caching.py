@@ -0,0 +1,128 @@
+import pytest
+from django.http import QueryDict
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+from django.core.cache import cache
+from api.caching import (
+    LocalCache, bump_generations, cache_stats, cache_versions, clear_local_caches, get_or_compute, make_cache_key,
+)
+from api.views import STORY_LIST_CACHE_PARAMS
+from core.models import Story
+
+
+def test_cache_key_ignores_param_order_case_and_unknown_params():
+    key = make_cache_key('stories_list', QueryDict('domain=Example.com&is_ai_related=TRUE'), STORY_LIST_CACHE_PARAMS)
+    same = make_cache_key('stories_list', QueryDict('is_ai_related=true&utm=x&domain=example.com'), STORY_LIST_CACHE_PARAMS)
+    assert key == same
+    assert key != make_cache_key('stories_list', QueryDict('domain=example.com'), STORY_LIST_CACHE_PARAMS)
+
+def test_cache_key_coerces_dates_and_drops_empty_values():
+    params = STORY_LIST_CACHE_PARAMS
+    assert (make_cache_key('stories_list', QueryDict('start_date=2024-01-05'), params)
+            == make_cache_key('stories_list', QueryDict('start_date=2024-01-05T00:00:00'), params))
+    assert make_cache_key('stories_list', QueryDict('keyword=&page_size=abc'), params) == 'stories_list'
+
+def test_cache_key_length_is_bounded():
+    key = make_cache_key('stories_list', QueryDict('keyword=' + 'x' * 5000), STORY_LIST_CACHE_PARAMS)
+    assert key.startswith('stories_list_')
+    assert len(key) == len('stories_list_') + 32
+
+@pytest.mark.django_db
+def test_cached_actions_record_hits_and_misses():
+    client = APIClient()
+    cache_stats.reset()
+    Story.objects.create(id=1001, title='AI Story', author='a', timestamp=timezone.now(), is_ai_related=True)
+
+    client.get(reverse('story-list') + '?is_ai_related=true&domain=')
+    client.get(reverse('story-list') + '?domain=&is_ai_related=True')
+    client.get(reverse('story-detail', kwargs={'pk': 1001}))
+    client.get(reverse('insights-stats-summary'))
+
+    stats = client.get(reverse('insights-cache-stats')).json()
+    assert stats['stories_list'] == {'hits': 1, 'stale': 0, 'misses': 1, 'hit_ratio': 0.5}
+    assert stats['story']['misses'] == 1
+    assert stats['stats_summary']['misses'] == 1
+
+def test_get_or_compute_serves_stale_while_another_request_recomputes(settings):
+    settings.API_CACHE_EARLY_REFRESH_BETA = 0
+    cache_stats.reset()
+    get_or_compute('ai_keywords', 'ai_keywords', lambda: ['old'], timeout=60)
+    version, _ = cache_versions('ai_keywords')
+    entry = cache.get('ai_keywords', version=version)
+    cache.set('ai_keywords', dict(entry, expires_at=0), version=version) # Logically expired
+    clear_local_caches() # As seen by another worker
+
+    cache.add('ai_keywords_lock', 'other-request', version=version)
+    assert get_or_compute('ai_keywords', 'ai_keywords', lambda: ['new'], timeout=60) == ['old']
+
+    cache.delete('ai_keywords_lock', version=version)
+    assert get_or_compute('ai_keywords', 'ai_keywords', lambda: ['new'], timeout=60) == ['new']
+    assert cache_stats.snapshot()['ai_keywords'] == {'hits': 0, 'stale': 1, 'misses': 2, 'hit_ratio': 0.3333}
+
+def test_get_or_compute_serves_previous_generation_after_invalidation(settings):
+    settings.API_CACHE_EARLY_REFRESH_BETA = 0
+    get_or_compute('top_domains', 'top_domains', lambda: ['before ingest'], timeout=60)
+    bump_generations(['top_domains'])
+    version, _ = cache_versions('top_domains')
+
+    cache.add('top_domains_lock', 'other-request', version=version)
+    assert get_or_compute('top_domains', 'top_domains', lambda: ['after ingest'], timeout=60) == ['before ingest']
+
+def test_get_or_compute_cold_miss_waits_for_lock_holder(settings, mocker):
+    settings.API_CACHE_LOCK_WAIT = 1
+    version, _ = cache_versions('stats_summary')
+    cache.add('stats_summary_lock', 'other-request', version=version)
+    compute = mocker.Mock(return_value={'total_stories': 0})
+
+    def finish_other_request(seconds):
+        cache.set('stats_summary', {'value': {'total_stories': 7}, 'expires_at': 1e12, 'compute_time': 0},
+                  version=version)
+    mocker.patch('api.caching.time.sleep', side_effect=finish_other_request)
+
+    assert get_or_compute('stats_summary', 'stats_summary', compute, timeout=60) == {'total_stories': 7}
+    assert not compute.called
+
+def test_get_or_compute_refreshes_early_near_expiry(settings, mocker):
+    settings.API_CACHE_EARLY_REFRESH_BETA = 1.0
+    get_or_compute('ai_keywords', 'ai_keywords', lambda: ['old'], timeout=60)
+    version, _ = cache_versions('ai_keywords')
+    entry = cache.get('ai_keywords', version=version)
+    # Expires in 1s and took 10s to compute: a refresh is all but certain
+    cache.set('ai_keywords', dict(entry, expires_at=entry['expires_at'] - 59, compute_time=10), version=version)
+    clear_local_caches()
+    mocker.patch('api.caching.random.random', return_value=0.5)
+
+    assert get_or_compute('ai_keywords', 'ai_keywords', lambda: ['new'], timeout=60) == ['new']
+
+def test_local_tier_serves_hits_without_redis_and_follows_generation(settings, mocker):
+    settings.API_CACHE_GENERATION_TTL = 60
+    compute = mocker.Mock(side_effect=[{'content': b'[1]', 'headers': {}}, {'content': b'[2]', 'headers': {}}])
+    get_or_compute('ai_keywords', 'ai_keywords', compute, timeout=60)
+
+    redis_get = mocker.patch.object(cache, 'get', side_effect=AssertionError('hit went to Redis'))
+    assert get_or_compute('ai_keywords', 'ai_keywords', compute, timeout=60)['content'] == b'[1]'
+    mocker.stop(redis_get)
+
+    bump_generations(['ai_keywords'])
+    assert get_or_compute('ai_keywords', 'ai_keywords', compute, timeout=60)['content'] == b'[2]'
+
+def test_cache_versions_fall_back_to_seeded_generation_when_re_read_misses(mocker):
+    """Test that a generation evicted between add() and the re-read does not break the request."""
+    clear_local_caches()
+    mocker.patch.object(cache, 'get', return_value=None)
+    mocker.patch.object(cache, 'add', return_value=True)
+
+    current, previous = cache_versions('stories_list')
+    generation = int(current.rsplit('.', 1)[1])
+    assert previous.endswith(f'.{generation - 1}')
+
+def test_local_cache_evicts_least_recently_used_by_size():
+    local = LocalCache(max_bytes=10)
+    local.set('a', {'content': b'aaaa', 'headers': {}}, expires_at=1e12)
+    local.set('b', {'content': b'bbbb', 'headers': {}}, expires_at=1e12)
+    local.get('a')
+    local.set('c', {'content': b'cccc', 'headers': {}}, expires_at=1e12)
+    assert local.get('b') is None
+    assert local.get('a') is not None and local.get('c') is not None
+    assert local.size == 8
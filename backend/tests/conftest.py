@@ -0,0 +1,19 @@
+import pytest
+from django.core.cache import cache
+from api.caching import clear_local_caches
+from services.hacker_news import reset_flow_control
+
+
+@pytest.fixture(autouse=True)
+def clear_api_cache():
+    """Cached API responses must not leak between tests"""
+    cache.clear()
+    clear_local_caches()
+    yield
+
+
+@pytest.fixture(autouse=True)
+def reset_hn_flow_control():
+    """Rate limiter, concurrency and circuit breaker state must not leak between tests"""
+    reset_flow_control()
+    yield
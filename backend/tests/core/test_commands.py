@@ -0,0 +1,123 @@
+import pytest
+from io import StringIO
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.utils import timezone
+
+from api.caching import API_CACHE_SCHEMA, story_velocity_cache_key
+from core.models import Story, KeywordMention, DomainStats, KeywordCount, InsightsSummary, StorySnapshot
+
+
+@pytest.mark.django_db
+def test_reclassify_stories_rewrites_flags_and_mentions():
+    """Test that reclassification fixes stale flags and keyword mentions across chunks."""
+    now = timezone.now()
+    stale = Story.objects.create(id=1, title='Cooking pasta', author='a', timestamp=now, is_ai_related=True)
+    KeywordMention.objects.create(keyword='llm', story=stale)
+    missed = Story.objects.create(id=2, title='Claude writes code', author='b', timestamp=now, is_ai_related=False)
+    kept = Story.objects.create(id=3, title='OpenAI news', author='c', timestamp=now, is_ai_related=True)
+    KeywordMention.objects.create(keyword='openai', story=kept)
+
+    out = StringIO()
+    call_command('reclassify_stories', chunk_size=2, stdout=out)
+
+    assert Story.objects.get(id=1).is_ai_related is False
+    assert Story.objects.get(id=2).is_ai_related is True
+    assert set(KeywordMention.objects.values_list('keyword', 'story_id')) == {('claude', 2), ('openai', 3)}
+    assert 'Reclassified 3 stories: 2 is_ai_related flags changed, 1 keyword mentions added, 1 removed.' in out.getvalue()
+
+@pytest.mark.django_db
+def test_reclassify_stories_dry_run_writes_nothing():
+    Story.objects.create(id=1, title='Claude writes code', author='b', timestamp=timezone.now(), is_ai_related=False)
+
+    call_command('reclassify_stories', dry_run=True, stdout=StringIO())
+
+    assert Story.objects.get(id=1).is_ai_related is False
+    assert KeywordMention.objects.count() == 0
+
+@pytest.mark.django_db
+def test_reclassify_stories_rebuilds_insights_after_a_failed_chunk(mocker):
+    """Test that chunks committed before a failure still get their aggregates rebuilt and caches bumped."""
+    now = timezone.now()
+    Story.objects.create(id=1, title='Claude writes code', author='a', timestamp=now, is_ai_related=False)
+    Story.objects.create(id=2, title='OpenAI news', author='b', timestamp=now, is_ai_related=False)
+    mocker.patch('core.management.commands.reclassify_stories.KeywordDetector.find_ai_keywords_batch',
+                 side_effect=[{'claude': [0]}, RuntimeError('boom')])
+    rebuild = mocker.patch('core.management.commands.reclassify_stories.rebuild_insights')
+    bump = mocker.patch('core.management.commands.reclassify_stories.bump_generations')
+
+    call_command('reclassify_stories', chunk_size=1, stdout=StringIO(), stderr=StringIO())
+
+    assert Story.objects.get(id=1).is_ai_related is True
+    assert Story.objects.get(id=2).is_ai_related is False
+    rebuild.assert_called_once_with()
+    bump.assert_called_once()
+
+@pytest.mark.django_db
+def test_reclassify_stories_reports_a_failed_rebuild_without_failing(mocker):
+    """Test that a rebuild failure after a successful run is reported, not raised as the command's failure."""
+    Story.objects.create(id=1, title='Claude writes code', author='a', timestamp=timezone.now(), is_ai_related=False)
+    mocker.patch('core.management.commands.reclassify_stories.rebuild_insights', side_effect=RuntimeError('db gone'))
+    out, err = StringIO(), StringIO()
+
+    call_command('reclassify_stories', stdout=out, stderr=err)
+
+    assert 'Reclassified 1 stories: 1 is_ai_related flags changed' in out.getvalue()
+    assert 'rebuilding insights failed: db gone' in err.getvalue()
+
+@pytest.mark.django_db
+def test_reclassify_stories_failed_rebuild_does_not_mask_the_original_error(mocker):
+    now = timezone.now()
+    Story.objects.create(id=1, title='Claude writes code', author='a', timestamp=now, is_ai_related=False)
+    Story.objects.create(id=2, title='OpenAI news', author='b', timestamp=now, is_ai_related=False)
+    mocker.patch('core.management.commands.reclassify_stories.KeywordDetector.find_ai_keywords_batch',
+                 side_effect=[{'claude': [0]}, KeyboardInterrupt()])
+    mocker.patch('core.management.commands.reclassify_stories.rebuild_insights', side_effect=RuntimeError('db gone'))
+
+    with pytest.raises(KeyboardInterrupt):
+        call_command('reclassify_stories', chunk_size=1, stdout=StringIO(), stderr=StringIO())
+
+@pytest.mark.django_db
+def test_reconcile_insights_rebuilds_drifted_aggregates():
+    """Test that reconciliation replaces drifted counters with values derived from the base tables."""
+    story = Story.objects.create(id=1, title='OpenAI news', author='a', domain='a.com', timestamp=timezone.now(),
+                                 score=8, is_ai_related=True)
+    KeywordMention.objects.create(keyword='openai', story=story)
+    DomainStats.objects.create(domain='gone.com', count=3)
+    KeywordCount.objects.create(keyword='openai', count=99)
+
+    out = StringIO()
+    call_command('reconcile_insights', stdout=out)
+
+    summary = InsightsSummary.objects.get()
+    assert (summary.total_stories, summary.ai_related_count, summary.score_sum, summary.unique_domains) == (1, 1, 8, 1)
+    assert dict(DomainStats.objects.values_list('domain', 'count')) == {'a.com': 1}
+    assert dict(KeywordCount.objects.values_list('keyword', 'count')) == {'openai': 1}
+    assert 'Rebuilt insights: 1 stories, 1 AI-related, 1 domains' in out.getvalue()
+
+@pytest.mark.django_db
+def test_prune_story_snapshots_downsamples_and_expires():
+    """Test that old snapshots keep the last point per story-hour and expired ones are removed."""
+    now = timezone.now()
+    story = Story.objects.create(id=1, title='t', author='a', timestamp=now)
+    ten_days_ago = (now - timedelta(days=10)).replace(minute=0, second=0, microsecond=0)
+    StorySnapshot.objects.bulk_create([
+        StorySnapshot(story=story, fetched_at=now - timedelta(days=200), score=1, comments_count=0), # Expired
+        StorySnapshot(story=story, fetched_at=ten_days_ago + timedelta(minutes=5), score=2, comments_count=0),
+        StorySnapshot(story=story, fetched_at=ten_days_ago + timedelta(minutes=50), score=3, comments_count=0),
+        StorySnapshot(story=story, fetched_at=now - timedelta(minutes=20), score=4, comments_count=0), # Full resolution
+        StorySnapshot(story=story, fetched_at=now - timedelta(minutes=10), score=5, comments_count=0),
+    ])
+
+    untouched = Story.objects.create(id=2, title='t', author='a', timestamp=now)
+    StorySnapshot.objects.create(story=untouched, fetched_at=now, score=1, comments_count=0)
+    cache.set_many({story_velocity_cache_key(1): 'stale', story_velocity_cache_key(2): 'warm'}, version=API_CACHE_SCHEMA)
+
+    out = StringIO()
+    call_command('prune_story_snapshots', full_resolution_days=2, retention_days=90, stdout=out)
+
+    assert list(StorySnapshot.objects.filter(story=story).order_by('fetched_at').values_list('score', flat=True)) == [3, 4, 5]
+    assert cache.get(story_velocity_cache_key(1), version=API_CACHE_SCHEMA) is None # Its history changed
+    assert cache.get(story_velocity_cache_key(2), version=API_CACHE_SCHEMA) == 'warm'
+    assert 'Deleted 1 expired snapshots and 1 superseded by hourly downsampling.' in out.getvalue()
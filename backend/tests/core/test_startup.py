@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+import tasks
+from core.startup import run_startup_tasks
+
+
+def test_startup_tasks_are_opt_in(settings, mocker):
+    schedule = mocker.patch('tasks.schedule_fetch_top_stories_task', return_value=True)
+    settings.STARTUP_FETCH_ENABLED = False
+
+    assert run_startup_tasks(background=False) is None
+    schedule.assert_not_called()
+
+
+def test_startup_fetch_is_sent_by_one_process(settings, mocker):
+    """Test that only the process holding the startup lease sends the initial fetch trigger."""
+    schedule = mocker.patch('tasks.schedule_fetch_top_stories_task', return_value=True)
+    settings.STARTUP_FETCH_ENABLED = True
+
+    assert run_startup_tasks(background=False) is True
+    assert run_startup_tasks(background=False) is False # Another worker starting within the lease TTL
+    schedule.assert_called_once_with()
+
+
+def test_kafka_producer_is_created_on_first_use(settings, mocker):
+    """Test that importing tasks builds no producer and the first send creates a single shared one."""
+    mocker.patch.object(tasks, '_kafka_producer', None)
+    settings.KAFKA_BOOTSTRAP_SERVERS = '127.0.0.1:1'
+    mocker.patch.object(tasks, 'producer_config', {'bootstrap.servers': '127.0.0.1:1', 'log_level': 0})
+    settings.KAFKA_FLUSH_TIMEOUT = 0
+
+    producer = tasks.get_kafka_producer()
+    assert producer is not None
+    assert tasks.get_kafka_producer() is producer
+    producer.close()
+
+
+def test_django_setup_does_not_load_ingest_stack():
+    """Test that app loading (ready hooks included) leaves the ingest modules unimported in a fresh process."""
+    probe = (
+        "import django, sys; django.setup(); import urls; "
+        "print('loaded:', [m for m in ('tasks', 'confluent_kafka', 'aiohttp') if m in sys.modules])"
+    )
+    completed = subprocess.run([sys.executable, '-c', probe], capture_output=True, text=True, check=True)
+    assert 'loaded: []' in completed.stdout
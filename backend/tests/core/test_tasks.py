@@ -1,3 +1,4 @@
+import asyncio
 import pytest
 from unittest.mock import patch, MagicMock, call
 from datetime import datetime
@@ -5,19 +6,30 @@ from datetime import datetime
 from django.utils import timezone
 from django.core.cache import cache
 from django.db.models import F
+from django.conf import settings
+from asgiref.sync import async_to_sync
 
-from core.models import Story, KeywordMention, DomainStats
-from tasks import fetch_top_stories_logic
+from core.models import (
+    Story, KeywordMention, DomainStats, IngestCursor, KeywordCount, InsightsSummary, TrendRollup, StorySnapshot,
+    FetchCycle, Comment, FeedRank,
+)
+from api.caching import API_CACHE_SCHEMA, get_generation, story_cache_key
+from tasks import (
+    fetch_top_stories_logic, afetch_story_batch, bulk_write_stories, save_processed_stories, rebuild_insights,
+    coalesce_fetch_triggers, split_item_batches, aplan_fetch_cycle, fetch_item_batches_logic,
+    acrawl_and_save_comments, increment_counters,
+)
 from services.keyword_detector import KeywordDetector # Import for potential direct mocking if needed
 
 @pytest.fixture
 def mock_hn_client(mocker): # Use pytest-mock fixture
-    # Mock the class methods directly on the HackerNewsClient class imported into tasks module
-    # The HackerNewsClient class itself is located in services.hacker_news
-    # tasks.py imports it as: from services.hacker_news import HackerNewsClient
+    # Mock the coroutine methods directly on the AsyncHackerNewsClient class imported into tasks module
+    # The AsyncHackerNewsClient class itself is located in services.hacker_news
+    # tasks.py imports it as: from services.hacker_news import AsyncHackerNewsClient
+    # mocker.patch replaces coroutine methods with AsyncMock, so side effects can stay synchronous.
     
-    # Default behavior for get_top_stories
-    mock_get_top = mocker.patch('tasks.HackerNewsClient.get_top_stories', return_value=[1, 2, 3])
+    # Default behavior for get_feeds (the feed IDs of a cycle)
+    mock_get_feeds = mocker.patch('tasks.AsyncHackerNewsClient.get_feeds', return_value={'top': [1, 2, 3]})
     
     # Default behavior for get_story_details
     def side_effect_get_details(story_id):
@@ -37,17 +49,20 @@ def mock_hn_client(mocker): # Use pytest-mock fixture
         elif story_id == 3:
             return None # Simulate failure for one ID
         return None
-    mock_get_details = mocker.patch('tasks.HackerNewsClient.get_story_details', side_effect=side_effect_get_details)
+    mock_get_details = mocker.patch('tasks.AsyncHackerNewsClient.get_story_details', side_effect=side_effect_get_details)
+    mocker.patch('tasks.AsyncHackerNewsClient.get_max_item', return_value=3)
+    mock_get_updates = mocker.patch('tasks.AsyncHackerNewsClient.get_updated_item_ids', return_value=[])
     
     # Return the mocked methods themselves, or a simple object that can be used 
     # by tests to change return_values if needed (though it's often cleaner to re-patch in the test).
     # For tests that just rely on default behavior, this fixture sets it up.
     # For tests that need to change behavior (like test_fetch_top_stories_no_ids),
-    # they will re-patch tasks.HackerNewsClient.get_top_stories directly.
+    # they will re-patch tasks.AsyncHackerNewsClient.get_feeds directly.
     class MockHNMocks:
         def __init__(self):
-            self.get_top_stories = mock_get_top
+            self.get_feeds = mock_get_feeds
             self.get_story_details = mock_get_details
+            self.get_updated_item_ids = mock_get_updates
             
     return MockHNMocks()
 
@@ -74,11 +89,8 @@ def mock_keyword_detector(mocker):
 
 @pytest.fixture
 def mock_cache(mocker):
-    # Simple mock, doesn't fully replicate cache behavior but allows checking calls
-    mocker.patch.object(cache, 'set')
-    mocker.patch.object(cache, 'delete')
-    mocker.patch.object(cache, 'get', return_value=None) # Assume cache miss
-    return cache
+    # Ingest reaches the cache only through invalidate_stories (entry deletes plus generation bumps)
+    return mocker.patch('tasks.invalidate_stories')
 
 
 
@@ -99,8 +111,8 @@ def test_fetch_top_stories_logic_update(
     
     assert result['status'] == 'success'
     assert result['processed_stories'] == 2
-    assert result['new'] == 2
-    assert result['updated'] == 0
+    assert result['new'] == 1 # Story 2 is created
+    assert result['updated'] == 1 # Story 1 already existed
     assert result['failed_fetches'] == 1
     
     # Check updated story 1
@@ -109,12 +121,304 @@ def test_fetch_top_stories_logic_update(
     assert story1.is_ai_related is True
     assert KeywordMention.objects.filter(story_id=1).count() == 1
     assert KeywordMention.objects.get(story_id=1, keyword='openai')
+    mock_cache.assert_called_once_with([1, 2])
 
 @pytest.mark.django_db # Added django_db marker
 def test_fetch_top_stories_no_ids(mock_hn_client, mocker): # Add mocker to re-patch
     """Test when HackerNewsClient returns no story IDs."""
-    # Override the get_top_stories mock for this specific test
-    mocker.patch('tasks.HackerNewsClient.get_top_stories', return_value=[])
+    # Override the get_feeds mock for this specific test
+    mocker.patch('tasks.AsyncHackerNewsClient.get_feeds', return_value={'top': []})
     result = fetch_top_stories_logic()
     assert result['status'] == 'failure'
-    assert result['reason'] == 'No story IDs retrieved' 
\ No newline at end of file
+    assert result['reason'] == 'No story IDs retrieved' 
+
+@pytest.mark.django_db
+def test_afetch_story_batch_counts_failures(mocker):
+    """Test that the async batch stage separates successes, empty results and exceptions."""
+    async def fake_get_details(story_id):
+        if story_id == 2:
+            return None
+        if story_id == 3:
+            raise RuntimeError("boom")
+        return {'id': story_id, 'title': 'Plain title', 'timestamp': timezone.now()}
+
+    client = MagicMock()
+    client.get_story_details = fake_get_details
+
+    processed, failed = asyncio.run(afetch_story_batch(client, [1, 2, 3, 4]))
+    assert [result['db_data']['id'] for result in processed] == [1, 4]
+    assert failed == 2
+
+@pytest.mark.django_db(transaction=True)
+def test_fetch_top_stories_incremental_skips_unchanged(
+    mock_hn_client, mock_keyword_detector, mock_cache, mocker
+):
+    """Test that incremental mode only fetches new or changed stories and advances the cursor."""
+    mocker.patch('tasks.AsyncHackerNewsClient.get_feeds', return_value={'top': [1, 2, 4]})
+    mocker.patch('tasks.AsyncHackerNewsClient.get_max_item', return_value=5)
+    mock_hn_client.get_updated_item_ids.return_value = [2, 3]
+    for story_id in (1, 2, 3):
+        Story.objects.create(id=story_id, title='Stored', author='a', timestamp=timezone.now())
+    IngestCursor.objects.create(name='hn_items', max_item=3, last_full_fetch_at=timezone.now())
+
+    result = fetch_top_stories_logic({'mode': 'incremental'})
+
+    fetched_ids = [c.args[0] for c in mock_hn_client.get_story_details.call_args_list]
+    # 1 is stored and unchanged; 2 changed; 4 is above the high-water mark; 3 changed off-list
+    assert fetched_ids == [2, 4, 3]
+    assert result['mode'] == 'incremental'
+    assert result['skipped'] == 1
+    assert IngestCursor.objects.get(name='hn_items').max_item == 5
+    mock_cache.assert_called_once_with([2])
+
+@pytest.mark.django_db(transaction=True)
+def test_fetch_top_stories_incremental_without_cursor_runs_full(
+    mock_hn_client, mock_keyword_detector, mock_cache
+):
+    """Test that the first incremental run falls back to a full fetch."""
+    result = fetch_top_stories_logic({'mode': 'incremental'})
+
+    assert result['mode'] == 'full'
+    assert mock_hn_client.get_story_details.call_count == 3
+    assert not mock_hn_client.get_updated_item_ids.called
+    cursor = IngestCursor.objects.get(name='hn_items')
+    assert cursor.max_item == 3
+    assert cursor.last_full_fetch_at is not None
+
+def _story_data(story_id, domain, title='Plain title'):
+    return {
+        'id': story_id, 'title': title, 'url': f'http://{domain}/{story_id}', 'domain': domain,
+        'score': story_id, 'comments_count': 0, 'author': 'a', 'timestamp': timezone.now(),
+        'is_ai_related': False,
+    }
+
+@pytest.mark.django_db
+def test_bulk_write_stories_constant_statements(django_assert_max_num_queries):
+    """Test that the bulk write stage issues a fixed number of statements regardless of batch size."""
+    Story.objects.create(id=1, title='Old', author='a', timestamp=timezone.now(), domain='a.com')
+    DomainStats.objects.create(domain='a.com', count=1)
+    KeywordMention.objects.create(keyword='llm', story_id=1)
+
+    stories = [_story_data(1, 'a.com', 'Updated')] + [
+        _story_data(story_id, 'a.com' if story_id % 2 else 'b.com') for story_id in range(2, 202)
+    ]
+    mentions = [{'keyword': 'llm', 'story_id': 1}, {'keyword': 'llm', 'story_id': 2}, {'keyword': 'openai', 'story_id': 2}]
+
+    # Stories, snapshots, mentions, DomainStats, KeywordCount and TrendRollup writes (each counter table
+    # inserts, locks and updates its rows) plus one summary UPDATE
+    with django_assert_max_num_queries(15):
+        new_count, updated_count, mentions_created, changed_ids = bulk_write_stories(stories, mentions)
+
+    assert (new_count, updated_count, mentions_created) == (200, 1, 2)
+    assert Story.objects.get(id=1).title == 'Updated'
+    assert DomainStats.objects.get(domain='a.com').count == 1 + 100
+    assert DomainStats.objects.get(domain='b.com').count == 100
+    assert KeywordMention.objects.count() == 3
+    assert len(changed_ids) == 201
+    assert StorySnapshot.objects.count() == 201 # Story 1's score moved from 0
+
+@pytest.mark.django_db
+def test_bulk_write_stories_snapshots_only_changes():
+    """Test that re-fetching unchanged stories appends no history."""
+    bulk_write_stories([_story_data(1, 'a.com'), _story_data(2, 'a.com')], [])
+    bulk_write_stories([_story_data(1, 'a.com'), dict(_story_data(2, 'a.com', 'Retitled'))], [])
+    bulk_write_stories([dict(_story_data(1, 'a.com'), comments_count=5), _story_data(2, 'a.com')], [])
+
+    assert list(StorySnapshot.objects.order_by('id').values_list('story_id', 'comments_count')) == [(1, 0), (2, 0), (1, 5)]
+
+@pytest.mark.django_db
+def test_bulk_write_stories_maintains_insight_aggregates():
+    """Test that incremental aggregates match a from-scratch rebuild."""
+    rebuild_insights()
+    Story.objects.create(**dict(_story_data(1, 'a.com'), score=10, is_ai_related=True))
+    KeywordMention.objects.create(keyword='llm', story_id=1)
+    rebuild_insights()
+
+    stories = [
+        dict(_story_data(1, 'a.com'), score=4, is_ai_related=False), # Score drops, loses the AI flag
+        dict(_story_data(2, 'b.com'), score=7, comments_count=3, is_ai_related=True),
+    ]
+    bulk_write_stories(stories, [{'keyword': 'llm', 'story_id': 2}, {'keyword': 'openai', 'story_id': 2}])
+
+    incremental = InsightsSummary.objects.values().get()
+    keyword_counts = dict(KeywordCount.objects.values_list('keyword', 'count'))
+    assert (incremental['total_stories'], incremental['ai_related_count'], incremental['score_sum']) == (2, 1, 11)
+    assert keyword_counts == {'llm': 2, 'openai': 1}
+
+    trends = set(TrendRollup.objects.values_list('dimension', 'granularity', 'value', 'bucket', 'count'))
+    rebuild_insights()
+    rebuilt = InsightsSummary.objects.values().get()
+    incremental.pop('updated_at'), rebuilt.pop('updated_at')
+    assert incremental == rebuilt
+    assert dict(KeywordCount.objects.values_list('keyword', 'count')) == keyword_counts
+    assert set(TrendRollup.objects.values_list('dimension', 'granularity', 'value', 'bucket', 'count')) == trends
+    assert ('keyword', 'hour', 'llm') in {trend[:3] for trend in trends}
+
+@pytest.mark.django_db
+def test_increment_counters_reports_rows_actually_inserted():
+    """Test that the unique_domains delta counts inserted rows, not keys that looked absent."""
+    DomainStats.objects.create(domain='a.com', count=2)
+    inserted = increment_counters(DomainStats, ('domain',), {('c.com',): 1, ('a.com',): 3, ('b.com',): 2})
+
+    assert inserted == 2
+    assert dict(DomainStats.objects.values_list('domain', 'count')) == {'a.com': 5, 'b.com': 2, 'c.com': 1}
+    assert increment_counters(DomainStats, ('domain',), {('b.com',): 1}) == 0
+
+@pytest.mark.django_db
+def test_bulk_write_stories_reports_only_changed_stories():
+    """Test that re-writing identical content is not reported as a change."""
+    stored = _story_data(1, 'a.com')
+    Story.objects.create(**stored)
+    Story.objects.create(**_story_data(2, 'a.com'))
+
+    stories = [stored, dict(_story_data(2, 'a.com'), score=50), _story_data(3, 'b.com')]
+    _, updated_count, _, changed_ids = bulk_write_stories(stories, [])
+
+    assert updated_count == 2
+    assert changed_ids == [2, 3]
+
+@pytest.mark.django_db
+def test_save_processed_stories_invalidates_only_changed_entries():
+    """Test that ingest drops changed story entries and bumps list generations, leaving the rest warm."""
+    unchanged = _story_data(1, 'a.com')
+    Story.objects.create(**unchanged)
+    Story.objects.create(**_story_data(2, 'a.com'))
+    cache.set_many({story_cache_key(1): 'warm', story_cache_key(2): 'stale'}, version=API_CACHE_SCHEMA)
+    list_generation = get_generation('stories_list')
+
+    save_processed_stories([
+        {'db_data': unchanged, 'ai_keywords_found': []},
+        {'db_data': dict(_story_data(2, 'a.com'), title='Edited'), 'ai_keywords_found': []},
+    ])
+
+    assert cache.get(story_cache_key(1), version=API_CACHE_SCHEMA) == 'warm'
+    assert cache.get(story_cache_key(2), version=API_CACHE_SCHEMA) is None
+    assert get_generation('stories_list') == list_generation + 1
+
+    # Nothing changed this time, so the lists stay on their generation
+    save_processed_stories([{'db_data': unchanged, 'ai_keywords_found': []}])
+    assert get_generation('stories_list') == list_generation + 1
+
+def test_coalesce_fetch_triggers_runs_one_fetch_per_batch():
+    """Test that a backlog of triggers collapses into one fetch, full if any trigger asked for it."""
+    incremental = {'task_type': 'fetch_top_stories', 'mode': 'incremental'}
+    full = {'task_type': 'fetch_top_stories', 'mode': 'full'}
+
+    assert coalesce_fetch_triggers([incremental] * 3)['mode'] == 'incremental'
+    merged = coalesce_fetch_triggers([incremental, full, incremental, {}])
+    assert (merged['mode'], merged['coalesced']) == ('full', 4)
+    assert coalesce_fetch_triggers([{'task_type': 'other'}, 'not a dict']) is None
+    assert coalesce_fetch_triggers([{'feeds': {'top': 50}}, {'feeds': {'top': 100, 'show': 10}}])['feeds'] == {
+        'top': 100, 'show': 10,
+    }
+
+def test_split_item_batches_keys_stories_by_shard():
+    """Test that a story always lands under the same key and large shards are split into several messages."""
+    batches = split_item_batches([1, 2, 3, 4, 5, 7, 9], shards=2, batch_size=3)
+
+    assert batches == [('0', [2, 4]), ('1', [1, 3, 5]), ('1', [7, 9])]
+
+@pytest.mark.django_db(transaction=True)
+def test_fan_out_cycle_finalizes_once_after_last_batch(mock_hn_client, mock_keyword_detector, mocker):
+    """Test that batches are written independently and only the last one invalidates and advances the cursor."""
+    mocker.patch('tasks.AsyncHackerNewsClient.get_feeds', return_value={'top': [1, 2, 3]})
+    mocker.patch.object(settings, 'HN_FETCH_SHARDS', 3)
+    invalidate = mocker.patch('tasks.invalidate_stories')
+
+    cycle, messages = async_to_sync(aplan_fetch_cycle)('full')
+    assert [key for key, _ in messages] == ['0', '1', '2'] # IDs 3, 1, 2
+    assert FetchCycle.objects.get(pk=cycle.pk).total_batches == 3
+
+    fetch_item_batches_logic([payload for _, payload in messages[:2]])
+    invalidate.assert_not_called()
+    assert Story.objects.count() == 1 # Story 3 fails to fetch in the mocked client
+
+    # A redelivered batch is recorded once and does not complete the cycle early
+    fetch_item_batches_logic([messages[1][1]])
+    invalidate.assert_not_called()
+
+    fetch_item_batches_logic([messages[2][1]])
+    invalidate.assert_called_once_with({1, 2})
+    assert FetchCycle.objects.get(pk=cycle.pk).completed_at is not None
+    assert IngestCursor.objects.get().max_item == 3
+
+@pytest.mark.django_db(transaction=True)
+def test_fan_out_cycle_is_finalized_by_redelivery_after_a_failed_finalize(mock_hn_client, mock_keyword_detector, mocker):
+    """Test that a cycle whose finalization failed is finalized when its last batch is redelivered."""
+    mocker.patch.object(settings, 'HN_FETCH_SHARDS', 1)
+    cycle, messages = async_to_sync(aplan_fetch_cycle)('full')
+    assert len(messages) == 1
+    advance = mocker.patch('tasks.advance_ingest_cursor', side_effect=[RuntimeError('cache down'), None])
+
+    with pytest.raises(RuntimeError):
+        fetch_item_batches_logic([messages[0][1]])
+    cycle.refresh_from_db()
+    assert cycle.completed_at is not None and cycle.finalized_at is None
+
+    mocker.stop(advance)
+    fetch_item_batches_logic([messages[0][1]]) # Redelivered by the consumer
+    cycle.refresh_from_db()
+    assert cycle.finalized_at is not None
+    assert IngestCursor.objects.get().max_item == 3
+    assert list(FeedRank.objects.filter(feed='top').values_list('story_id', flat=True).order_by('rank')) == [1, 2]
+
+    fetch_item_batches_logic([messages[0][1]]) # A finalized cycle is not aggregated again
+    assert FetchCycle.objects.get(pk=cycle.pk).finalized_at == cycle.finalized_at
+
+@pytest.mark.django_db
+def test_empty_fan_out_cycle_is_marked_complete(mocker):
+    """Test that a cycle with nothing to fetch is completed when planned, unlike one whose batches are missing."""
+    Story.objects.create(**_story_data(1, 'a.com'))
+    mocker.patch('tasks._aselect_story_ids', return_value=([1], [], 3, False, {'top': [1]}))
+
+    cycle, messages = async_to_sync(aplan_fetch_cycle)('incremental')
+    assert messages == []
+    assert FetchCycle.objects.get(pk=cycle.pk).finalized_at is not None
+    assert IngestCursor.objects.get().max_item == 3
+
+class FakeThreadClient:
+    """Comment tree of story 1: 10 -> 11, with 11 mentioning an AI keyword"""
+
+    def __init__(self):
+        self.requested = []
+        self.items = {
+            10: {'id': 10, 'type': 'comment', 'parent': 1, 'kids': [11], 'text': 'Nice', 'by': 'a', 'time': 0},
+            11: {'id': 11, 'type': 'comment', 'parent': 10, 'text': 'Tried it with <i>ChatGPT</i>', 'by': 'b', 'time': 0},
+        }
+
+    async def get_updated_item_ids(self):
+        return []
+
+    async def get_item(self, item_id):
+        self.requested.append(item_id)
+        return self.items.get(item_id)
+
+@pytest.mark.django_db
+def test_crawl_comments_stores_threads_and_skips_unchanged():
+    """Test that a thread is stored with keyword flags and not refetched while its comment count is unchanged."""
+    Story.objects.create(**_story_data(1, 'a.com'))
+    processed = [{'db_data': dict(_story_data(1, 'a.com'), comments_count=2), 'ai_keywords_found': [], 'kids': [10]}]
+    client = FakeThreadClient()
+
+    assert async_to_sync(acrawl_and_save_comments)(client, processed) == 2
+    assert list(Comment.objects.order_by('id').values_list('id', 'parent_id', 'depth', 'is_ai_related')) == [
+        (10, 1, 1, False), (11, 10, 2, True),
+    ]
+    assert Comment.objects.get(id=11).ai_keywords == ['chatgpt']
+
+    client.requested.clear()
+    assert async_to_sync(acrawl_and_save_comments)(client, processed) == 0
+    assert client.requested == []
+
+@pytest.mark.django_db(transaction=True)
+def test_fetch_dedupes_items_across_feeds_and_stores_ranks(mock_hn_client, mock_keyword_detector, mocker):
+    """Test that an item listed in several feeds is fetched once and ranked in each feed."""
+    mocker.patch('tasks.AsyncHackerNewsClient.get_feeds', return_value={'top': [1, 2], 'best': [2, 1], 'new': [3, 2]})
+
+    result = fetch_top_stories_logic()
+
+    assert result['status'] == 'success'
+    assert sorted(call.args[0] for call in mock_hn_client.get_story_details.call_args_list) == [1, 2, 3]
+    assert set(FeedRank.objects.values_list('feed', 'story_id', 'rank')) == {
+        ('top', 1, 1), ('top', 2, 2), ('best', 2, 1), ('best', 1, 2), ('new', 2, 2), # Story 3 failed to fetch
+    }
@@ -0,0 +1,59 @@
+import asyncio
+
+from services.comment_crawler import CommentCrawler
+
+
+class FakeItemClient:
+    """Serves item payloads from a dict and records which IDs were requested"""
+
+    def __init__(self, items):
+        self.items = items
+        self.requested = []
+
+    async def get_item(self, item_id):
+        self.requested.append(item_id)
+        return self.items.get(item_id)
+
+
+def comment(item_id, parent, kids=(), text='hi'):
+    return {'id': item_id, 'type': 'comment', 'parent': parent, 'kids': list(kids), 'text': text, 'by': 'u', 'time': 0}
+
+
+# Story 1 -> 10, 11; 10 -> 20, 21; 21 -> 30
+THREAD = {
+    10: comment(10, 1, [20, 21]), 11: comment(11, 1),
+    20: comment(20, 10), 21: comment(21, 10, [30]), 30: comment(30, 21),
+}
+
+
+def crawl(client, *args, max_depth=10, max_comments=100, **kwargs):
+    return asyncio.run(CommentCrawler(client, max_depth, max_comments).crawl(1, [10, 11], *args, **kwargs))
+
+
+def test_crawl_walks_levels_breadth_first():
+    client = FakeItemClient(THREAD)
+
+    result = crawl(client, {})
+
+    assert client.requested == [10, 11, 20, 21, 30]
+    assert [(c['id'], c['depth'], c['parent_id']) for c in result.comments] == [
+        (10, 1, 1), (11, 1, 1), (20, 2, 10), (21, 2, 10), (30, 3, 21),
+    ]
+    assert (result.reached, result.fetched, result.truncated) == (5, 5, False)
+
+
+def test_crawl_follows_stored_kids_of_unchanged_comments():
+    """Test that stored, unchanged comments are walked from storage and only new or changed ones are fetched."""
+    client = FakeItemClient(THREAD)
+    known_kids = {10: [20, 21], 11: [], 20: [], 21: []} # 30 is a new reply, so 21 is listed as changed
+
+    result = crawl(client, known_kids, changed_ids={21})
+
+    assert client.requested == [21, 30]
+    assert result.reached == 5
+
+
+def test_crawl_respects_depth_and_size_budgets():
+    assert crawl(FakeItemClient(THREAD), {}, max_depth=2).reached == 4
+    result = crawl(FakeItemClient(THREAD), {}, max_comments=3)
+    assert ([c['id'] for c in result.comments], result.truncated) == ([10, 11, 20], True)
@@ -0,0 +1,134 @@
+import asyncio
+import pytest
+from services.flow_control import AIMDController, CircuitBreaker, CircuitOpenError, TokenBucket
+
+
+@pytest.fixture
+def clock(mocker):
+    """Controllable time.monotonic() for the flow control module"""
+    now = [1000.0]
+    mocker.patch('services.flow_control.time.monotonic', side_effect=lambda: now[0])
+    return now
+
+def test_token_bucket_allows_burst_then_spaces_requests(clock):
+    bucket = TokenBucket(rate=10, burst=3)
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    # Further callers queue behind each other at 1/rate intervals
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+
+    clock[0] += 1.0 # Refills the debt and the burst, capped at burst
+    assert bucket.reserve() == 0.0
+    stats = bucket.snapshot()
+    assert stats['acquired'] == 6
+    assert stats['throttled'] == 2
+    assert stats['throttled_seconds'] == pytest.approx(0.3)
+
+def test_token_bucket_rate_zero_disables_limiting(clock):
+    bucket = TokenBucket(rate=0)
+    assert all(bucket.reserve() == 0.0 for _ in range(1000))
+    assert bucket.snapshot()['throttled'] == 0
+
+def test_token_bucket_aacquire_sleeps_for_reserved_wait(mocker, clock):
+    sleep = mocker.patch('services.flow_control.asyncio.sleep', new=mocker.AsyncMock())
+    bucket = TokenBucket(rate=4, burst=1)
+
+    async def run():
+        await bucket.aacquire()
+        await bucket.aacquire()
+
+    asyncio.run(run())
+    sleep.assert_awaited_once_with(pytest.approx(0.25))
+
+def test_aimd_increases_additively_and_decreases_multiplicatively():
+    controller = AIMDController(initial=10, minimum=2, maximum=12, latency_target=0.5, error_threshold=0.1, window=4)
+    for _ in range(4):
+        controller.record(0.1, True)
+    assert controller.limit == 11
+
+    for _ in range(3): # Below a full window nothing changes
+        controller.record(0.1, False)
+    assert controller.limit == 11
+    controller.record(0.1, True) # 3/4 errors
+    assert controller.limit == 5
+
+    for _ in range(4): # Slow but successful requests also cut the limit
+        controller.record(2.0, True)
+    assert controller.limit == 2
+    for _ in range(4):
+        controller.record(2.0, True)
+    assert controller.limit == 2 # Never below the minimum
+
+    for _ in range(4 * 20):
+        controller.record(0.1, True)
+    assert controller.limit == 12 # Never above the maximum
+    assert controller.snapshot()['decreases'] == 3
+
+def test_circuit_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, recovery_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success() # A success resets the streak
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    clock[0] += 10
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == pytest.approx(20)
+    assert breaker.snapshot()['rejected'] == 1
+
+def test_circuit_breaker_half_open_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.before_call() # The single probe is admitted
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call() # Others keep failing fast while it runs
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.snapshot()['opened'] == 2
+
+def test_circuit_breaker_released_probe_is_admitted_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call()
+    breaker.record(None) # The probe was cancelled before it got an answer
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+def test_circuit_breaker_writes_off_lost_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30, probe_timeout=5)
+    breaker.record_failure()
+    clock[0] += 30
+    breaker.before_call() # Never reports back
+    clock[0] += 2
+    with pytest.raises(CircuitOpenError) as excinfo:
+        breaker.before_call()
+    assert excinfo.value.retry_after == pytest.approx(3)
+
+    clock[0] += 3
+    breaker.before_call()
+    assert breaker.snapshot()['lost_probes'] == 1
+
+def test_circuit_breaker_check_rejects_only_while_open(clock):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=30)
+    breaker.check()
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    clock[0] += 30
+    breaker.check() # Half-open: left to before_call() to admit the probe
+    breaker.before_call()
@@ -1,27 +1,41 @@
+import aiohttp
+import asyncio
 import pytest
-import requests
 import time
 from datetime import datetime
-from services.hacker_news import HackerNewsClient
+from aioresponses import aioresponses
+from services.flow_control import AIMDController, CircuitBreaker
+from services.hacker_news import AsyncHackerNewsClient
 
 
-def test_get_top_stories_success(requests_mock):
+def fetch(register, call):
+    """Run call(client) on a fresh async client, with register(mocked) setting up the responses"""
+    async def run():
+        with aioresponses() as mocked:
+            register(mocked)
+            async with AsyncHackerNewsClient(max_retries=0) as async_client:
+                return await call(async_client)
+    return asyncio.run(run())
+
+def test_get_top_stories_success():
     """Test fetching top stories successfully."""
     mock_ids = list(range(1, 60))
-    requests_mock.get(f"{HackerNewsClient.BASE_URL}/topstories.json", json=mock_ids)
-    
-    story_ids = HackerNewsClient.get_top_stories(limit=50)
+    story_ids = fetch(
+        lambda mocked: mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/topstories.json", payload=mock_ids),
+        lambda client: client.get_top_stories(limit=50),
+    )
     assert story_ids == list(range(1, 51))
     assert len(story_ids) == 50
 
-def test_get_top_stories_failure(requests_mock):
+def test_get_top_stories_failure():
     """Test failure when fetching top stories."""
-    requests_mock.get(f"{HackerNewsClient.BASE_URL}/topstories.json", status_code=500)
-    
-    story_ids = HackerNewsClient.get_top_stories(limit=50)
+    story_ids = fetch(
+        lambda mocked: mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/topstories.json", status=500),
+        lambda client: client.get_top_stories(limit=50),
+    )
     assert story_ids == []
 
-def test_get_story_details_success(requests_mock):
+def test_get_story_details_success():
     """Test fetching story details successfully."""
     story_id = 12345
     mock_time = int(time.time())
@@ -34,9 +48,10 @@ def test_get_story_details_success(requests_mock):
         'by': 'testuser',
         'time': mock_time,
     }
-    requests_mock.get(f"{HackerNewsClient.BASE_URL}/item/{story_id}.json", json=mock_response)
-    
-    details = HackerNewsClient.get_story_details(story_id)
+    details = fetch(
+        lambda mocked: mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/{story_id}.json", payload=mock_response),
+        lambda client: client.get_story_details(story_id),
+    )
     assert details is not None
     assert details['id'] == story_id
     assert details['title'] == 'Test Story Title'
@@ -48,16 +63,17 @@ def test_get_story_details_success(requests_mock):
     assert isinstance(details['timestamp'], datetime)
     assert details['timestamp'] == datetime.fromtimestamp(mock_time)
 
-def test_get_story_details_missing_fields(requests_mock):
+def test_get_story_details_missing_fields():
     """Test fetching story details with missing crucial fields (like title)."""
     story_id = 54321
     mock_response = {'id': story_id, 'by': 'user'} # Missing title
-    requests_mock.get(f"{HackerNewsClient.BASE_URL}/item/{story_id}.json", json=mock_response)
-    
-    details = HackerNewsClient.get_story_details(story_id)
+    details = fetch(
+        lambda mocked: mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/{story_id}.json", payload=mock_response),
+        lambda client: client.get_story_details(story_id),
+    )
     assert details is None
 
-def test_get_story_details_no_url(requests_mock):
+def test_get_story_details_no_url():
     """Test fetching story details when URL is missing."""
     story_id = 67890
     mock_time = int(time.time())
@@ -69,19 +85,170 @@ def test_get_story_details_no_url(requests_mock):
         'by': 'asker',
         'time': mock_time,
     }
-    requests_mock.get(f"{HackerNewsClient.BASE_URL}/item/{story_id}.json", json=mock_response)
-    
-    details = HackerNewsClient.get_story_details(story_id)
+    details = fetch(
+        lambda mocked: mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/{story_id}.json", payload=mock_response),
+        lambda client: client.get_story_details(story_id),
+    )
     assert details is not None
     assert details['id'] == story_id
     assert details['title'] == 'Ask HN: Test'
     assert details['url'] == '' # URL should default to empty string
     assert details['domain'] is None # Domain should be None if no URL
 
-def test_get_story_details_failure(requests_mock):
+def test_get_story_details_failure():
     """Test failure when fetching story details."""
     story_id = 99999
-    requests_mock.get(f"{HackerNewsClient.BASE_URL}/item/{story_id}.json", exc=requests.exceptions.RequestException)
-    
-    details = HackerNewsClient.get_story_details(story_id)
-    assert details is None 
\ No newline at end of file
+    details = fetch(
+        lambda mocked: mocked.get(
+            f"{AsyncHackerNewsClient.BASE_URL}/item/{story_id}.json", exception=aiohttp.ClientConnectionError()
+        ),
+        lambda client: client.get_story_details(story_id),
+    )
+    assert details is None
+
+def test_async_get_top_stories_success():
+    """Test fetching top stories with the async client."""
+    async def run():
+        with aioresponses() as mocked:
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/topstories.json", payload=list(range(1, 60)))
+            async with AsyncHackerNewsClient() as async_client:
+                return await async_client.get_top_stories(limit=50)
+
+    assert asyncio.run(run()) == list(range(1, 51))
+
+def test_async_get_many_story_details():
+    """Test concurrent detail fetches keep input order and tolerate failures."""
+    mock_time = int(time.time())
+
+    async def run():
+        with aioresponses() as mocked:
+            for story_id in (1, 2):
+                mocked.get(
+                    f"{AsyncHackerNewsClient.BASE_URL}/item/{story_id}.json",
+                    payload={'id': story_id, 'title': f'Story {story_id}', 'url': 'http://example.com/a', 'time': mock_time},
+                )
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/3.json", status=404)
+            async with AsyncHackerNewsClient(max_retries=0) as async_client:
+                return await async_client.get_many_story_details([1, 2, 3])
+
+    details = asyncio.run(run())
+    assert [d['id'] if d else None for d in details] == [1, 2, None]
+    assert details[0]['domain'] == 'example.com'
+    assert details[0]['timestamp'] == datetime.fromtimestamp(mock_time)
+
+def test_async_get_story_details_retries_server_errors():
+    """Test that 5xx responses are retried before giving up."""
+    story_id = 42
+
+    async def run():
+        with aioresponses() as mocked:
+            url = f"{AsyncHackerNewsClient.BASE_URL}/item/{story_id}.json"
+            mocked.get(url, status=503)
+            mocked.get(url, payload={'id': story_id, 'title': 'Recovered', 'time': 0})
+            async with AsyncHackerNewsClient(max_retries=2, backoff_factor=0) as async_client:
+                return await async_client.get_story_details(story_id)
+
+    details = asyncio.run(run())
+    assert details is not None
+    assert details['title'] == 'Recovered'
+
+def test_async_get_feeds_fetches_each_feed_with_its_limit():
+    """Test that feeds load concurrently with per-feed limits and a failing feed maps to an empty list."""
+    async def run():
+        with aioresponses() as mocked:
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/topstories.json", payload=[1, 2, 3])
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/showstories.json", payload=[3, 4])
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/jobstories.json", status=404)
+            async with AsyncHackerNewsClient(max_retries=0) as async_client:
+                return await async_client.get_feeds({'top': 2, 'show': 5, 'job': 5})
+
+    assert asyncio.run(run()) == {'top': [1, 2], 'show': [3, 4], 'job': []}
+
+def test_async_client_fails_fast_once_circuit_opens():
+    """Test that requests stop reaching the API after consecutive failures open the breaker."""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+
+    async def run():
+        with aioresponses() as mocked:
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/1.json", status=503, repeat=True)
+            async with AsyncHackerNewsClient(max_retries=5, backoff_factor=0, circuit_breaker=breaker) as async_client:
+                first = await async_client.get_story_details(1)
+                second = await async_client.get_story_details(1)
+            return first, second, sum(len(calls) for calls in mocked.requests.values())
+
+    first, second, calls = asyncio.run(run())
+    assert first is None and second is None
+    assert calls == 2 # The retries after the second failure and the next request were rejected locally
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.snapshot()['rejected'] == 2
+
+def test_async_client_client_errors_do_not_trip_breaker():
+    """Test that 404s count as healthy responses for the breaker and concurrency controller."""
+    breaker = CircuitBreaker(failure_threshold=1)
+    controller = AIMDController(initial=5, minimum=1, maximum=10, latency_target=10, error_threshold=0, window=1)
+
+    async def run():
+        with aioresponses() as mocked:
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/7.json", status=404)
+            async with AsyncHackerNewsClient(circuit_breaker=breaker, concurrency_controller=controller) as async_client:
+                return await async_client.get_item(7)
+
+    assert asyncio.run(run()) is None
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert controller.limit == 6
+
+def test_async_client_in_flight_follows_adaptive_limit():
+    """Test that no more requests run at once than the controller allows."""
+    controller = AIMDController(initial=2, minimum=1, maximum=10, latency_target=10, error_threshold=1, window=1000)
+    running = peak = 0
+
+    async def slow_response(url, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    async def run():
+        with aioresponses() as mocked:
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/1.json", payload={'id': 1}, repeat=True,
+                       callback=slow_response)
+            async with AsyncHackerNewsClient(concurrency=10, concurrency_controller=controller) as async_client:
+                return await asyncio.gather(*(async_client.get_item(1) for _ in range(10)))
+
+    assert asyncio.run(run()) == [{'id': 1}] * 10
+    assert peak == 2
+
+def test_client_uses_configured_base_url(settings):
+    """Test that HN_API_BASE_URL points the client at another server, e.g. a local stand-in."""
+    settings.HN_API_BASE_URL = 'http://127.0.0.1:8765/v0/'
+
+    async def run():
+        with aioresponses() as mocked:
+            mocked.get('http://127.0.0.1:8765/v0/maxitem.json', payload=99)
+            async with AsyncHackerNewsClient() as async_client:
+                return await async_client.get_max_item()
+
+    assert asyncio.run(run()) == 99
+
+def test_async_client_cancelled_probe_is_handed_back():
+    """Test that a probe cancelled mid-request does not leave the breaker half-open for good."""
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0)
+    breaker.record_failure()
+
+    async def hang(url, **kwargs):
+        await asyncio.sleep(10)
+
+    async def run():
+        with aioresponses() as mocked:
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/1.json", callback=hang)
+            mocked.get(f"{AsyncHackerNewsClient.BASE_URL}/item/2.json", payload={'id': 2})
+            async with AsyncHackerNewsClient(circuit_breaker=breaker) as async_client:
+                with pytest.raises(asyncio.TimeoutError):
+                    await asyncio.wait_for(async_client.get_item(1), timeout=0.05)
+                return await async_client.get_item(2), async_client._in_flight
+
+    item, in_flight = asyncio.run(run())
+    assert item == {'id': 2}
+    assert in_flight == 0
+    assert breaker.state == CircuitBreaker.CLOSED
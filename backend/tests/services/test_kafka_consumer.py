@@ -0,0 +1,134 @@
+import json
+import pytest
+
+from services.kafka_consumer import BatchConsumer
+
+
+class FakeMessage:
+    def __init__(self, partition, offset, payload, topic='triggers'):
+        self._partition = partition
+        self._offset = offset
+        self._value = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self._topic = topic
+
+    def topic(self):
+        return self._topic
+
+    def partition(self):
+        return self._partition
+
+    def offset(self):
+        return self._offset
+
+    def value(self):
+        return self._value
+
+    def error(self):
+        return None
+
+
+class FakeConsumer:
+    """Stands in for confluent_kafka.Consumer, recording commits and seeks"""
+
+    def __init__(self, batches):
+        self.batches = list(batches)
+        self.consume_calls = []
+        self.commits = []
+        self.seeks = []
+
+    def consume(self, num_messages, timeout):
+        self.consume_calls.append(num_messages)
+        return self.batches.pop(0) if self.batches else []
+
+    def commit(self, offsets, asynchronous):
+        assert asynchronous is False
+        self.commits.append([(tp.topic, tp.partition, tp.offset) for tp in offsets])
+
+    def seek(self, position):
+        self.seeks.append((position.topic, position.partition, position.offset))
+
+
+@pytest.fixture
+def batch():
+    return [
+        FakeMessage(0, 10, {'n': 1}),
+        FakeMessage(1, 4, {'n': 2}),
+        FakeMessage(0, 11, b'not json'),
+        FakeMessage(1, 5, {'n': 3}),
+    ]
+
+
+def test_process_batch_commits_after_success(batch):
+    """Test that a batch is consumed in one call, handled once, then committed past its last offsets."""
+    consumer = FakeConsumer([batch])
+    handled = []
+    batch_consumer = BatchConsumer(consumer, ['triggers'], batch_size=50, retry_backoff=0)
+
+    assert batch_consumer.process_batch(lambda payloads: handled.append(payloads) or True) is True
+
+    assert consumer.consume_calls == [50]
+    assert handled == [[{'n': 1}, {'n': 2}, {'n': 3}]] # The undecodable message is skipped
+    assert consumer.commits == [[('triggers', 0, 12), ('triggers', 1, 6)]]
+    assert consumer.seeks == []
+
+
+@pytest.mark.parametrize('handler', [lambda payloads: False, lambda payloads: 1 / 0])
+def test_process_batch_rewinds_on_failure(batch, handler):
+    """Test that a failed batch is not committed and each partition is rewound to its first message."""
+    consumer = FakeConsumer([batch])
+    batch_consumer = BatchConsumer(consumer, ['triggers'], batch_size=50, retry_backoff=0)
+
+    assert batch_consumer.process_batch(handler) is False
+
+    assert consumer.commits == []
+    assert consumer.seeks == [('triggers', 0, 10), ('triggers', 1, 4)]
+
+
+def test_process_batch_empty_poll_does_nothing():
+    consumer = FakeConsumer([])
+    batch_consumer = BatchConsumer(consumer, ['triggers'], batch_size=50)
+
+    assert batch_consumer.process_batch(lambda payloads: pytest.fail('handler must not run')) is None
+    assert consumer.commits == []
+
+
+def test_process_batch_dead_letters_after_max_attempts(batch):
+    """Test that a batch failing max_attempts times is dead-lettered and committed past instead of retried forever."""
+    consumer = FakeConsumer([batch, batch, batch])
+    dead_lettered = []
+    batch_consumer = BatchConsumer(
+        consumer, ['triggers'], batch_size=50, retry_backoff=0,
+        max_attempts=3, dead_letter=lambda messages: dead_lettered.append(messages) or True,
+    )
+
+    assert batch_consumer.process_batch(lambda payloads: False) is False
+    assert batch_consumer.process_batch(lambda payloads: False) is False
+    assert dead_lettered == []
+    assert batch_consumer.process_batch(lambda payloads: False) is True
+
+    assert dead_lettered == [batch]
+    assert consumer.commits == [[('triggers', 0, 12), ('triggers', 1, 6)]]
+    assert len(consumer.seeks) == 4 # Two rewinds of both partitions, none after dead-lettering
+
+
+def test_process_batch_commits_dead_letters_when_publishing_fails(batch):
+    """Test that a dead-letter handler failure does not wedge the partition; the payloads are only logged."""
+    consumer = FakeConsumer([batch])
+    batch_consumer = BatchConsumer(
+        consumer, ['triggers'], batch_size=50, retry_backoff=0, max_attempts=1, dead_letter=lambda messages: 1 / 0,
+    )
+
+    assert batch_consumer.process_batch(lambda payloads: False) is True
+    assert consumer.commits == [[('triggers', 0, 12), ('triggers', 1, 6)]]
+
+
+def test_process_batch_attempts_reset_once_a_partition_moves_on(batch):
+    """Test that failures are counted per batch position, so a later failing batch starts from one attempt."""
+    later = [FakeMessage(0, 12, {'n': 4}), FakeMessage(1, 6, {'n': 5})]
+    consumer = FakeConsumer([batch, batch, later])
+    batch_consumer = BatchConsumer(consumer, ['triggers'], batch_size=50, retry_backoff=0, max_attempts=2)
+
+    assert batch_consumer.process_batch(lambda payloads: False) is False
+    assert batch_consumer.process_batch(lambda payloads: True) is True
+    assert batch_consumer.process_batch(lambda payloads: False) is False
+    assert consumer.commits == [[('triggers', 0, 12), ('triggers', 1, 6)]]
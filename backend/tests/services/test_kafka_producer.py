@@ -0,0 +1,31 @@
+from services.kafka_producer import KafkaProducer
+
+# Nothing listens here: messages stay queued until they time out
+UNREACHABLE_BROKER = {'bootstrap.servers': '127.0.0.1:1', 'log_level': 0}
+
+
+def test_produce_applies_backpressure_then_drops():
+    """Test that a full local queue is waited on for block_timeout before a message is dropped."""
+    producer = KafkaProducer(
+        UNREACHABLE_BROKER, block_timeout=0.2, flush_timeout=0,
+        producer_options={'queue.buffering.max.messages': 2},
+    )
+
+    assert producer.produce('topic', b'k', b'1') is True
+    assert producer.produce('topic', b'k', b'2') is True
+    assert producer.produce('topic', b'k', b'3') is False
+
+    stats = producer.stats.snapshot()
+    assert (stats['queued'], stats['dropped']) == (2, 1)
+    assert stats['backpressure_waits'] > 0
+    assert len(producer) == 2
+    assert producer.close() == 2 # Nothing can be delivered
+
+
+def test_flush_counts_failed_deliveries():
+    """Test that delivery results are aggregated into counters when the queue is flushed."""
+    producer = KafkaProducer(UNREACHABLE_BROKER, flush_timeout=5, producer_options={'message.timeout.ms': 100})
+    producer.produce('topic', b'k', b'1')
+
+    assert producer.close() == 0
+    assert producer.stats.snapshot()['failed'] == 1
@@ -20,7 +20,10 @@ def keyword_test_cases():
         ("using chatgpt.", ['chatgpt']), # Punctuation
         ("The gpt-4 model is powerful", ['gpt-4']), # Word boundary
         ("An openai project", ['openai']), # Word boundary
-        ("This title mentions llm and also LLM", ['llm', 'large language model']) # Should only appear once, and llm implies large language model
+        ("This title mentions llm and also LLM", ['llm', 'large language model']), # Should only appear once, and llm implies large language model
+        ("Stable Diffusion 3 is out", ['stable diffusion', 'diffusion']), # Overlapping keywords are both found
+        ("GPT-3 vs GPT-4 vs ChatGPT", ['gpt-3', 'gpt-4', 'chatgpt']), # Shared prefixes
+        ("HTML parsers in Rust", []), # Variant 'ml' must not match inside a word
     ]
 
 @pytest.mark.parametrize("text, expected_keywords", keyword_test_cases())
@@ -33,4 +36,30 @@ def test_is_ai_related():
     assert KeywordDetector.is_ai_related("New GPT-4 study released") is True
     assert KeywordDetector.is_ai_related("Updates on cloud computing") is False
     assert KeywordDetector.is_ai_related(None) is False
-    assert KeywordDetector.is_ai_related("") is False 
\ No newline at end of file
+    assert KeywordDetector.is_ai_related("") is False 
+
+def test_matcher_is_compiled_once():
+    first = KeywordDetector._get_matcher()
+    KeywordDetector.find_ai_keywords("Anthropic releases Claude")
+    assert KeywordDetector._get_matcher() is first
+
+def test_subclass_taxonomy_gets_its_own_matcher():
+    class ExtendedDetector(KeywordDetector):
+        AI_KEYWORDS = KeywordDetector.AI_KEYWORDS + ['mistral', 'gpt']
+
+    assert ExtendedDetector.find_ai_keywords("Mistral beats GPT-4") == ['gpt', 'gpt-4', 'mistral']
+    assert KeywordDetector.find_ai_keywords("Mistral beats GPT-4") == ['gpt-4']
+
+def test_find_ai_keywords_batch_matches_per_title():
+    titles = [text for text, _ in keyword_test_cases()]
+    batch = KeywordDetector.find_ai_keywords_batch(titles)
+
+    for index, title in enumerate(titles):
+        expected = KeywordDetector.find_ai_keywords(title)
+        found = [keyword for keyword, indices in batch.items() if index in indices]
+        assert sorted(found) == expected
+
+def test_find_ai_keywords_batch_does_not_match_across_titles():
+    # "large language" + "model" must not join into one keyword across the separator
+    assert KeywordDetector.find_ai_keywords_batch(["A large language", "model"]) == {}
+    assert KeywordDetector.find_ai_keywords_batch([]) == {}